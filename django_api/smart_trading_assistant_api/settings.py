@@ -147,4 +147,13 @@ CHANNEL_LAYERS = {
             "hosts": [('127.0.0.1', 6379)],
         },
     },
-}
\ No newline at end of file
+}
+
+# Cache shared by all server processes (alert versions, screener-status and
+# trade journal responses); reuses the Redis instance behind the channel layer
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_REDIS_URL', default='redis://127.0.0.1:6379/1'),
+    }
+}
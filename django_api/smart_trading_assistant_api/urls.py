@@ -3,7 +3,10 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from trading_app.views import metrics_endpoint
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('trading_app.urls')),
+    path('metrics', metrics_endpoint, name='metrics'),
 ]
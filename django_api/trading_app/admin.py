@@ -1,7 +1,10 @@
 # trading_app/admin.py
 
 from django.contrib import admin
-from .models import Instrument, TradeLog, RadarAlert, VirtualWallet, VirtualTrade, VirtualPosition, UserProfile
+from .models import (
+    Instrument, TradeLog, RadarAlert, VirtualWallet, VirtualTrade, VirtualPosition, UserProfile,
+    WalletStats, WalletDailyPnl, WalletBreakdown
+)
 
 @admin.register(Instrument)
 class InstrumentAdmin(admin.ModelAdmin):
@@ -52,3 +55,23 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'upstox_user_id']
     search_fields = ['user__username', 'user__email', 'upstox_user_id']
 
+
+
+@admin.register(WalletStats)
+class WalletStatsAdmin(admin.ModelAdmin):
+    list_display = ['wallet', 'closed_trades', 'winning_trades', 'losing_trades', 'longest_win_streak', 'longest_loss_streak', 'updated_at']
+    search_fields = ['wallet__user__username']
+    readonly_fields = ['updated_at']
+
+@admin.register(WalletDailyPnl)
+class WalletDailyPnlAdmin(admin.ModelAdmin):
+    list_display = ['wallet', 'date', 'pnl', 'cumulative_pnl', 'trades']
+    list_filter = ['date']
+    search_fields = ['wallet__user__username']
+    ordering = ['-date']
+
+@admin.register(WalletBreakdown)
+class WalletBreakdownAdmin(admin.ModelAdmin):
+    list_display = ['wallet', 'kind', 'key', 'count', 'wins', 'losses', 'total_pnl']
+    list_filter = ['kind']
+    search_fields = ['wallet__user__username', 'key']
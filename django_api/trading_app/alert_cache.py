@@ -0,0 +1,59 @@
+# trading_app/alert_cache.py
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import RadarAlert
+
+ALERT_VERSION_KEY = 'radar_alerts:version'
+ALERT_WATERMARK_KEY = 'radar_alerts:watermark'
+ALERT_WATERMARK_CHECKED_KEY = 'radar_alerts:watermark_checked'
+
+# The radar engine upserts alerts with raw SQL, which sends no signals, so at
+# most once per this many seconds a request compares today's alert watermark
+# with the last one seen and bumps the version if it moved
+WATERMARK_RECHECK_SECONDS = 15
+
+# Cached responses are keyed by version, so this only bounds memory use
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+
+def bump_alert_version():
+    """Invalidate every response cached against the alert version."""
+    try:
+        cache.incr(ALERT_VERSION_KEY)
+    except ValueError:
+        # Key missing (first write, or evicted): any new value invalidates
+        cache.set(ALERT_VERSION_KEY, int(timezone.now().timestamp() * 1000), None)
+
+
+def get_alert_version():
+    """
+    Return the current alert version. Does no database work except for the
+    periodic watermark check that catches writes made outside Django.
+    """
+    if cache.add(ALERT_WATERMARK_CHECKED_KEY, True, WATERMARK_RECHECK_SECONDS):
+        today = timezone.now().date()
+        watermark = RadarAlert.objects.filter(timestamp__date=today).aggregate(
+            latest=Max('updated_at'), count=Count('id')
+        )
+        watermark = (str(today), watermark['count'], str(watermark['latest']))
+        if cache.get(ALERT_WATERMARK_KEY) != watermark:
+            cache.set(ALERT_WATERMARK_KEY, watermark, None)
+            bump_alert_version()
+
+    version = cache.get(ALERT_VERSION_KEY)
+    if version is None:
+        bump_alert_version()
+        version = cache.get(ALERT_VERSION_KEY)
+    return version
+
+
+def screener_cache_key(today, version):
+    return f'screener_status:{today}:{version}'
+
+
+def screener_etag(request):
+    """ETag for get_screener_with_entry_status: changes with the day and alert version."""
+    return f'screener-{timezone.now().date()}-{get_alert_version()}'
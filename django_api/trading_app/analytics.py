@@ -0,0 +1,195 @@
+# trading_app/analytics.py
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Avg, Count, F, Q, Sum
+from django.utils import timezone
+
+from . import metrics
+from .models import VirtualTrade, WalletBreakdown, WalletDailyPnl, WalletStats
+
+# Number of most recent equity-curve points returned by the dashboard
+EQUITY_CURVE_DAYS = 365
+
+
+def calculate_streaks(pnl_values):
+    """
+    Calculate current and longest win/loss streaks from P&L values
+    ordered by exit time. Break-even trades (pnl == 0) and missing P&L
+    values are skipped without resetting the running streak.
+    """
+    last_result = None
+    current_win = current_loss = longest_win = longest_loss = 0
+    for pnl in pnl_values:
+        if pnl is None:
+            continue
+        if pnl > 0:
+            current_win = current_win + 1 if last_result == 'win' else 1
+            longest_win = max(longest_win, current_win)
+            current_loss = 0
+            last_result = 'win'
+        elif pnl < 0:
+            current_loss = current_loss + 1 if last_result == 'loss' else 1
+            longest_loss = max(longest_loss, current_loss)
+            current_win = 0
+            last_result = 'loss'
+    return {
+        'current_win': current_win,
+        'current_loss': current_loss,
+        'longest_win': longest_win,
+        'longest_loss': longest_loss,
+    }
+
+
+def summarize_pnl(queryset):
+    """
+    Win/loss counts, total P&L and average profit/loss for a queryset of closed trades,
+    computed in a single aggregate query.
+    """
+    return queryset.aggregate(
+        total=Count('id'),
+        wins=Count('id', filter=Q(pnl__gt=0)),
+        losses=Count('id', filter=Q(pnl__lt=0)),
+        avg_profit=Avg('pnl', filter=Q(pnl__gt=0)),
+        avg_loss=Avg('pnl', filter=Q(pnl__lt=0)),
+        total_pnl=Sum('pnl'),
+    )
+
+
+def most_traded(queryset, symbol_field, limit=5):
+    """Most frequently traded symbols, counted in the database."""
+    rows = queryset.exclude(**{f'{symbol_field}__isnull': True}).values(symbol_field).annotate(
+        count=Count('id')
+    ).order_by('-count', symbol_field)[:limit]
+    return [{'symbol': row[symbol_field], 'count': row['count']} for row in rows]
+
+
+# --- Wallet performance snapshot ---
+
+def record_closed_trade(trade):
+    """
+    Fold a trade that has just been saved as CLOSED into its wallet's
+    WalletStats, daily P&L and strategy/symbol breakdowns. Call exactly once
+    per closure, from every code path that closes a trade.
+    """
+    if trade.pnl is None:
+        return
+
+    with metrics.DB_WRITE_SECONDS.labels(operation='record_closed_trade').time(), transaction.atomic():
+        # Lock the wallet's stats row so concurrent closures serialize
+        stats, created = WalletStats.objects.select_for_update().get_or_create(wallet_id=trade.wallet_id)
+        if created and VirtualTrade.objects.filter(
+            wallet_id=trade.wallet_id, status='CLOSED'
+        ).exclude(pk=trade.pk).exists():
+            # First closure seen for a wallet with history: build everything from scratch
+            rebuild_wallet_stats(trade.wallet_id)
+            return
+
+        stats.add_trade(trade)
+        stats.save()
+
+        exit_time = trade.exit_time or timezone.now()
+        add_daily_pnl(trade.wallet_id, timezone.localtime(exit_time).date(), trade.pnl)
+
+        strategy = trade.alert.source_strategy if trade.alert_id else 'Unknown'
+        add_to_breakdown(trade.wallet_id, 'STRATEGY', strategy, trade.pnl)
+        add_to_breakdown(trade.wallet_id, 'SYMBOL', trade.tradingsymbol, trade.pnl)
+
+
+def add_daily_pnl(wallet_id, day, pnl):
+    """Add realized P&L to a wallet's equity-curve row for ``day``."""
+    row = WalletDailyPnl.objects.filter(wallet_id=wallet_id, date=day).first()
+    if row:
+        WalletDailyPnl.objects.filter(pk=row.pk).update(
+            pnl=F('pnl') + pnl, cumulative_pnl=F('cumulative_pnl') + pnl, trades=F('trades') + 1
+        )
+    else:
+        previous = WalletDailyPnl.objects.filter(wallet_id=wallet_id, date__lt=day).order_by('-date').values_list(
+            'cumulative_pnl', flat=True
+        ).first() or Decimal('0.00')
+        WalletDailyPnl.objects.create(
+            wallet_id=wallet_id, date=day, pnl=pnl, cumulative_pnl=previous + pnl, trades=1
+        )
+    # Back-dated closures shift the running total of every later day
+    WalletDailyPnl.objects.filter(wallet_id=wallet_id, date__gt=day).update(
+        cumulative_pnl=F('cumulative_pnl') + pnl
+    )
+
+
+def add_to_breakdown(wallet_id, kind, key, pnl):
+    """Increment a wallet's per-strategy or per-symbol counters."""
+    key = key or 'Unknown'
+    wins, losses = int(pnl > 0), int(pnl < 0)
+    updated = WalletBreakdown.objects.filter(wallet_id=wallet_id, kind=kind, key=key).update(
+        count=F('count') + 1,
+        wins=F('wins') + wins,
+        losses=F('losses') + losses,
+        total_pnl=F('total_pnl') + pnl,
+    )
+    if not updated:
+        WalletBreakdown.objects.create(
+            wallet_id=wallet_id, kind=kind, key=key, count=1, wins=wins, losses=losses, total_pnl=pnl
+        )
+
+
+def rebuild_wallet_stats(wallet_id):
+    """
+    Recompute a wallet's WalletStats, daily P&L and breakdowns from its full
+    CLOSED trade history. Used for backfills and for wallets that predate the
+    snapshot tables.
+    """
+    with transaction.atomic():
+        WalletStats.objects.filter(wallet_id=wallet_id).delete()
+        WalletDailyPnl.objects.filter(wallet_id=wallet_id).delete()
+        WalletBreakdown.objects.filter(wallet_id=wallet_id).delete()
+
+        stats = WalletStats(wallet_id=wallet_id)
+        daily = defaultdict(lambda: {'pnl': Decimal('0.00'), 'trades': 0})
+        breakdowns = {}
+
+        closed_trades = VirtualTrade.objects.filter(
+            wallet_id=wallet_id, status='CLOSED', pnl__isnull=False
+        ).select_related('alert').only(
+            'id', 'pnl', 'entry_time', 'exit_time', 'tradingsymbol', 'alert__source_strategy'
+        ).order_by('exit_time', 'id')
+
+        for trade in closed_trades.iterator(chunk_size=2000):
+            stats.add_trade(trade)
+            day = timezone.localtime(trade.exit_time or timezone.now()).date()
+            daily[day]['pnl'] += trade.pnl
+            daily[day]['trades'] += 1
+            for kind, key in (('STRATEGY', trade.alert.source_strategy), ('SYMBOL', trade.tradingsymbol)):
+                row = breakdowns.setdefault((kind, key or 'Unknown'), {
+                    'count': 0, 'wins': 0, 'losses': 0, 'total_pnl': Decimal('0.00')
+                })
+                row['count'] += 1
+                row['wins'] += int(trade.pnl > 0)
+                row['losses'] += int(trade.pnl < 0)
+                row['total_pnl'] += trade.pnl
+
+        stats.save()
+
+        cumulative = Decimal('0.00')
+        daily_rows = []
+        for day in sorted(daily):
+            cumulative += daily[day]['pnl']
+            daily_rows.append(WalletDailyPnl(
+                wallet_id=wallet_id, date=day, pnl=daily[day]['pnl'],
+                cumulative_pnl=cumulative, trades=daily[day]['trades']
+            ))
+        WalletDailyPnl.objects.bulk_create(daily_rows, batch_size=1000)
+        WalletBreakdown.objects.bulk_create([
+            WalletBreakdown(wallet_id=wallet_id, kind=kind, key=key, **values)
+            for (kind, key), values in breakdowns.items()
+        ], batch_size=1000)
+    return stats
+
+
+def get_wallet_stats(wallet):
+    """Return the wallet's WalletStats, building it from history if missing."""
+    try:
+        return wallet.stats
+    except WalletStats.DoesNotExist:
+        return rebuild_wallet_stats(wallet.id)
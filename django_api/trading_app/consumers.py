@@ -5,14 +5,19 @@ import asyncio
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.utils import timezone
+from django.core.cache import cache
 from decimal import Decimal
 from .models import VirtualTrade, VirtualWallet, UserProfile
+from .price_bus import PRICE_GROUP, PRICE_INDEX_KEY, encode_batch, instrument_group, price_state_key
 from django.contrib.auth.models import User
 import logging
 import re
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on instrument subscriptions per price connection
+MAX_PRICE_SUBSCRIPTIONS = 500
+
 class TradingConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for real-time trading updates"""
     
@@ -89,12 +94,10 @@ class TradingConsumer(AsyncWebsocketConsumer):
     
     async def price_update(self, event):
         """Handle price updates"""
-        print(f"PriceConsumer: Sending price update to frontend: {event['data']}")  # DEBUG
         await self.send(text_data=json.dumps({
             'type': 'price_update',
             'data': event['data']
         }))
-        print(f"PriceConsumer: Price update sent successfully")  # DEBUG
     
     @database_sync_to_async
     def get_wallet_data(self):
@@ -173,27 +176,26 @@ class TradingConsumer(AsyncWebsocketConsumer):
 
 
 class PriceConsumer(AsyncWebsocketConsumer):
-    """WebSocket consumer for real-time price updates"""
+    """
+    WebSocket consumer for real-time price updates.
+
+    Clients receive nothing until they subscribe:
+        {"type": "subscribe", "instrument_keys": ["NSE_EQ|INE002A01018", ...]}
+        {"type": "unsubscribe", "instrument_keys": [...]}
+    Each key maps to its own Channels group, so a connection only gets the
+    instruments it displays. The key '*' subscribes to every instrument.
+    """
     
     async def connect(self):
-        print("[PriceConsumer] connect() called")
-        # Join the prices group to receive broadcast messages
-        await self.channel_layer.group_add(
-            "prices",
-            self.channel_name
-        )
-        print(f"[PriceConsumer] Joined group 'prices' with channel {self.channel_name}")
+        self.subscriptions = set()
         await self.accept()
-        print("[PriceConsumer] WebSocket accepted")
     
     async def disconnect(self, close_code):
-        print(f"[PriceConsumer] disconnect() called, code {close_code}")
-        # Leave the prices group
-        await self.channel_layer.group_discard(
-            "prices",
-            self.channel_name
-        )
-        print(f"[PriceConsumer] Left group 'prices' with channel {self.channel_name}")
+        # Leave every subscribed group
+        for instrument_key in self.subscriptions:
+            await self.channel_layer.group_discard(self.group_for(instrument_key), self.channel_name)
+        logger.debug(f"PriceConsumer disconnected with {len(self.subscriptions)} subscriptions, code {close_code}")
+        self.subscriptions = set()
     
     async def receive(self, text_data):
         """Handle incoming messages"""
@@ -203,21 +205,60 @@ class PriceConsumer(AsyncWebsocketConsumer):
             
             if message_type == 'ping':
                 await self.send(text_data=json.dumps({'type': 'pong'}))
+            elif message_type in ('subscribe', 'unsubscribe'):
+                instrument_keys = data.get('instrument_keys')
+                if not isinstance(instrument_keys, list) or not all(isinstance(k, str) for k in instrument_keys):
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'message': 'instrument_keys must be a list of strings'
+                    }))
+                elif message_type == 'subscribe':
+                    await self.subscribe(instrument_keys)
+                else:
+                    await self.unsubscribe(instrument_keys)
                 
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
                 'type': 'error',
                 'message': 'Invalid JSON'
             }))
+
+    def group_for(self, instrument_key):
+        return PRICE_GROUP if instrument_key == '*' else instrument_group(instrument_key)
+
+    async def subscribe(self, instrument_keys):
+        """Join the groups for new keys and send their latest full quotes"""
+        new_keys = [k for k in dict.fromkeys(instrument_keys) if k not in self.subscriptions]
+        new_keys = new_keys[:max(MAX_PRICE_SUBSCRIPTIONS - len(self.subscriptions), 0)]
+        for instrument_key in new_keys:
+            await self.channel_layer.group_add(self.group_for(instrument_key), self.channel_name)
+        self.subscriptions.update(new_keys)
+
+        # Batches carry only changed fields, so start the client from the latest full state
+        if '*' in new_keys:
+            keys = sorted(await cache.aget(PRICE_INDEX_KEY) or ())
+        else:
+            keys = new_keys
+        state = await cache.aget_many([price_state_key(k) for k in keys])
+        quotes = [state[price_state_key(k)] for k in keys if price_state_key(k) in state]
+        if quotes:
+            await self.send(text_data=encode_batch(quotes, snapshot=True))
+
+    async def unsubscribe(self, instrument_keys):
+        for instrument_key in set(instrument_keys) & self.subscriptions:
+            await self.channel_layer.group_discard(self.group_for(instrument_key), self.channel_name)
+            self.subscriptions.discard(instrument_key)
     
     async def price_update(self, event):
-        print(f"[PriceConsumer] price_update() called with event: {event}")
-        """Handle price updates from Upstox WebSocket"""
+        """Handle single price updates from Upstox WebSocket"""
         await self.send(text_data=json.dumps({
             'type': 'price_update',
             'data': event['data']
         }))
-        print(f"[PriceConsumer] Sent price update to frontend: {event['data']}")
+
+    async def price_batch(self, event):
+        """Forward a coalesced price batch; it is already JSON-encoded by PriceBus"""
+        await self.send(text_data=event['text'])
     
     async def trade_executed(self, event):
         """Handle trade execution notifications"""
@@ -0,0 +1,46 @@
+# trading_app/feed_replay.py
+"""
+Capture and replay raw Upstox Market Data Feed V3 frames.
+
+A capture file is a sequence of records, each a 4-byte big-endian length
+followed by one binary FeedResponse frame exactly as received. Record one
+with ``run_market_gateway --capture PATH`` and publish it again through a
+gateway with ``replay_feed PATH`` or replay_frames() in tests.
+"""
+
+import struct
+
+_LENGTH = struct.Struct('>I')
+
+
+def write_frame(file, frame):
+    file.write(_LENGTH.pack(len(frame)))
+    file.write(frame)
+
+
+def read_frames(path):
+    """Yield the frames of a capture file in order"""
+    with open(path, 'rb') as file:
+        while True:
+            header = file.read(_LENGTH.size)
+            if not header:
+                return
+            if len(header) < _LENGTH.size:
+                raise ValueError(f"Truncated record header in {path}")
+            (length,) = _LENGTH.unpack(header)
+            frame = file.read(length)
+            if len(frame) < length:
+                raise ValueError(f"Truncated frame in {path}")
+            yield frame
+
+
+async def replay_frames(gateway, frames):
+    """
+    Publish frames through a MarketDataGateway as if they had arrived from
+    upstream, then flush the pending price batch. Returns the number of ticks.
+    """
+    ticks = 0
+    for frame in frames:
+        ticks += await gateway.process_frame(frame)
+    await gateway.price_bus.aflush()
+    return ticks
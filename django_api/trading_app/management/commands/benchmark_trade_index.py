@@ -0,0 +1,74 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from trading_app.trade_index import OpenTrade, OpenTradeIndex
+
+
+class Command(BaseCommand):
+    help = 'Benchmark exit detection on synthetic open trades: OpenTradeIndex vs a linear scan per tick'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trades', type=int, default=10000, help='Open trades to index')
+        parser.add_argument('--instruments', type=int, default=200, help='Instruments the trades are spread over')
+        parser.add_argument('--ticks', type=int, default=5000, help='Ticks to process per run')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        keys = [f'NSE_EQ|SYM{i}' for i in range(options['instruments'])]
+        base = {key: rng.uniform(100, 3000) for key in keys}
+
+        trades = []
+        for trade_id in range(1, options['trades'] + 1):
+            key = rng.choice(keys)
+            entry = base[key]
+            trades.append(OpenTrade(
+                id=trade_id, instrument_key=key, tradingsymbol=key.split('|')[1], username='bench',
+                entry_time=now - timedelta(minutes=rng.uniform(0, 23 * 60)),
+                target_price=Decimal(f'{entry * rng.uniform(1.01, 1.05):.2f}'),
+                stop_loss=Decimal(f'{entry * rng.uniform(0.95, 0.99):.2f}'),
+            ))
+        # Mostly quiet ticks, as in a live feed
+        ticks = []
+        for _ in range(options['ticks']):
+            key = rng.choice(keys)
+            ticks.append((key, Decimal(f'{base[key] * rng.uniform(0.985, 1.015):.2f}')))
+
+        started = time.perf_counter()
+        index = OpenTradeIndex(trades)
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        indexed_hits = sum(len(index.triggered(key, price, now)) for key, price in ticks)
+        indexed_seconds = time.perf_counter() - started
+
+        by_instrument = {}
+        for trade in trades:
+            by_instrument.setdefault(trade.instrument_key, []).append(trade)
+        cutoff = now - timedelta(hours=24)
+        started = time.perf_counter()
+        linear_hits = sum(
+            1
+            for key, price in ticks
+            for trade in by_instrument.get(key, ())
+            if price >= trade.target_price or price <= trade.stop_loss or trade.entry_time < cutoff
+        )
+        linear_seconds = time.perf_counter() - started
+
+        self.stdout.write(f'{len(trades)} trades over {len(keys)} instruments, {len(ticks)} ticks')
+        self.stdout.write(f'Index build: {build_seconds * 1000:.1f} ms')
+        for label, seconds, hits in (('Index', indexed_seconds, indexed_hits), ('Linear scan', linear_seconds, linear_hits)):
+            self.stdout.write(
+                f'{label}: {seconds * 1000:.1f} ms total, {seconds / len(ticks) * 1e6:.1f} us/tick, '
+                f'{len(ticks) / seconds:,.0f} ticks/s, {hits} exits'
+            )
+        if indexed_hits != linear_hits:
+            self.stdout.write(self.style.ERROR('Index and linear scan disagree'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Speed-up: {linear_seconds / indexed_seconds:.1f}x'))
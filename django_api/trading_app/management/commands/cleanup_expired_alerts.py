@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from trading_app.models import RadarAlert
+from trading_app.alert_cache import bump_alert_version
 from datetime import timedelta
 
 class Command(BaseCommand):
@@ -42,7 +43,9 @@ class Command(BaseCommand):
                 for alert in expired_alerts[:5]:  # Show first 5
                     self.stdout.write(f'  - {alert.instrument_key} (expired at {alert.expires_at})')
             else:
-                count = expired_alerts.update(status='EXPIRED')
+                count = expired_alerts.update(status='EXPIRED', updated_at=now)
+                # Bulk updates send no post_save, so invalidate cached alert responses here
+                bump_alert_version()
                 self.stdout.write(
                     self.style.SUCCESS(f'Marked {count} alerts as expired')
                 )
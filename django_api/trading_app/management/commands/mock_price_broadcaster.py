@@ -1,15 +1,14 @@
 import time
 import random
 from django.core.management.base import BaseCommand
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from trading_app.models import RadarAlert
+from trading_app.price_bus import PriceBus, price_quote
 
 class Command(BaseCommand):
-    help = "Broadcasts mock price updates to the 'prices' WebSocket group for current alert stocks."
+    help = "Broadcasts mock price updates on the price bus for current alert stocks."
 
     def handle(self, *args, **options):
-        channel_layer = get_channel_layer()
+        price_bus = PriceBus()
         print("Starting mock price broadcaster for current alert stocks. Press Ctrl+C to stop.")
         
         # Fetch current alert stocks from the database
@@ -32,20 +31,13 @@ class Command(BaseCommand):
                     change = random.uniform(-5, 5)
                     prices[inst["instrument_key"]] += change
                     prices[inst["instrument_key"]] = max(1, prices[inst["instrument_key"]])
-                    data = {
-                        "instrument_key": inst["instrument_key"],
-                        "tradingsymbol": inst["tradingsymbol"],
-                        "current_price": round(prices[inst["instrument_key"]], 2),
-                        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-                    }
-                    async_to_sync(channel_layer.group_send)(
-                        "prices",
-                        {
-                            "type": "price_update",
-                            "data": data,
-                        }
-                    )
-                    print(f"Sent price update: {data}")
+                    price_bus.add(price_quote(
+                        inst["instrument_key"],
+                        prices[inst["instrument_key"]],
+                        tradingsymbol=inst["tradingsymbol"],
+                    ))
+                # One batch per cycle instead of one message per instrument
+                price_bus.flush()
                 time.sleep(2)
         except KeyboardInterrupt:
             print("Mock price broadcaster stopped.") 
\ No newline at end of file
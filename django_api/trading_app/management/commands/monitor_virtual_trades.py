@@ -7,6 +7,9 @@ from decimal import Decimal
 import requests
 import time
 from trading_app.models import VirtualTrade, VirtualWallet, UserProfile
+from trading_app.analytics import record_closed_trade
+from trading_app.market_gateway import get_last_prices
+from trading_app.trade_index import OpenTrade, OpenTradeIndex
 from django.contrib.auth.models import User
 
 
@@ -42,24 +45,34 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING('No open virtual trades found.'))
             return
         
-        self.stdout.write(f'Found {open_trades.count()} open trades to monitor.')
+        trades = {trade.id: trade for trade in open_trades.select_related('wallet__user')}
+        index = OpenTradeIndex(OpenTrade.from_trade(trade) for trade in trades.values())
+        
+        self.stdout.write(
+            f'Found {len(trades)} open trades across {len(index.instrument_keys())} instruments to monitor.'
+        )
         
         closed_count = 0
         error_count = 0
         
-        for trade in open_trades:
-            try:
-                result = self.process_trade(trade, dry_run)
-                if result == 'closed':
-                    closed_count += 1
-                elif result == 'error':
+        # One price per instrument; the index returns only the trades that exit at it
+        for instrument_key in index.instrument_keys():
+            current_price = self.get_current_price(instrument_key)
+            if current_price is None:
+                error_count += len(index.trades_for(instrument_key))
+                continue
+            
+            for open_trade, exit_price, exit_reason in index.triggered(instrument_key, current_price):
+                try:
+                    result = self.process_trade(trades[open_trade.id], exit_price, exit_reason, dry_run)
+                    if result == 'closed':
+                        closed_count += 1
+                        
+                except Exception as e:
+                    self.stdout.write(
+                        self.style.ERROR(f'Error processing trade {open_trade.id}: {str(e)}')
+                    )
                     error_count += 1
-                    
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'Error processing trade {trade.id}: {str(e)}')
-                )
-                error_count += 1
         
         self.stdout.write(
             self.style.SUCCESS(
@@ -67,19 +80,8 @@ class Command(BaseCommand):
             )
         )
 
-    def process_trade(self, trade, dry_run=False):
-        """Process a single trade - check if it should be closed"""
-        
-        # Get current market price
-        current_price = self.get_current_price(trade.instrument_key)
-        if current_price is None:
-            return 'error'
-        
-        # Check if trade should be closed
-        should_close, exit_price, exit_reason = self.should_close_trade(trade, current_price)
-        
-        if not should_close:
-            return 'no_action'
+    def process_trade(self, trade, exit_price, exit_reason, dry_run=False):
+        """Close a trade the index found triggered"""
         
         if dry_run:
             self.stdout.write(
@@ -123,6 +125,9 @@ class Command(BaseCommand):
             
             wallet.save()
             
+            # Update the wallet's performance snapshot
+            record_closed_trade(trade)
+            
             self.stdout.write(
                 self.style.SUCCESS(
                     f'Closed trade {trade.id} ({trade.tradingsymbol}) '
@@ -132,28 +137,15 @@ class Command(BaseCommand):
             
         return 'closed'
 
-    def should_close_trade(self, trade, current_price):
-        """Determine if a trade should be closed based on current price"""
-        
-        # Check target price
-        if trade.target_price and current_price >= trade.target_price:
-            return True, trade.target_price, 'Target hit'
-        
-        # Check stop loss
-        if trade.stop_loss and current_price <= trade.stop_loss:
-            return True, trade.stop_loss, 'Stop loss hit'
-        
-        # Check if trade has been open for too long (optional - 24 hours)
-        time_open = timezone.now() - trade.entry_time
-        if time_open.total_seconds() > 24 * 60 * 60:  # 24 hours
-            return True, current_price, 'Time limit exceeded (24h)'
-        
-        return False, None, None
-
     def get_current_price(self, instrument_key):
         """Get current market price for an instrument"""
         try:
-            # Try to get price from Upstox API first
+            # A recent tick from the market data gateway, if one is running
+            price = get_last_prices([instrument_key]).get(instrument_key)
+            if price is not None:
+                return price
+            
+            # Otherwise ask the Upstox API
             price = self.get_upstox_price(instrument_key)
             if price is not None:
                 return price
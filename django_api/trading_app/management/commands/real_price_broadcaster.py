@@ -2,9 +2,9 @@ import time
 import sys
 import os
 from django.core.management.base import BaseCommand
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from trading_app.models import RadarAlert
+from trading_app.market_gateway import INTEREST_HEARTBEAT, declare_interest
+from trading_app.price_bus import DEFAULT_WINDOW, PriceBus, price_quote
 import logging
 
 # Add the radar engine path for Upstox client
@@ -15,8 +15,25 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = "Broadcasts real-time price updates from Upstox API for current alert stocks."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window-ms',
+            type=int,
+            default=int(DEFAULT_WINDOW * 1000),
+            help='Coalescing window for batched price messages, in milliseconds',
+        )
+        parser.add_argument(
+            '--poll',
+            action='store_true',
+            help='Poll 1-minute candles from the Upstox API instead of using the market data gateway',
+        )
+
     def handle(self, *args, **options):
-        channel_layer = get_channel_layer()
+        if not options['poll']:
+            self.declare_alert_instruments()
+            return
+        
+        price_bus = PriceBus(window=options['window_ms'] / 1000)
         print("🚀 Starting real-time price broadcaster for alert stocks. Press Ctrl+C to stop.")
         
         try:
@@ -79,38 +96,30 @@ class Command(BaseCommand):
                             else:
                                 price_change_pct = 0
                             
-                            data = {
-                                "instrument_key": inst["instrument_key"],
-                                "tradingsymbol": inst["tradingsymbol"],
-                                "current_price": round(float(latest_price), 2),
-                                "price_change": round(float(price_change), 2),
-                                "price_change_pct": round(float(price_change_pct), 2),
-                                "volume": int(latest_volume),
-                                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-                            }
+                            data = price_quote(
+                                inst["instrument_key"],
+                                latest_price,
+                                tradingsymbol=inst["tradingsymbol"],
+                                price_change=round(float(price_change), 2),
+                                price_change_pct=round(float(price_change_pct), 2),
+                                volume=int(latest_volume),
+                            )
                             
                             # Only send if price changed significantly or it's a new stock
                             cache_key = inst["instrument_key"]
                             if (cache_key not in price_cache or 
                                 abs(price_cache[cache_key] - latest_price) > 0.01):
-                            
-                                print(f"📡 Broadcasting price for {inst['tradingsymbol']}: ₹{latest_price:.2f}")
-                                
-                                async_to_sync(channel_layer.group_send)(
-                                    "prices",
-                                    {
-                                        "type": "price_update",
-                                        "data": data,
-                                    }
-                                )
-                                print(f"✅ Sent price update to Redis channel layer for {inst['tradingsymbol']}")
+                                # Queued; published with the rest of the window as one batch
+                                price_bus.add(data)
                                 
                                 # Update cache
                                 price_cache[cache_key] = latest_price
                                 
                                 # Log significant price changes
                                 if abs(price_change_pct) > 0.5:
-                                    print(f"📈 {inst['tradingsymbol']}: ₹{latest_price:.2f} ({price_change_pct:+.2f}%)")
+                                    logger.info(f"{inst['tradingsymbol']}: ₹{latest_price:.2f} ({price_change_pct:+.2f}%)")
+                        
+                        price_bus.maybe_flush()
                         
                         # Rate limiting to avoid API overload
                         time.sleep(0.5)
@@ -119,6 +128,8 @@ class Command(BaseCommand):
                         logger.error(f"Error fetching price for {inst['tradingsymbol']}: {e}")
                         continue
                 
+                price_bus.flush()
+                
                 # Wait before next cycle
                 time.sleep(5)  # Update every 5 seconds
                 
@@ -126,4 +137,20 @@ class Command(BaseCommand):
             print("\n🛑 Real-time price broadcaster stopped.")
         except Exception as e:
             logger.error(f"Unexpected error in price broadcaster: {e}")
-            print(f"❌ Error: {e}") 
\ No newline at end of file
+            print(f"❌ Error: {e}") 
+
+    def declare_alert_instruments(self):
+        """
+        Keep the market data gateway subscribed to the active alert stocks; the
+        gateway publishes their prices on the price bus, so nothing is fetched here.
+        """
+        print("🚀 Streaming alert stock prices through the market data gateway. Press Ctrl+C to stop.")
+        try:
+            while True:
+                instrument_keys = list(
+                    RadarAlert.objects.filter(status='ACTIVE').values_list('instrument_key', flat=True).distinct()
+                )
+                declare_interest('alert-prices', instrument_keys)
+                time.sleep(INTEREST_HEARTBEAT)
+        except KeyboardInterrupt:
+            print("\n🛑 Real-time price broadcaster stopped.")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from trading_app.models import VirtualWallet
+from trading_app.analytics import rebuild_wallet_stats
+
+class Command(BaseCommand):
+    help = 'Rebuild per-wallet performance snapshots (WalletStats, daily P&L, breakdowns) from closed trades'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--wallet-id',
+            type=int,
+            help='Rebuild the snapshot for a specific wallet only',
+        )
+
+    def handle(self, *args, **options):
+        wallets = VirtualWallet.objects.all()
+        if options.get('wallet_id'):
+            wallets = wallets.filter(id=options['wallet_id'])
+
+        for wallet in wallets:
+            stats = rebuild_wallet_stats(wallet.id)
+            self.stdout.write(f'Rebuilt wallet {wallet.id}: {stats.closed_trades} closed trades')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {wallets.count()} wallet snapshots'))
@@ -0,0 +1,17 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from trading_app.feed_replay import read_frames, replay_frames
+from trading_app.market_gateway import MarketDataGateway
+
+
+class Command(BaseCommand):
+    help = 'Publish a captured Upstox V3 feed file to gateway consumers as if it came from upstream'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Capture file written by run_market_gateway --capture')
+
+    def handle(self, *args, **options):
+        ticks = asyncio.run(replay_frames(MarketDataGateway(), read_frames(options['path'])))
+        self.stdout.write(self.style.SUCCESS(f'Replayed {ticks} ticks'))
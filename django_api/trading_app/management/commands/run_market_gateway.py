@@ -0,0 +1,54 @@
+import asyncio
+import logging
+
+from django.core.management.base import BaseCommand
+
+from trading_app import metrics
+from trading_app.market_gateway import MarketDataGateway
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run the market data gateway: the single upstream feed connection shared by every consumer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--instruments',
+            nargs='*',
+            default=[],
+            help='Instrument keys to keep subscribed regardless of consumer interest',
+        )
+        parser.add_argument(
+            '--feed-uri',
+            help='Connect to this feed URI instead of authorizing with Upstox (e.g. a local fake feed)',
+        )
+        parser.add_argument(
+            '--capture',
+            metavar='PATH',
+            help='Append every received feed frame to PATH for replay_feed',
+        )
+        parser.add_argument(
+            '--metrics-port',
+            type=int,
+            default=0,
+            help='Serve Prometheus metrics on localhost at this port (0 = off)',
+        )
+
+    def handle(self, *args, **options):
+        gateway = MarketDataGateway(feed_uri=options.get('feed_uri'), static_keys=options['instruments'])
+        if options['metrics_port']:
+            metrics.start_metrics_server(options['metrics_port'])
+        self.stdout.write(self.style.SUCCESS('Starting market data gateway...'))
+        try:
+            if options.get('capture'):
+                with open(options['capture'], 'ab') as capture:
+                    gateway.capture = capture
+                    asyncio.run(gateway.run())
+            else:
+                asyncio.run(gateway.run())
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Market data gateway stopped.'))
+        except Exception as e:
+            logger.error(f'Market data gateway error: {e}')
+            self.stdout.write(self.style.ERROR(f'Error running market data gateway: {e}'))
@@ -0,0 +1,352 @@
+# trading_app/market_gateway.py
+"""
+Market data gateway: the one process holding the upstream Upstox feed
+connection. Other subsystems declare the instruments they need and receive
+normalized data over the channel layer (Redis in production) instead of
+opening their own feed or polling REST quotes.
+
+Groups:
+    md.control  consumers -> gateway
+                {"type": "md.interest", "consumer": name, "instrument_keys": [...]}
+    md.ticks    gateway -> consumers, one message per upstream frame
+                {"type": "md.ticks", "ticks": [tick, ...]}
+                {"type": "md.hello"} when a gateway starts (consumers re-declare)
+    md.bars     gateway -> consumers, bars completed by the frame
+                {"type": "md.bars", "bars": [bar, ...]}
+
+A tick is an upstox_feed.decode_feed_ticks() item; a bar is
+{instrument_key, start (epoch ms), open, high, low, close, volume}.
+
+The gateway also caches the latest tick per instrument (get_last_prices)
+and publishes every tick on the price bus for browsers.
+"""
+
+import asyncio
+import logging
+import time
+from decimal import Decimal
+
+import websockets
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from google.protobuf.message import DecodeError
+
+from . import metrics
+from .feed_replay import write_frame
+from .models import UserProfile
+from .price_bus import PriceBus, price_quote
+from .upstox_feed import SUBSCRIPTION_BATCH_SIZE, authorize_feed, decode_feed_ticks, feed_request
+
+logger = logging.getLogger(__name__)
+
+CONTROL_GROUP = 'md.control'
+TICK_GROUP = 'md.ticks'
+BAR_GROUP = 'md.bars'
+
+# A consumer's interest lapses unless re-declared within this many seconds
+INTEREST_TTL = 90
+INTEREST_HEARTBEAT = 30
+
+# Seconds of interest changes folded into one round of sub/unsub requests
+SUBSCRIPTION_WINDOW = 0.5
+
+# Cached ticks older than this are not served as current prices
+LTP_CACHE_TIMEOUT = 60
+
+BAR_INTERVAL_MS = 60 * 1000
+
+
+def ltp_cache_key(instrument_key):
+    # Index keys contain spaces (e.g. 'NSE_INDEX|Nifty 50')
+    return f"md:ltp:{instrument_key.replace(' ', '_')}"
+
+
+def get_last_prices(instrument_keys):
+    """Latest gateway price per instrument, for those with a tick in the last LTP_CACHE_TIMEOUT seconds"""
+    cached = cache.get_many([ltp_cache_key(key) for key in instrument_keys])
+    return {tick['instrument_key']: Decimal(str(tick['ltp'])) for tick in cached.values()}
+
+
+def quote_from_tick(tick):
+    """Price bus quote for a tick; the change is measured against the previous close"""
+    ltp, cp = tick['ltp'], tick['cp']
+    return price_quote(
+        tick['instrument_key'],
+        ltp,
+        price_change=round(ltp - cp, 2) if cp else 0.0,
+        price_change_pct=round((ltp - cp) / cp * 100, 2) if cp else 0.0,
+    )
+
+
+class BarAggregator:
+    """
+    Fold ticks into fixed-interval bars on each tick's last-trade time.
+    Volume is the sum of last-traded quantities seen, so it undercounts
+    trades that fell between ticks.
+    """
+
+    def __init__(self, interval_ms=BAR_INTERVAL_MS):
+        self.interval_ms = interval_ms
+        self.bars = {}  # instrument_key -> bar in progress
+
+    def add(self, tick):
+        """Apply a tick; returns the instrument's previous bar if this tick closed it"""
+        key = tick['instrument_key']
+        ltt = tick['ltt'] or int(time.time() * 1000)
+        start = ltt - ltt % self.interval_ms
+        price = tick['ltp']
+
+        bar = self.bars.get(key)
+        if bar is not None and start == bar['start']:
+            bar['high'] = max(bar['high'], price)
+            bar['low'] = min(bar['low'], price)
+            bar['close'] = price
+            bar['volume'] += tick['ltq']
+            return None
+        if bar is not None and start < bar['start']:
+            # Late tick for a bar already published
+            return None
+
+        self.bars[key] = {
+            'instrument_key': key, 'start': start,
+            'open': price, 'high': price, 'low': price, 'close': price,
+            'volume': tick['ltq'],
+        }
+        return bar
+
+
+class MarketDataGateway:
+    """
+    Owns the upstream V3 feed: subscribes to the union of declared interest,
+    decodes each frame once and republishes it to every consumer.
+    """
+
+    def __init__(self, channel_layer=None, feed_uri=None, static_keys=()):
+        self.channel_layer = channel_layer or get_channel_layer()
+        self.price_bus = PriceBus(channel_layer=self.channel_layer)
+        # Fixed upstream URI (e.g. a local fake feed); authorized per connection if unset
+        self.feed_uri = feed_uri
+        self.static_keys = set(static_keys)
+        self.interest = {}  # consumer -> (instrument keys, monotonic expiry)
+        self.bar_aggregator = BarAggregator()
+        self.websocket = None
+        self.subscribed = set()
+        self.subscriptions_changed = asyncio.Event()
+        # Optional binary file every received frame is appended to (see feed_replay)
+        self.capture = None
+        self.running = False
+        self.reconnect_delay = 5
+        self.max_reconnect_delay = 300
+
+    def wanted_keys(self):
+        """Union of unexpired consumer interest and the static keys; drops lapsed consumers"""
+        now = time.monotonic()
+        keys = set(self.static_keys)
+        for consumer, (consumer_keys, expires) in list(self.interest.items()):
+            if expires < now:
+                logger.info(f"Interest from {consumer} lapsed")
+                del self.interest[consumer]
+            else:
+                keys |= consumer_keys
+        return keys
+
+    def handle_interest(self, message):
+        self.interest[message['consumer']] = (set(message['instrument_keys']), time.monotonic() + INTEREST_TTL)
+        self.subscriptions_changed.set()
+
+    async def listen_for_interest(self):
+        channel = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(CONTROL_GROUP, channel)
+        try:
+            # Running consumers re-declare, so a restarted gateway resubscribes at once
+            await self.channel_layer.group_send(TICK_GROUP, {'type': 'md.hello'})
+            while True:
+                message = await self.channel_layer.receive(channel)
+                if message.get('type') == 'md.interest':
+                    self.handle_interest(message)
+        finally:
+            await self.channel_layer.group_discard(CONTROL_GROUP, channel)
+
+    @database_sync_to_async
+    def get_access_token(self):
+        user_profile = UserProfile.objects.filter(upstox_access_token__isnull=False).first()
+        return user_profile.upstox_access_token if user_profile else None
+
+    async def connect(self):
+        """Authorize (unless feed_uri is fixed) and connect to the upstream feed"""
+        try:
+            uri = self.feed_uri
+            if uri is None:
+                access_token = await self.get_access_token()
+                if not access_token:
+                    logger.error("No user profile with Upstox access token found")
+                    return False
+                uri = await sync_to_async(authorize_feed, thread_sensitive=False)(access_token)
+
+            self.websocket = await websockets.connect(uri)
+            # A new connection starts with no subscriptions
+            self.subscribed = set()
+            logger.info("Market data gateway connected to upstream feed")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to connect to upstream feed: {e}")
+            return False
+
+    async def sync_subscriptions(self):
+        """Send batched sub/unsub requests so the upstream feed covers exactly the wanted keys"""
+        if not self.websocket:
+            return
+
+        wanted = self.wanted_keys()
+        for method, keys in (('sub', wanted - self.subscribed), ('unsub', self.subscribed - wanted)):
+            keys = sorted(keys)
+            for i in range(0, len(keys), SUBSCRIPTION_BATCH_SIZE):
+                await self.websocket.send(feed_request(method, keys[i:i + SUBSCRIPTION_BATCH_SIZE]))
+            if keys:
+                logger.info(f"Sent {method} for {len(keys)} instruments")
+        self.subscribed = wanted
+
+    async def sync_subscriptions_on_change(self):
+        """Fold interest changes within SUBSCRIPTION_WINDOW into one round; also sweeps lapsed interest"""
+        while True:
+            try:
+                await asyncio.wait_for(self.subscriptions_changed.wait(), INTEREST_HEARTBEAT)
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.sleep(SUBSCRIPTION_WINDOW)
+            self.subscriptions_changed.clear()
+            try:
+                await self.sync_subscriptions()
+            except Exception as e:
+                logger.error(f"Failed to update feed subscriptions: {e}")
+
+    async def process_frame(self, frame):
+        """Decode one upstream frame and republish it. Returns the number of ticks."""
+        start = time.perf_counter()
+        ticks = decode_feed_ticks(frame)
+        if not ticks:
+            return 0
+        metrics.MD_TICKS_DECODED.inc(len(ticks))
+
+        await self.channel_layer.group_send(TICK_GROUP, {'type': 'md.ticks', 'ticks': ticks})
+        await cache.aset_many({ltp_cache_key(t['instrument_key']): t for t in ticks}, LTP_CACHE_TIMEOUT)
+
+        bars = []
+        for tick in ticks:
+            bar = self.bar_aggregator.add(tick)
+            if bar is not None:
+                bars.append(bar)
+            self.price_bus.add(quote_from_tick(tick))
+        if bars:
+            await self.channel_layer.group_send(BAR_GROUP, {'type': 'md.bars', 'bars': bars})
+        if self.price_bus.due():
+            await self.price_bus.aflush()
+        metrics.MD_FRAME_SECONDS.observe(time.perf_counter() - start)
+        return len(ticks)
+
+    async def listen_for_frames(self):
+        """Read upstream frames until the connection closes"""
+        while self.running and self.websocket:
+            try:
+                frame = await self.websocket.recv()
+                if isinstance(frame, str):
+                    logger.warning(f"Unexpected text frame: {frame[:200]}")
+                    continue
+
+                if self.capture:
+                    write_frame(self.capture, frame)
+                await self.process_frame(frame)
+
+            except websockets.exceptions.ConnectionClosed:
+                logger.warning("Upstream feed connection closed")
+                break
+            except DecodeError:
+                logger.warning("Invalid FeedResponse frame received")
+            except Exception as e:
+                logger.error(f"Error processing frame: {e}")
+
+    async def run(self):
+        """Serve consumers until stopped, reconnecting upstream with backoff"""
+        self.running = True
+        background = [
+            asyncio.create_task(self.price_bus.run_flusher()),
+            asyncio.create_task(self.listen_for_interest()),
+            asyncio.create_task(self.sync_subscriptions_on_change()),
+        ]
+        try:
+            while self.running:
+                if await self.connect():
+                    self.reconnect_delay = 5
+                    await self.sync_subscriptions()
+                    await self.listen_for_frames()
+
+                if self.running:
+                    logger.info(f"Reconnecting in {self.reconnect_delay} seconds...")
+                    await asyncio.sleep(self.reconnect_delay)
+                    self.reconnect_delay = min(self.reconnect_delay * 2, self.max_reconnect_delay)
+        finally:
+            for task in background:
+                task.cancel()
+            if self.websocket:
+                await self.websocket.close()
+
+    def stop(self):
+        self.running = False
+        if self.websocket:
+            asyncio.create_task(self.websocket.close())
+
+
+class GatewayConsumer:
+    """
+    Consumer side of the gateway: joins the data groups, declares the
+    instruments ``name`` needs and re-declares on every heartbeat and
+    whenever a gateway starts.
+    """
+
+    def __init__(self, name, channel_layer=None, groups=(TICK_GROUP,)):
+        self.name = name
+        self.channel_layer = channel_layer or get_channel_layer()
+        self.groups = groups
+        self.instrument_keys = set()
+        self.channel = None
+
+    async def open(self):
+        self.channel = await self.channel_layer.new_channel()
+        for group in self.groups:
+            await self.channel_layer.group_add(group, self.channel)
+
+    async def close(self):
+        for group in self.groups:
+            await self.channel_layer.group_discard(group, self.channel)
+
+    async def declare(self, instrument_keys=None):
+        """Replace this consumer's interest (or repeat it, if ``instrument_keys`` is None)"""
+        if instrument_keys is not None:
+            self.instrument_keys = set(instrument_keys)
+        await self.channel_layer.group_send(CONTROL_GROUP, {
+            'type': 'md.interest',
+            'consumer': self.name,
+            'instrument_keys': sorted(self.instrument_keys),
+        })
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(INTEREST_HEARTBEAT)
+            await self.declare()
+
+    async def receive(self):
+        """Next md.ticks or md.bars message"""
+        while True:
+            message = await self.channel_layer.receive(self.channel)
+            if message.get('type') == 'md.hello':
+                await self.declare()
+                continue
+            return message
+
+
+def declare_interest(name, instrument_keys):
+    """Declare a consumer's instruments from synchronous code (repeat within INTEREST_TTL)"""
+    async_to_sync(GatewayConsumer(name).declare)(instrument_keys)
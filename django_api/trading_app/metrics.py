@@ -0,0 +1,261 @@
+# trading_app/metrics.py
+"""
+Process-local metrics in the Prometheus text exposition format: counters,
+gauges and latency histograms, optionally labelled. Recording a value is a
+dict lookup and a short lock, cheap enough to leave on during market hours.
+
+The web process serves them at /metrics (views.metrics_endpoint, loopback
+clients only); run_market_gateway --metrics-port serves the gateway's from
+its own process. The radar engine (radar_engine_cloud_function/metrics.py)
+builds its own registry on these primitives and shares the Upstox metrics.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; from sub-millisecond tick stages to slow REST calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REGISTRY = []
+
+
+class _Value:
+    """One counter or gauge time series."""
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self.lock:
+            self.value = value
+
+    def set_function(self, function):
+        """Read the value from ``function()`` at scrape time instead."""
+        self.function = function
+
+    def samples(self):
+        yield '', (), self.function() if self.function else self.value
+
+
+class _HistogramValue:
+    """One histogram time series: per-bucket counts, sum and count."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            yield '_bucket', (('le', _format_bound(bound)),), cumulative
+        yield '_sum', (), total
+        yield '_count', (), cumulative
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self.children[()] = self.new_child()
+        registry.append(self)
+
+    def new_child(self):
+        return _Value()
+
+    def labels(self, **labels):
+        """The time series for these label values, created on first use."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(key, self.new_child())
+        return child
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key, child in sorted(self.children.items()):
+            base = tuple(zip(self.labelnames, key))
+            for suffix, extra, value in child.samples():
+                lines.append(f'{self.name}{suffix}{_format_labels(base + extra)} {_format_value(value)}')
+        return lines
+
+
+# An unlabelled metric records straight onto its single series
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1):
+        self.children[()].inc(amount)
+
+    def set_function(self, function):
+        self.children[()].set_function(function)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1):
+        self.children[()].inc(amount)
+
+    def dec(self, amount=1):
+        self.children[()].dec(amount)
+
+    def set(self, value):
+        self.children[()].set(value)
+
+    def set_function(self, function):
+        self.children[()].set_function(function)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.children[()].observe(value)
+
+    def time(self):
+        return self.children[()].time()
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if not isinstance(value, int) else str(value)
+
+
+def total(metric):
+    """A counter or gauge's value, or a histogram's observation count, summed over its labels."""
+    return sum(
+        child.count if isinstance(child, _HistogramValue) else next(child.samples())[2]
+        for child in list(metric.children.values())
+    )
+
+
+def render(registry=REGISTRY):
+    """Every metric in ``registry`` in the Prometheus text format."""
+    return '\n'.join(line for metric in registry for line in metric.render()) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render(self.server.registry).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host='127.0.0.1', registry=REGISTRY):
+    """
+    Serve ``registry`` at /metrics on ``host:port`` from a daemon thread.
+    Returns the server, or None if the port cannot be bound; metrics are
+    optional, so the caller carries on without them.
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning(f"Metrics server not started on {host}:{port}: {e}")
+        return None
+    server.registry = registry
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name='metrics-server').start()
+    logger.info(f"Metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+@contextmanager
+def upstox_call(endpoint):
+    """Time an Upstox API call; an exception counts as an error and is re-raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTOX_ERRORS.labels(endpoint=endpoint).inc()
+        raise
+    finally:
+        UPSTOX_REQUEST_SECONDS.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+
+
+# --- Django metrics ---
+
+MD_TICKS_DECODED = Counter('md_ticks_decoded_total', 'Ticks decoded by the market data gateway')
+MD_FRAME_SECONDS = Histogram('md_frame_seconds', 'Market data gateway time to decode and republish a frame')
+PRICE_FANOUT_LAG = Histogram(
+    'price_fanout_lag_seconds', 'Time from the first price update of a batch to its last group send',
+)
+UPSTOX_REQUEST_SECONDS = Histogram('upstox_request_seconds', 'Upstox API call latency', ['endpoint'])
+UPSTOX_ERRORS = Counter('upstox_request_errors_total', 'Failed Upstox API calls', ['endpoint'])
+DB_WRITE_SECONDS = Histogram('db_write_seconds', 'Database write latency', ['operation'])
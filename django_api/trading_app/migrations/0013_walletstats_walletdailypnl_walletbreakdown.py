@@ -0,0 +1,72 @@
+# Generated by Django 4.2.23 on 2026-10-19 09:00
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_app', '0012_add_unique_constraint_radaralert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('closed_trades', models.IntegerField(default=0)),
+                ('winning_trades', models.IntegerField(default=0)),
+                ('losing_trades', models.IntegerField(default=0)),
+                ('gross_profit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('gross_loss', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('current_win_streak', models.IntegerField(default=0)),
+                ('current_loss_streak', models.IntegerField(default=0)),
+                ('longest_win_streak', models.IntegerField(default=0)),
+                ('longest_loss_streak', models.IntegerField(default=0)),
+                ('best_pnl', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('worst_pnl', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('fastest_duration', models.DurationField(blank=True, null=True)),
+                ('slowest_duration', models.DurationField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('best_trade', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trading_app.virtualtrade')),
+                ('fastest_trade', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trading_app.virtualtrade')),
+                ('slowest_trade', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trading_app.virtualtrade')),
+                ('wallet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='trading_app.virtualwallet')),
+                ('worst_trade', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trading_app.virtualtrade')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WalletDailyPnl',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('pnl', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('cumulative_pnl', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('trades', models.IntegerField(default=0)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_pnl', to='trading_app.virtualwallet')),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('wallet', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='WalletBreakdown',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('STRATEGY', 'Strategy'), ('SYMBOL', 'Symbol')], max_length=10)),
+                ('key', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+                ('wins', models.IntegerField(default=0)),
+                ('losses', models.IntegerField(default=0)),
+                ('total_pnl', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='breakdowns', to='trading_app.virtualwallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['wallet', 'kind', '-count'], name='wallet_breakdown_count_idx')],
+                'unique_together': {('wallet', 'kind', 'key')},
+            },
+        ),
+    ]
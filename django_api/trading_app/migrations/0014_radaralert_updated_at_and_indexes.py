@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-19 10:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_app', '0013_walletstats_walletdailypnl_walletbreakdown'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='radaralert',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='radaralert',
+            index=models.Index(fields=['-timestamp', '-id'], name='radaralert_timestamp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='radaralert',
+            index=models.Index(fields=['updated_at', 'id'], name='radaralert_updated_id_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_app', '0014_radaralert_updated_at_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scan_type', models.CharField(choices=[('SCREENING', 'Screening'), ('INTRADAY', 'Intraday')], max_length=20)),
+                ('strategy', models.CharField(blank=True, max_length=50)),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('SUCCESS', 'Success'), ('FAILED', 'Failed'), ('SKIPPED', 'Skipped')], default='RUNNING', max_length=20)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('duration_seconds', models.FloatField(blank=True, null=True)),
+                ('context_seconds', models.FloatField(default=0)),
+                ('fetch_seconds', models.FloatField(default=0)),
+                ('indicators_seconds', models.FloatField(default=0)),
+                ('rules_seconds', models.FloatField(default=0)),
+                ('persist_seconds', models.FloatField(default=0)),
+                ('instruments_total', models.IntegerField(default=0)),
+                ('instruments_with_data', models.IntegerField(default=0)),
+                ('instruments_qualified', models.IntegerField(default=0)),
+                ('alerts_saved', models.IntegerField(default=0)),
+                ('api_calls', models.IntegerField(default=0)),
+                ('api_errors', models.IntegerField(default=0)),
+                ('cache_hits', models.IntegerField(default=0)),
+                ('cache_misses', models.IntegerField(default=0)),
+                ('slowest_instruments', models.JSONField(default=list)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-started_at', '-id'], name='scanrun_started_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 05:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading_app', '0015_scanrun'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='scanrun',
+            name='cache_hits',
+        ),
+        migrations.RemoveField(
+            model_name='scanrun',
+            name='cache_misses',
+        ),
+        migrations.AlterField(
+            model_name='scanrun',
+            name='started_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -9,6 +9,9 @@ from django.utils import timezone
 from channels.layers import get_channel_layer
 from asgiref.sync import sync_to_async
 from .models import VirtualTrade, VirtualWallet, UserProfile
+from .analytics import record_closed_trade
+from .price_bus import PriceBus, price_quote
+from .trade_index import OpenTrade, OpenTradeIndex
 from django.contrib.auth.models import User
 
 logger = logging.getLogger(__name__)
@@ -18,15 +21,21 @@ class MockWebSocketClient:
     
     def __init__(self):
         self.channel_layer = get_channel_layer()
+        self.price_bus = PriceBus(channel_layer=self.channel_layer)
         self.running = False
         self.price_interval = 5  # Update prices every 5 seconds
+        # Open trades, reloaded once per cycle; exit checks only read this
+        self.trade_index = OpenTradeIndex()
+        self.open_trades = {}  # trade_id -> VirtualTrade, for closing
         
     @sync_to_async
     def get_instrument_keys_sync(self):
-        """Get all instrument keys from open trades (sync version)"""
+        """Load open trades into the index and return their instrument keys (sync version)"""
         try:
-            open_trades = VirtualTrade.objects.filter(status='EXECUTED')
-            instrument_keys = list(set(trade.instrument_key for trade in open_trades))
+            open_trades = list(VirtualTrade.objects.filter(status='EXECUTED').select_related('wallet__user'))
+            self.open_trades = {trade.id: trade for trade in open_trades}
+            self.trade_index.replace_all(OpenTrade.from_trade(trade) for trade in open_trades)
+            instrument_keys = self.trade_index.instrument_keys()
             
             # If no real trades, create some mock instruments for testing
             if not instrument_keys:
@@ -66,70 +75,29 @@ class MockWebSocketClient:
                 
                 current_price = self.generate_mock_price(base_price)
                 
-                # Broadcast price update
-                message = {
-                    'type': 'price_update',
-                    'data': {
-                        'instrument_key': instrument_key,
-                        'current_price': float(current_price),
-                        'timestamp': timezone.now().isoformat()
-                    }
-                }
-                
-                await self.channel_layer.group_send(
-                    'price_updates',
-                    message
-                )
+                # Queue price update; the whole cycle is published as one batch
+                self.price_bus.add(price_quote(instrument_key, current_price))
                 
                 # Check trades for execution
                 await self.check_trades_for_execution(instrument_key, current_price)
+            
+            await self.price_bus.aflush()
                 
         except Exception as e:
             logger.error(f"Error broadcasting mock prices: {e}")
     
-    @sync_to_async
-    def get_open_trades_sync(self, instrument_key):
-        """Get open trades for an instrument (sync version)"""
-        try:
-            return list(VirtualTrade.objects.filter(
-                instrument_key=instrument_key,
-                status='EXECUTED'
-            ))
-        except Exception as e:
-            logger.error(f"Error getting open trades: {e}")
-            return []
-    
     async def check_trades_for_execution(self, instrument_key, current_price):
         """Check if any trades should be executed based on current price"""
         try:
-            open_trades = await self.get_open_trades_sync(instrument_key)
-            
-            for trade in open_trades:
-                should_close, exit_price, exit_reason = self.should_close_trade(trade, current_price)
-                
-                if should_close:
-                    await self.execute_trade_closure(trade, exit_price, exit_reason)
+            for open_trade, exit_price, exit_reason in self.trade_index.triggered(
+                    instrument_key, Decimal(str(current_price))):
+                self.trade_index.remove(open_trade.id)
+                trade = self.open_trades.pop(open_trade.id)
+                await self.execute_trade_closure(trade, exit_price, exit_reason)
                     
         except Exception as e:
             logger.error(f"Error checking trades for execution: {e}")
     
-    def should_close_trade(self, trade, current_price):
-        """Determine if a trade should be closed"""
-        # Check target price
-        if trade.target_price and current_price >= trade.target_price:
-            return True, trade.target_price, 'Target hit'
-        
-        # Check stop loss
-        if trade.stop_loss and current_price <= trade.stop_loss:
-            return True, trade.stop_loss, 'Stop loss hit'
-        
-        # Check time limit (24 hours)
-        time_open = timezone.now() - trade.entry_time
-        if time_open.total_seconds() > 24 * 60 * 60:  # 24 hours
-            return True, current_price, 'Time limit exceeded'
-        
-        return False, None, None
-    
     @sync_to_async
     def execute_trade_closure_sync(self, trade, exit_price, exit_reason):
         """Execute trade closure and update wallet (sync version)"""
@@ -164,6 +132,9 @@ class MockWebSocketClient:
             wallet.balance += pnl
             wallet.save()
             
+            # Update the wallet's performance snapshot
+            record_closed_trade(trade)
+            
             logger.info(f"Closed trade {trade.id} ({trade.tradingsymbol}) at {exit_price} - P&L: ₹{pnl:.2f}")
             
             return trade, pnl, exit_reason
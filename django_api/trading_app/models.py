@@ -1,11 +1,12 @@
 # trading_app/models.py
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from datetime import date
 from decimal import Decimal
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -77,11 +78,17 @@ class RadarAlert(models.Model):
     priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='MEDIUM')
     alert_type = models.CharField(max_length=20, choices=ALERT_TYPE_CHOICES, default='SCREENING')
     notified = models.BooleanField(default=False)
+    # Bumped on every change; the radar engine's raw upsert sets it explicitly
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['instrument_key', 'source_strategy'], name='unique_instrument_strategy')
         ]
+        indexes = [
+            models.Index(fields=['-timestamp', '-id'], name='radaralert_timestamp_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='radaralert_updated_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.instrument_key} - {self.source_strategy} - {self.status}"
@@ -214,9 +221,189 @@ class VirtualPosition(models.Model):
             self.unrealized_pnl_percentage = (self.unrealized_pnl / (self.avg_entry_price * self.quantity)) * 100
         self.save()
 
+class WalletStats(models.Model):
+    """Running performance summary for a wallet, updated incrementally as trades close"""
+    wallet = models.OneToOneField(VirtualWallet, on_delete=models.CASCADE, related_name='stats')
+    closed_trades = models.IntegerField(default=0)
+    winning_trades = models.IntegerField(default=0)
+    losing_trades = models.IntegerField(default=0)
+    gross_profit = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    gross_loss = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))  # Sum of losing P&L (negative)
+
+    # Streaks in order of trade closure
+    current_win_streak = models.IntegerField(default=0)
+    current_loss_streak = models.IntegerField(default=0)
+    longest_win_streak = models.IntegerField(default=0)
+    longest_loss_streak = models.IntegerField(default=0)
+
+    # Record trades, with the compared value kept alongside to avoid joins
+    best_trade = models.ForeignKey(VirtualTrade, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    best_pnl = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    worst_trade = models.ForeignKey(VirtualTrade, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    worst_pnl = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    fastest_trade = models.ForeignKey(VirtualTrade, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    fastest_duration = models.DurationField(null=True, blank=True)
+    slowest_trade = models.ForeignKey(VirtualTrade, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    slowest_duration = models.DurationField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.wallet.user.username}'s Stats - {self.closed_trades} closed trades"
+
+    def add_trade(self, trade):
+        """Fold a closed trade into the running totals (does not save)"""
+        pnl = trade.pnl
+        self.closed_trades += 1
+        if pnl > 0:
+            self.winning_trades += 1
+            self.gross_profit += pnl
+            self.current_win_streak += 1
+            self.current_loss_streak = 0
+            self.longest_win_streak = max(self.longest_win_streak, self.current_win_streak)
+        elif pnl < 0:
+            self.losing_trades += 1
+            self.gross_loss += pnl
+            self.current_loss_streak += 1
+            self.current_win_streak = 0
+            self.longest_loss_streak = max(self.longest_loss_streak, self.current_loss_streak)
+
+        if self.best_pnl is None or pnl > self.best_pnl:
+            self.best_trade_id, self.best_pnl = trade.pk, pnl
+        if self.worst_pnl is None or pnl < self.worst_pnl:
+            self.worst_trade_id, self.worst_pnl = trade.pk, pnl
+
+        if trade.entry_time and trade.exit_time:
+            duration = trade.exit_time - trade.entry_time
+            if self.fastest_duration is None or duration < self.fastest_duration:
+                self.fastest_trade_id, self.fastest_duration = trade.pk, duration
+            if self.slowest_duration is None or duration > self.slowest_duration:
+                self.slowest_trade_id, self.slowest_duration = trade.pk, duration
+
+    @property
+    def avg_profit(self):
+        """Average P&L of winning trades"""
+        if self.winning_trades == 0:
+            return 0
+        return self.gross_profit / self.winning_trades
+
+    @property
+    def avg_loss(self):
+        """Average P&L of losing trades (negative)"""
+        if self.losing_trades == 0:
+            return 0
+        return self.gross_loss / self.losing_trades
+
+    @property
+    def profit_factor(self):
+        """Average win relative to average loss"""
+        if self.avg_loss == 0:
+            return 0
+        return abs(self.avg_profit / self.avg_loss)
+
+class WalletDailyPnl(models.Model):
+    """Realized P&L per exit date for a wallet, feeding the equity curve"""
+    wallet = models.ForeignKey(VirtualWallet, on_delete=models.CASCADE, related_name='daily_pnl')
+    date = models.DateField()
+    pnl = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    cumulative_pnl = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    trades = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['wallet', 'date']
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.wallet.user.username} - {self.date} - ₹{self.pnl}"
+
+class WalletBreakdown(models.Model):
+    """Closed-trade counts and P&L per strategy or per symbol for a wallet"""
+    KIND_CHOICES = [
+        ('STRATEGY', 'Strategy'),
+        ('SYMBOL', 'Symbol'),
+    ]
+
+    wallet = models.ForeignKey(VirtualWallet, on_delete=models.CASCADE, related_name='breakdowns')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+    losses = models.IntegerField(default=0)
+    total_pnl = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        unique_together = ['wallet', 'kind', 'key']
+        indexes = [models.Index(fields=['wallet', 'kind', '-count'], name='wallet_breakdown_count_idx')]
+
+    def __str__(self):
+        return f"{self.kind} {self.key} - {self.count} trades"
+
+class ScanRun(models.Model):
+    """One screening or intraday scan, with per-stage timings, filled in by the radar engine's scanners"""
+    SCAN_TYPE_CHOICES = [
+        ('SCREENING', 'Screening'),
+        ('INTRADAY', 'Intraday'),
+    ]
+
+    STATUS_CHOICES = [
+        ('RUNNING', 'Running'),
+        ('SUCCESS', 'Success'),
+        ('FAILED', 'Failed'),
+        ('SKIPPED', 'Skipped'),
+    ]
+
+    # Each has a <stage>_seconds column: market context, data fetch,
+    # indicator calculation, rule evaluation and saving alerts
+    STAGES = ('context', 'fetch', 'indicators', 'rules', 'persist')
+
+    scan_type = models.CharField(max_length=20, choices=SCAN_TYPE_CHOICES)
+    strategy = models.CharField(max_length=50, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='RUNNING')
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_seconds = models.FloatField(null=True, blank=True)
+    context_seconds = models.FloatField(default=0)
+    fetch_seconds = models.FloatField(default=0)
+    indicators_seconds = models.FloatField(default=0)
+    rules_seconds = models.FloatField(default=0)
+    persist_seconds = models.FloatField(default=0)
+    instruments_total = models.IntegerField(default=0)
+    instruments_with_data = models.IntegerField(default=0)
+    instruments_qualified = models.IntegerField(default=0)
+    alerts_saved = models.IntegerField(default=0)
+    api_calls = models.IntegerField(default=0)
+    api_errors = models.IntegerField(default=0)
+    # [{"instrument_key": ..., "seconds": ...}], slowest first
+    slowest_instruments = models.JSONField(default=list)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['-started_at', '-id'], name='scanrun_started_id_idx')]
+
+    def __str__(self):
+        return f"{self.scan_type} scan {self.started_at:%Y-%m-%d %H:%M} - {self.status}"
+
+    @property
+    def stage_seconds(self):
+        return {stage: getattr(self, f'{stage}_seconds') for stage in self.STAGES}
+
 @receiver(post_save, sender=User)
 def create_virtual_wallet_for_user(sender, instance, created, **kwargs):
     """Automatically create a VirtualWallet for every new user"""
     from .models import VirtualWallet
     if created:
         VirtualWallet.objects.get_or_create(user=instance)
+
+@receiver([post_save, post_delete], sender=RadarAlert)
+def bump_radar_alert_version(sender, **kwargs):
+    """Invalidate cached alert responses (e.g. screener-status) on every ORM write"""
+    from .alert_cache import bump_alert_version
+    bump_alert_version()
+
+@receiver([post_save, post_delete], sender=VirtualTrade)
+def publish_virtual_trade_change(sender, instance, **kwargs):
+    """Keep in-memory open-trade indexes in sync once the write commits"""
+    from .trade_index import publish_trade_change, trade_change_message
+    # Built now: a deleted instance has no pk by the time the commit runs
+    message = trade_change_message(instance, deleted=kwargs['signal'] is post_delete)
+    transaction.on_commit(lambda: publish_trade_change(message))
@@ -0,0 +1,96 @@
+# trading_app/pagination.py
+
+import base64
+from urllib import parse
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Cursor pagination on (datetime field, id).
+
+    The cursor encodes the last row of the page, and the next page is fetched
+    with a (field, id) comparison. Every page is an index range scan, whatever
+    its depth, and rows inserted while a client pages do not shift later
+    pages. The view chooses the ordering through ``get_keyset_ordering()``,
+    which returns ``(field, descending)``.
+    """
+    page_size = api_settings.PAGE_SIZE or 10
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.field, self.descending = view.get_keyset_ordering() if view else ('timestamp', True)
+        prefix = '-' if self.descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}id')
+
+        cursor = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        if cursor:
+            value, pk = cursor
+            op = 'lt' if self.descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{op}': value}) | Q(**{self.field: value, f'id__{op}': pk})
+            )
+
+        page_size = self.get_page_size(request)
+        # Fetch one extra row to learn whether there is a next page
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        token = self.encode_cursor(getattr(last, self.field), last.pk)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def encode_cursor(self, value, pk):
+        raw = parse.urlencode({'v': value.isoformat(), 'id': pk})
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, token):
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii')
+            params = parse.parse_qs(raw, strict_parsing=True)
+            value = parse_datetime(params['v'][0])
+            pk = int(params['id'][0])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound('Invalid cursor')
+        if value is None:
+            raise NotFound('Invalid cursor')
+        return value, pk
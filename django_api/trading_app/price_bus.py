@@ -0,0 +1,193 @@
+# trading_app/price_bus.py
+"""
+Single path for live prices from producers (the market data gateway, the
+mock WebSocket client and the polling/mock broadcasters) to PriceConsumer.
+
+Groups:
+    prices                - every instrument, for clients subscribed to '*'
+    prices.<instrument>   - one instrument, see instrument_group()
+
+Message sent to clients (and carried pre-encoded in the group message's
+``text``):
+    {"type": "price_batch", "data": {"updates": [quote, ...], "snapshot": true?}}
+
+A quote always has ``instrument_key``; in a batch it carries only the fields
+that changed since the previous batch, in a snapshot all known fields (see
+price_quote() for the field names).
+"""
+
+import asyncio
+import json
+import re
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from . import metrics
+
+# Group for clients subscribed to every instrument ('*')
+PRICE_GROUP = 'prices'
+
+# Latest full quote per instrument (see price_state_key()), sent to clients
+# when they subscribe. Each producer runs its own PriceBus, so quotes are
+# stored per instrument and never replace another producer's instruments.
+PRICE_STATE_PREFIX = 'prices:state:'
+
+# Set of every instrument with a stored quote, for '*' subscriptions
+PRICE_INDEX_KEY = 'prices:instruments'
+
+# Seconds of updates folded into one batch message
+DEFAULT_WINDOW = 0.2
+
+
+def instrument_group(instrument_key):
+    """Channels group for one instrument's price updates."""
+    # Sanitize for Channels group name
+    return f"prices.{re.sub(r'[^a-zA-Z0-9._-]', '_', instrument_key)}"
+
+
+def price_state_key(instrument_key):
+    """Cache key holding one instrument's latest full quote."""
+    return f"{PRICE_STATE_PREFIX}{instrument_key}"
+
+
+def price_quote(instrument_key, current_price, **fields):
+    """
+    Build a quote in the bus schema. Optional fields used by producers:
+    tradingsymbol, price_change, price_change_pct, volume.
+    """
+    quote = {
+        'instrument_key': instrument_key,
+        'current_price': round(float(current_price), 2),
+        'timestamp': timezone.now().isoformat(),
+    }
+    quote.update(fields)
+    return quote
+
+
+class PriceBus:
+    """
+    Fold price updates into batched ``price_batch`` messages, one flush per window.
+
+    ``add()`` merges an update into the instrument's current state. A flush
+    publishes, per instrument, only the fields that differ from what was last
+    published: each instrument's delta goes to its own group, so a client only
+    receives the instruments it subscribed to, and the whole batch goes to the
+    all-instruments group. Messages are JSON-encoded once here and forwarded
+    unchanged by every PriceConsumer.
+    """
+
+    def __init__(self, channel_layer=None, window=DEFAULT_WINDOW):
+        self.channel_layer = channel_layer or get_channel_layer()
+        self.window = window
+        self.current = {}    # instrument_key -> latest known fields
+        self.published = {}  # instrument_key -> fields as clients last saw them
+        self.dirty = set()
+        self.window_started = None
+        self.stored = {}      # state_key -> quote changed by the last build_messages()
+        self.indexed = set()  # instruments known to be in PRICE_INDEX_KEY
+
+    def add(self, data):
+        """Queue an update; ``data`` must contain ``instrument_key``."""
+        key = data['instrument_key']
+        self.current.setdefault(key, {}).update(data)
+        self.dirty.add(key)
+        if self.window_started is None:
+            self.window_started = time.monotonic()
+
+    def due(self):
+        return self.window_started is not None and time.monotonic() - self.window_started >= self.window
+
+    def build_messages(self):
+        """
+        Return ``[(group, text), ...]`` for the pending changes and mark them
+        published. Empty if nothing changed.
+        """
+        updates = []
+        self.stored = {}
+        for key in sorted(self.dirty):
+            published = self.published.get(key, {})
+            changed = {f: v for f, v in self.current[key].items() if published.get(f) != v}
+            if changed:
+                changed['instrument_key'] = key
+                updates.append(changed)
+                self.published[key] = dict(self.current[key])
+                self.stored[price_state_key(key)] = self.published[key]
+        self.dirty.clear()
+        self.window_started = None
+        if not updates:
+            return []
+        messages = [(instrument_group(u['instrument_key']), encode_batch([u])) for u in updates]
+        messages.append((PRICE_GROUP, encode_batch(updates)))
+        return messages
+
+    def merged_index(self, index):
+        """
+        PRICE_INDEX_KEY's new value given its current ``index``, adding this
+        bus's instruments, or None if it already lists them all.
+        """
+        index = set(index or ())
+        missing = self.published.keys() - index
+        self.indexed = index | self.published.keys()
+        return self.indexed if missing else None
+
+    def flush(self):
+        """Publish pending changes from synchronous code. Returns the number of updates sent."""
+        window_started = self.window_started
+        messages = self.build_messages()
+        if messages:
+            cache.set_many(self.stored, None)
+            if self.published.keys() - self.indexed:
+                index = self.merged_index(cache.get(PRICE_INDEX_KEY))
+                if index is not None:
+                    cache.set(PRICE_INDEX_KEY, index, None)
+            for group, text in messages:
+                async_to_sync(self.channel_layer.group_send)(group, {'type': 'price_batch', 'text': text})
+            metrics.PRICE_FANOUT_LAG.observe(time.monotonic() - window_started)
+        return max(len(messages) - 1, 0)
+
+    def maybe_flush(self):
+        """Flush if the current window has elapsed."""
+        return self.flush() if self.due() else 0
+
+    async def apublish(self, quote):
+        """Queue a quote from async code, flushing if the window has elapsed."""
+        self.add(quote)
+        if self.due():
+            await self.aflush()
+
+    async def run_flusher(self):
+        """Flush every window until cancelled, so a trailing tick is never held back."""
+        try:
+            while True:
+                await asyncio.sleep(self.window)
+                await self.aflush()
+        except asyncio.CancelledError:
+            await self.aflush()
+            raise
+
+    async def aflush(self):
+        """Publish pending changes from async code. Returns the number of updates sent."""
+        window_started = self.window_started
+        messages = self.build_messages()
+        if messages:
+            await cache.aset_many(self.stored, None)
+            if self.published.keys() - self.indexed:
+                index = self.merged_index(await cache.aget(PRICE_INDEX_KEY))
+                if index is not None:
+                    await cache.aset(PRICE_INDEX_KEY, index, None)
+            for group, text in messages:
+                await self.channel_layer.group_send(group, {'type': 'price_batch', 'text': text})
+            metrics.PRICE_FANOUT_LAG.observe(time.monotonic() - window_started)
+        return max(len(messages) - 1, 0)
+
+
+def encode_batch(updates, snapshot=False):
+    message = {'type': 'price_batch', 'data': {'updates': updates}}
+    if snapshot:
+        message['data']['snapshot'] = True
+    return json.dumps(message, cls=DjangoJSONEncoder, separators=(',', ':'))
@@ -2,7 +2,7 @@
 
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Instrument, TradeLog, RadarAlert, VirtualWallet, VirtualTrade, VirtualPosition
+from .models import Instrument, TradeLog, RadarAlert, VirtualWallet, VirtualTrade, VirtualPosition, ScanRun
 
 class InstrumentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,6 +21,14 @@ class RadarAlertSerializer(serializers.ModelSerializer):
         model = RadarAlert
         fields = '__all__'
 
+    def __init__(self, *args, **kwargs):
+        # Optional projection, e.g. RadarAlertSerializer(alerts, many=True, fields=['id', 'status'])
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
 # Virtual Trading Serializers
 class VirtualWalletSerializer(serializers.ModelSerializer):
     available_balance = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
@@ -44,6 +52,13 @@ class VirtualPositionSerializer(serializers.ModelSerializer):
         model = VirtualPosition
         fields = '__all__'
 
+class ScanRunSerializer(serializers.ModelSerializer):
+    stage_seconds = serializers.DictField(child=serializers.FloatField(), read_only=True)
+
+    class Meta:
+        model = ScanRun
+        fields = '__all__'
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
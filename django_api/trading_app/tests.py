@@ -1,3 +1,876 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import subprocess
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import websockets
+from upstox_client.feeder.proto import MarketDataFeedV3_pb2
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import alert_cache, metrics
+from .analytics import rebuild_wallet_stats, record_closed_trade
+from .consumers import PriceConsumer
+from .feed_replay import read_frames, replay_frames
+from .market_gateway import BarAggregator, GatewayConsumer, MarketDataGateway, get_last_prices
+from .models import Instrument, RadarAlert, ScanRun, TradeLog, VirtualTrade, VirtualWallet, WalletStats
+from .mock_websocket import MockWebSocketClient
+from .price_bus import PRICE_GROUP, PriceBus, price_quote
+from .trade_index import OpenTrade, OpenTradeIndex
+from .upstox_feed import decode_feed_ticks
+from .upstox_websocket import UpstoxWebSocketClient
+from .views import UPDATED_SINCE_OVERLAP, RadarAlertListView
+
+# The default cache is the shared Redis; tests clear theirs freely
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_closed_trade(wallet, alert, symbol, pnl, minutes_held, days_ago=0):
+    """Create a CLOSED VirtualTrade with a fixed holding time and record it."""
+    trade = VirtualTrade.objects.create(
+        wallet=wallet,
+        alert=alert,
+        instrument_key=alert.instrument_key,
+        tradingsymbol=symbol,
+        trade_type='BUY',
+        quantity=10,
+        entry_price=Decimal('100.00'),
+        exit_price=Decimal('100.00') + Decimal(pnl) / 10,
+        pnl=Decimal(pnl),
+        status='CLOSED',
+    )
+    exit_time = timezone.now() - timedelta(days=days_ago)
+    # entry_time is auto_now_add, so backdate it with an update
+    VirtualTrade.objects.filter(pk=trade.pk).update(
+        entry_time=exit_time - timedelta(minutes=minutes_held),
+        exit_time=exit_time,
+    )
+    trade.refresh_from_db()
+    record_closed_trade(trade)
+    return trade
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class VirtualTradingDashboardTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='trader', password='secret')
+        self.wallet = VirtualWallet.objects.get(user=self.user)
+        self.alerts = [
+            RadarAlert.objects.create(instrument_key='NSE_EQ|AAA', source_strategy='RealTime_ORB'),
+            RadarAlert.objects.create(instrument_key='NSE_EQ|BBB', source_strategy='Bullish_Scan'),
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_trades(self, count):
+        # Close in chronological order, as live trades are
+        for i in range(count):
+            alert = self.alerts[i % 2]
+            pnl = 50 if i % 3 else -25
+            create_closed_trade(self.wallet, alert, alert.instrument_key.split('|')[1], pnl, 5 + i, days_ago=(count - 1 - i) // 8)
+
+    def test_query_count_is_independent_of_trade_count(self):
+        self.add_trades(3)
+        with self.assertNumQueries(9):
+            response = self.client.get('/api/virtual-trading-dashboard/')
+        self.assertEqual(response.status_code, 200)
+
+        self.add_trades(30)
+        with self.assertNumQueries(9):
+            response = self.client.get('/api/virtual-trading-dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['statistics']['total_closed_trades'], 33)
+
+    def test_insights(self):
+        create_closed_trade(self.wallet, self.alerts[0], 'AAA', 100, 30, days_ago=3)
+        create_closed_trade(self.wallet, self.alerts[0], 'AAA', 40, 5, days_ago=2)
+        create_closed_trade(self.wallet, self.alerts[1], 'BBB', -60, 90, days_ago=1)
+        create_closed_trade(self.wallet, self.alerts[1], 'BBB', -10, 15, days_ago=0)
+        create_closed_trade(self.wallet, self.alerts[0], 'AAA', 0, 10, days_ago=0)
+
+        response = self.client.get('/api/virtual-trading-dashboard/')
+        insights = response.data['insights']
+
+        self.assertEqual(insights['best_trade']['pnl'], '100.00')
+        self.assertEqual(insights['worst_trade']['pnl'], '-60.00')
+        self.assertEqual(insights['fastest_trade']['pnl'], '40.00')
+        self.assertEqual(insights['slowest_trade']['pnl'], '-60.00')
+        self.assertEqual(insights['streaks'], {
+            'current_win': 0, 'current_loss': 2, 'longest_win': 2, 'longest_loss': 2,
+        })
+        self.assertEqual(insights['most_traded'], [
+            {'symbol': 'AAA', 'count': 3}, {'symbol': 'BBB', 'count': 2},
+        ])
+        strategies = {s['strategy']: s for s in insights['strategy_stats']}
+        self.assertEqual(strategies['RealTime_ORB']['count'], 3)
+        self.assertAlmostEqual(strategies['RealTime_ORB']['win_rate'], 200 / 3)
+        self.assertAlmostEqual(strategies['Bullish_Scan']['avg_pnl'], -35.0)
+        statistics = response.data['statistics']
+        self.assertEqual(statistics['profitable_trades'], 2)
+        self.assertEqual(statistics['total_closed_trades'], 5)
+
+    def test_incremental_snapshot_matches_rebuild(self):
+        self.add_trades(12)
+        incremental = self.client.get('/api/virtual-trading-dashboard/').data
+
+        rebuild_wallet_stats(self.wallet.id)
+        rebuilt = self.client.get('/api/virtual-trading-dashboard/').data
+
+        self.assertEqual(incremental['statistics'], rebuilt['statistics'])
+        for key in ('streaks', 'strategy_stats', 'equity_curve', 'most_traded', 'best_trade', 'worst_trade'):
+            self.assertEqual(incremental['insights'][key], rebuilt['insights'][key])
+
+    def test_missing_snapshot_is_built_from_history(self):
+        self.add_trades(5)
+        WalletStats.objects.filter(wallet=self.wallet).delete()
+
+        response = self.client.get('/api/virtual-trading-dashboard/')
+
+        self.assertEqual(response.data['statistics']['total_closed_trades'], 5)
+        self.assertTrue(WalletStats.objects.filter(wallet=self.wallet).exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TradeJournalDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.instruments = [
+            Instrument.objects.create(instrument_key='NSE_EQ|AAA', tradingsymbol='AAA'),
+            Instrument.objects.create(instrument_key='NSE_EQ|BBB', tradingsymbol='BBB'),
+        ]
+        self.start = timezone.localdate() - timedelta(days=30)
+
+    def add_trades(self, count):
+        for i in range(count):
+            pnl = Decimal(50 if i % 3 else -25)
+            TradeLog.objects.create(
+                instrument=self.instruments[i % 2],
+                trade_date=self.start + timedelta(days=i % 20),
+                entry_price=Decimal('100.00'),
+                exit_price=Decimal('100.00') + pnl / 10,
+                quantity=10,
+                trade_type='BUY',
+                pnl=pnl,
+            )
+
+    def test_query_count_is_independent_of_journal_size(self):
+        self.add_trades(4)
+        with self.assertNumQueries(8):
+            response = self.client.get('/api/trade-journal-dashboard/')
+        self.assertEqual(response.status_code, 200)
+
+        self.add_trades(40)
+        with self.assertNumQueries(8):
+            response = self.client.get('/api/trade-journal-dashboard/')
+        self.assertEqual(response.data['statistics']['total_trades'], 44)
+        self.assertEqual(response.data['insights']['most_traded'], [
+            {'symbol': 'AAA', 'count': 22}, {'symbol': 'BBB', 'count': 22},
+        ])
+
+    def test_cached_until_a_new_trade_is_logged(self):
+        self.add_trades(3)
+        first = self.client.get('/api/trade-journal-dashboard/').data
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/trade-journal-dashboard/').data, first)
+
+        self.add_trades(1)
+        response = self.client.get('/api/trade-journal-dashboard/')
+        self.assertEqual(response.data['statistics']['total_trades'], 4)
+        self.assertEqual(response.data['cursor'], TradeLog.objects.latest('id').id)
+
+    def test_date_range_and_cursor(self):
+        self.add_trades(6)
+        ids = list(TradeLog.objects.order_by('id').values_list('id', flat=True))
+
+        response = self.client.get('/api/trade-journal-dashboard/', {'cursor': ids[2]})
+        self.assertEqual(response.data['statistics']['total_trades'], 3)
+        self.assertEqual(response.data['cursor'], ids[2])
+
+        response = self.client.get('/api/trade-journal-dashboard/', {
+            'start_date': (self.start + timedelta(days=1)).isoformat(),
+            'end_date': (self.start + timedelta(days=2)).isoformat(),
+        })
+        self.assertEqual(response.data['statistics']['total_trades'], 2)
+        self.assertEqual(len(response.data['insights']['equity_curve']), 2)
+
+        response = self.client.get('/api/trade-journal-dashboard/', {'start_date': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RadarAlertListTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        for i in range(7):
+            Instrument.objects.create(instrument_key=f'NSE_EQ|S{i}', tradingsymbol=f'S{i}')
+            alert = RadarAlert.objects.create(
+                instrument_key=f'NSE_EQ|S{i}',
+                source_strategy='RealTime_ORB' if i % 2 else 'Bullish_Scan',
+                alert_details={'score': i, 'reasons': ['x' * 100]},
+                expires_at=now + timedelta(minutes=30),
+            )
+            # Pairs of alerts share a timestamp, so pages must break ties on id
+            RadarAlert.objects.filter(pk=alert.pk).update(timestamp=now - timedelta(minutes=i // 2))
+
+    def fetch_all(self, url, params):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(a['id'] for a in response.data['results'])
+            if not response.data['next']:
+                return ids, response
+            response = self.client.get(response.data['next'])
+
+    def test_cursor_pages_follow_timestamp_and_id(self):
+        expected = list(RadarAlert.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        ids, _ = self.fetch_all('/api/alerts/', {'page_size': 2})
+        self.assertEqual(ids, expected)
+
+        # The legacy view is shadowed by the router's alerts/ route, so call it directly
+        request = APIRequestFactory().get('/api/alerts/', {'page_size': 3})
+        response = RadarAlertListView.as_view()(request)
+        self.assertEqual([a['id'] for a in response.data['results']], expected[:3])
+
+    def test_fields_projection(self):
+        response = self.client.get('/api/alerts/', {'fields': 'id,status'})
+        alert = response.data['results'][0]
+        self.assertEqual(set(alert), {'id', 'status', 'tradingsymbol', 'category', 'is_time_sensitive', 'remaining_minutes'})
+
+        orb = next(a for a in response.data['results'] if a['category'] == 'ENTRY')
+        self.assertEqual(orb['tradingsymbol'], RadarAlert.objects.get(pk=orb['id']).instrument_key.split('|')[1])
+        self.assertIn(orb['remaining_minutes'], (29, 30))
+
+        response = self.client.get('/api/alerts/', {'fields': 'id,nope'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_updated_since_returns_only_changes(self):
+        RadarAlert.objects.update(updated_at=timezone.now() - UPDATED_SINCE_OVERLAP * 2)
+        _, response = self.fetch_all('/api/alerts/', {'updated_since': timezone.now().isoformat()})
+        self.assertEqual(response.data['results'], [])
+        watermark = response.data['next_updated_since']
+
+        changed = RadarAlert.objects.order_by('id').first()
+        changed.status = 'EXPIRED'
+        changed.save()
+
+        ids, response = self.fetch_all('/api/alerts/', {'updated_since': watermark.isoformat()})
+        self.assertEqual(ids, [changed.id])
+        self.assertEqual(response.data['next_updated_since'], RadarAlert.objects.get(pk=changed.pk).updated_at)
+
+    def test_updated_since_overlaps_late_commits(self):
+        watermark = timezone.now()
+        RadarAlert.objects.update(updated_at=watermark - UPDATED_SINCE_OVERLAP * 2)
+        # Written by a transaction that started before the watermark but committed after it
+        late = RadarAlert.objects.order_by('id').first()
+        RadarAlert.objects.filter(pk=late.pk).update(updated_at=watermark - timedelta(seconds=1))
+
+        ids, response = self.fetch_all('/api/alerts/', {'updated_since': watermark.isoformat()})
+        self.assertEqual(ids, [late.id])
+        # The watermark never moves backwards
+        self.assertEqual(response.data['next_updated_since'], watermark)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/alerts/', {'cursor': 'garbage'}).status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ScreenerStatusCacheTests(TestCase):
+    url = '/api/screener-status/'
+
+    def setUp(self):
+        cache.clear()
+        Instrument.objects.create(instrument_key='NSE_EQ|AAA', tradingsymbol='AAA')
+        self.screen = RadarAlert.objects.create(instrument_key='NSE_EQ|AAA', source_strategy='Bullish_Scan')
+
+    def test_unchanged_poll_returns_304_without_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['entry_status'], 'waiting')
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_alert_write_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        RadarAlert.objects.create(instrument_key='NSE_EQ|AAA', source_strategy='RealTime_ORB')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['entry_status'], 'triggered')
+
+    def test_writes_outside_django_are_picked_up_by_watermark_check(self):
+        etag = self.client.get(self.url)['ETag']
+        # Bulk updates (like the radar engine's raw upserts) send no signals
+        RadarAlert.objects.filter(pk=self.screen.pk).update(priority='HIGH', updated_at=timezone.now())
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        cache.delete(alert_cache.ALERT_WATERMARK_CHECKED_KEY)  # recheck interval elapsed
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['priority'], 'HIGH')
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class PriceFanoutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_coalescer_sends_one_batch_of_changed_fields(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(PRICE_GROUP, channel)
+        price_bus = PriceBus(channel_layer=layer, window=60)
+
+        price_bus.add({'instrument_key': 'NSE_EQ|AAA', 'tradingsymbol': 'AAA', 'current_price': 100})
+        price_bus.add({'instrument_key': 'NSE_EQ|BBB', 'tradingsymbol': 'BBB', 'current_price': 50})
+        price_bus.add({'instrument_key': 'NSE_EQ|AAA', 'current_price': 101})
+        self.assertFalse(price_bus.due())
+        price_bus.flush()
+
+        message = async_to_sync(layer.receive)(channel)
+        self.assertEqual(message['type'], 'price_batch')
+        self.assertEqual(json.loads(message['text'])['data']['updates'], [
+            {'instrument_key': 'NSE_EQ|AAA', 'tradingsymbol': 'AAA', 'current_price': 101},
+            {'instrument_key': 'NSE_EQ|BBB', 'tradingsymbol': 'BBB', 'current_price': 50},
+        ])
+
+        # Only the changed field goes out; a price that moved and came back is not resent
+        price_bus.add({'instrument_key': 'NSE_EQ|AAA', 'tradingsymbol': 'AAA', 'current_price': 102})
+        price_bus.add({'instrument_key': 'NSE_EQ|BBB', 'current_price': 51})
+        price_bus.add({'instrument_key': 'NSE_EQ|BBB', 'current_price': 50})
+        price_bus.flush()
+        message = async_to_sync(layer.receive)(channel)
+        self.assertEqual(json.loads(message['text'])['data']['updates'], [
+            {'current_price': 102, 'instrument_key': 'NSE_EQ|AAA'},
+        ])
+        self.assertEqual(price_bus.flush(), 0)
+
+    def test_consumer_only_receives_subscribed_instruments(self):
+        async def scenario():
+            price_bus = PriceBus(channel_layer=get_channel_layer())
+            price_bus.add({'instrument_key': 'NSE_EQ|AAA', 'tradingsymbol': 'AAA', 'current_price': 100})
+            price_bus.add({'instrument_key': 'NSE_EQ|BBB', 'tradingsymbol': 'BBB', 'current_price': 50})
+            await price_bus.aflush()
+
+            communicator = WebsocketCommunicator(PriceConsumer.as_asgi(), '/ws/prices/')
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            self.assertTrue(await communicator.receive_nothing())
+
+            # Subscribing sends the latest full quote for the new keys only
+            await communicator.send_json_to({'type': 'subscribe', 'instrument_keys': ['NSE_EQ|AAA']})
+            snapshot = await communicator.receive_json_from()
+            self.assertTrue(snapshot['data']['snapshot'])
+            self.assertEqual(snapshot['data']['updates'], [
+                {'instrument_key': 'NSE_EQ|AAA', 'tradingsymbol': 'AAA', 'current_price': 100},
+            ])
+
+            price_bus.add({'instrument_key': 'NSE_EQ|AAA', 'current_price': 99.5})
+            price_bus.add({'instrument_key': 'NSE_EQ|BBB', 'current_price': 51})
+            await price_bus.aflush()
+            batch = await communicator.receive_json_from()
+            self.assertEqual(batch, {
+                'type': 'price_batch',
+                'data': {'updates': [{'instrument_key': 'NSE_EQ|AAA', 'current_price': 99.5}]},
+            })
+            self.assertTrue(await communicator.receive_nothing())
+
+            await communicator.send_json_to({'type': 'unsubscribe', 'instrument_keys': ['NSE_EQ|AAA']})
+            await communicator.send_json_to({'type': 'ping'})
+            self.assertEqual(await communicator.receive_json_from(), {'type': 'pong'})
+            price_bus.add({'instrument_key': 'NSE_EQ|AAA', 'current_price': 98})
+            await price_bus.aflush()
+            self.assertTrue(await communicator.receive_nothing())
+
+            # '*' receives every instrument in one batch
+            await communicator.send_json_to({'type': 'subscribe', 'instrument_keys': ['*']})
+            snapshot = await communicator.receive_json_from()
+            self.assertEqual(len(snapshot['data']['updates']), 2)
+            price_bus.add({'instrument_key': 'NSE_EQ|AAA', 'current_price': 97})
+            price_bus.add({'instrument_key': 'NSE_EQ|BBB', 'current_price': 52})
+            await price_bus.aflush()
+            batch = await communicator.receive_json_from()
+            self.assertEqual(len(batch['data']['updates']), 2)
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
+
+    def test_snapshot_covers_every_producer(self):
+        async def scenario():
+            # Two producers, each with its own bus, publishing different instruments
+            gateway_bus = PriceBus(channel_layer=get_channel_layer())
+            broadcaster_bus = PriceBus(channel_layer=get_channel_layer())
+            gateway_bus.add({'instrument_key': 'NSE_EQ|AAA', 'current_price': 100})
+            await gateway_bus.aflush()
+            broadcaster_bus.add({'instrument_key': 'NSE_EQ|BBB', 'current_price': 50})
+            await broadcaster_bus.aflush()
+            gateway_bus.add({'instrument_key': 'NSE_EQ|AAA', 'current_price': 101})
+            await gateway_bus.aflush()
+
+            communicator = WebsocketCommunicator(PriceConsumer.as_asgi(), '/ws/prices/')
+            await communicator.connect()
+            await communicator.send_json_to({'type': 'subscribe', 'instrument_keys': ['*']})
+            snapshot = await communicator.receive_json_from()
+            self.assertEqual(snapshot['data']['updates'], [
+                {'instrument_key': 'NSE_EQ|AAA', 'current_price': 101},
+                {'instrument_key': 'NSE_EQ|BBB', 'current_price': 50},
+            ])
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class PriceBusEndToEndTests(TestCase):
+    """Ticks from every producer reach subscribed PriceConsumers through the bus"""
+    instrument_keys = [f'NSE_EQ|K{i}' for i in range(10)]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_ticks_from_each_producer_reach_consumers(self):
+        async def connect(instrument_keys):
+            communicator = WebsocketCommunicator(PriceConsumer.as_asgi(), '/ws/prices/')
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.send_json_to({'type': 'subscribe', 'instrument_keys': instrument_keys})
+            await communicator.send_json_to({'type': 'ping'})
+            # Drain any snapshot sent for the subscription
+            while (await communicator.receive_json_from())['type'] != 'pong':
+                pass
+            return communicator
+
+        async def receive_batches(communicator):
+            batches = []
+            while not await communicator.receive_nothing(timeout=0.05):
+                batches.append(await communicator.receive_json_from())
+            return batches
+
+        async def scenario():
+            gateway = MarketDataGateway()
+            gateway.price_bus.window = 60  # batch all ticks into one flush
+            mock = MockWebSocketClient()
+            broadcaster = PriceBus()
+            everything = await connect(['*'])
+            single = await connect(['NSE_EQ|K0'])
+
+            # Upstox feed through the gateway: 1000 ticks, the last per instrument wins
+            ticks = 1000
+            for i in range(ticks):
+                frame = MarketDataFeedV3_pb2.FeedResponse()
+                frame.feeds[self.instrument_keys[i % 10]].ltpc.ltp = 100 + i
+                await gateway.process_frame(frame.SerializeToString())
+            await gateway.price_bus.aflush()
+            # Mock feed: one batch per cycle
+            await mock.broadcast_mock_prices(self.instrument_keys)
+            # Management-command broadcasters publish from sync code
+            for i, key in enumerate(self.instrument_keys):
+                broadcaster.add(price_quote(key, 50 + i, tradingsymbol=f'K{i}'))
+            await sync_to_async(broadcaster.flush)()
+
+            expected = [
+                {k: float(100 + ticks - 10 + i) for i, k in enumerate(self.instrument_keys)},
+                {k: q['current_price'] for k, q in mock.price_bus.published.items()},
+                {k: float(50 + i) for i, k in enumerate(self.instrument_keys)},
+            ]
+
+            batches = await receive_batches(everything)
+            self.assertEqual(len(batches), 3)  # one message per producer flush
+            for batch, prices in zip(batches, expected):
+                self.assertEqual({u['instrument_key']: u['current_price'] for u in batch['data']['updates']}, prices)
+
+            batches = await receive_batches(single)
+            self.assertEqual(len(batches), 3)
+            for batch, prices in zip(batches, expected):
+                [update] = batch['data']['updates']
+                self.assertEqual(update['instrument_key'], 'NSE_EQ|K0')
+                self.assertEqual(update['current_price'], prices['NSE_EQ|K0'])
+
+            await everything.disconnect()
+            await single.disconnect()
+
+        async_to_sync(scenario)()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class UpstoxWebSocketClientTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='trader', password='secret')
+        self.wallet = VirtualWallet.objects.get(user=self.user)
+        alert = RadarAlert.objects.create(instrument_key='NSE_EQ|AAA', source_strategy='RealTime_ORB')
+        self.trade = VirtualTrade.objects.create(
+            wallet=self.wallet, alert=alert, instrument_key='NSE_EQ|AAA', tradingsymbol='AAA',
+            trade_type='BUY', quantity=10, entry_price=Decimal('100.00'),
+            target_price=Decimal('110.00'), stop_loss=Decimal('95.00'), status='EXECUTED',
+        )
+        self.wallet.total_invested = Decimal('1000.00')
+        self.wallet.save()
+
+    def test_ticks_check_exits_in_memory_and_closures_are_written_in_background(self):
+        client = UpstoxWebSocketClient()
+
+        async_to_sync(client.refresh_open_trades)()
+        self.assertEqual(client.trade_index.instrument_keys(), ['NSE_EQ|AAA'])
+
+        async def scenario():
+            writer = asyncio.create_task(client.write_closures())
+            # Runs on the event loop, where any ORM call raises SynchronousOnlyOperation
+            client.check_trades_for_execution('NSE_EQ|AAA', Decimal('105.00'))
+            client.check_trades_for_execution('NSE_EQ|AAA', Decimal('111.00'))
+            # Already queued, so a second tick does not close it twice
+            client.check_trades_for_execution('NSE_EQ|AAA', Decimal('112.00'))
+            self.assertEqual(len(client.trade_index), 0)
+            await client.closures.join()
+            writer.cancel()
+        async_to_sync(scenario)()
+
+        self.trade.refresh_from_db()
+        self.assertEqual(self.trade.status, 'CLOSED')
+        self.assertEqual(self.trade.exit_price, Decimal('110.00'))
+        self.assertEqual(self.trade.pnl, Decimal('100.00'))
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.total_invested, Decimal('0.00'))
+        self.assertEqual(self.wallet.total_trades, 1)
+        self.assertEqual(WalletStats.objects.get(wallet=self.wallet).closed_trades, 1)
+
+    def test_full_queue_defers_closure_to_a_later_tick(self):
+        client = UpstoxWebSocketClient()
+        client.closures = asyncio.Queue(maxsize=1)
+        client.closures.put_nowait(('placeholder', None, None))
+        async_to_sync(client.refresh_open_trades)()
+
+        client.check_trades_for_execution('NSE_EQ|AAA', Decimal('94.00'))
+        self.assertIn(self.trade.id, client.trade_index)
+        self.assertNotIn(self.trade.id, client.closing)
+
+    def test_trades_opened_and_closed_elsewhere_reach_the_index(self):
+        client = UpstoxWebSocketClient()
+
+        async def wait_for(condition):
+            for _ in range(100):
+                if condition():
+                    return
+                await asyncio.sleep(0.01)
+            self.fail('index was not updated')
+
+        async def scenario():
+            listener = asyncio.create_task(client.listen_for_trade_changes())
+            await asyncio.sleep(0.01)
+
+            await sync_to_async(VirtualTrade.objects.filter(pk=self.trade.pk).update)(status='PENDING')
+            # A save through the ORM is published to the index on commit
+            self.trade.status = 'EXECUTED'
+            await sync_to_async(self.trade.save)()
+            await wait_for(lambda: self.trade.id in client.trade_index)
+            self.assertEqual(client.trade_index.trades[self.trade.id].target_price, Decimal('110.00'))
+
+            self.trade.status = 'CANCELLED'
+            await sync_to_async(self.trade.save)()
+            await wait_for(lambda: self.trade.id not in client.trade_index)
+            listener.cancel()
+        async_to_sync(scenario)()
+
+
+FEED_CAPTURE = os.path.join(os.path.dirname(__file__), 'testdata', 'upstox_feed_v3.frames')
+
+
+async def wait_until(condition, timeout=5):
+    for _ in range(int(timeout / 0.02)):
+        if condition():
+            return True
+        await asyncio.sleep(0.02)
+    return False
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class MarketGatewayTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='trader', password='secret')
+        self.wallet = VirtualWallet.objects.get(user=user)
+        alert = RadarAlert.objects.create(instrument_key='NSE_EQ|AAA', source_strategy='RealTime_ORB')
+        self.trade = VirtualTrade.objects.create(
+            wallet=self.wallet, alert=alert, instrument_key='NSE_EQ|AAA', tradingsymbol='AAA',
+            trade_type='BUY', quantity=10, entry_price=Decimal('100.00'),
+            target_price=Decimal('110.00'), stop_loss=Decimal('95.00'), status='EXECUTED',
+        )
+
+    def test_decode_reads_ltpc_and_full_feeds(self):
+        frames = list(read_frames(FEED_CAPTURE))
+        self.assertEqual(len(frames), 4)
+        self.assertEqual(decode_feed_ticks(frames[0]), [])  # market_info
+        [aaa, bbb] = sorted(decode_feed_ticks(frames[1]), key=lambda t: t['instrument_key'])
+        self.assertEqual(aaa, {'instrument_key': 'NSE_EQ|AAA', 'ltp': 105.0, 'ltt': 1760000000000, 'ltq': 0, 'cp': 100.0})
+        self.assertEqual(bbb['ltp'], 250.5)
+        self.assertEqual(decode_feed_ticks(frames[2])[0]['ltp'], 111.25)
+        self.assertIn(25100.4, [t['ltp'] for t in decode_feed_ticks(frames[3])])
+
+    def test_one_upstream_connection_serves_every_consumer(self):
+        frames = list(read_frames(FEED_CAPTURE))
+        requests_seen = []
+
+        async def fake_upstream(websocket):
+            async for request in websocket:
+                requests_seen.append(json.loads(request))
+                if requests_seen[-1]['method'] == 'sub':
+                    for frame in frames:
+                        await websocket.send(frame)
+
+        async def scenario():
+            async with websockets.serve(fake_upstream, '127.0.0.1', 0) as server:
+                port = server.sockets[0].getsockname()[1]
+                client = UpstoxWebSocketClient()
+                gateway = MarketDataGateway(channel_layer=client.channel_layer, feed_uri=f'ws://127.0.0.1:{port}')
+                watcher = GatewayConsumer('watcher', channel_layer=client.channel_layer)
+                prices = await client.channel_layer.new_channel()
+                await client.channel_layer.group_add(PRICE_GROUP, prices)
+
+                tasks = [asyncio.create_task(gateway.run())]
+                await asyncio.sleep(0.05)
+                await client.refresh_open_trades()
+                client.running = True
+                await watcher.open()
+                await watcher.declare(['NSE_EQ|BBB', 'NSE_INDEX|Nifty 50'])
+                tasks += [
+                    asyncio.create_task(client.listen_for_ticks()),
+                    asyncio.create_task(client.declare_interest_on_change()),
+                    asyncio.create_task(client.write_closures()),
+                ]
+
+                # Interest from both consumers is folded into one subscription
+                self.assertTrue(await wait_until(lambda: requests_seen))
+                self.assertEqual(requests_seen[0]['method'], 'sub')
+                self.assertEqual(requests_seen[0]['data']['instrumentKeys'], ['NSE_EQ|AAA', 'NSE_EQ|BBB', 'NSE_INDEX|Nifty 50'])
+
+                # Every consumer gets the same decoded ticks; the market_info frame has none
+                messages = [await watcher.receive() for _ in range(3)]
+                self.assertEqual([len(m['ticks']) for m in messages], [2, 1, 2])
+
+                # The trade client closed its trade on the 111.25 tick and dropped its interest
+                self.assertTrue(await wait_until(lambda: any(r['method'] == 'unsub' for r in requests_seen)))
+                self.assertEqual(requests_seen[-1]['data']['instrumentKeys'], ['NSE_EQ|AAA'])
+                await client.closures.join()
+
+                # Browsers get the prices through the bus, and REST-style lookups through the cache
+                await gateway.price_bus.aflush()
+                updates = {}
+                while not updates.get('NSE_EQ|BBB') == 251.0:
+                    message = await client.channel_layer.receive(prices)
+                    for update in json.loads(message['text'])['data']['updates']:
+                        updates[update['instrument_key']] = update['current_price']
+                self.assertEqual(updates['NSE_EQ|AAA'], 111.25)
+                self.assertEqual(get_last_prices(['NSE_EQ|BBB', 'NSE_EQ|ZZZ']), {'NSE_EQ|BBB': Decimal('251.0')})
+
+                gateway.stop()
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        async_to_sync(scenario)()
+
+        self.trade.refresh_from_db()
+        self.assertEqual((self.trade.status, self.trade.exit_price), ('CLOSED', Decimal('110.00')))
+
+    def test_replay_publishes_a_capture_to_consumers(self):
+        async def scenario():
+            gateway = MarketDataGateway()
+            watcher = GatewayConsumer('watcher', channel_layer=gateway.channel_layer)
+            await watcher.open()
+            self.assertEqual(await replay_frames(gateway, read_frames(FEED_CAPTURE)), 5)
+            message = await watcher.receive()
+            self.assertEqual(message['type'], 'md.ticks')
+        async_to_sync(scenario)()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MarketGatewayUnitTests(SimpleTestCase):
+    def test_bars_close_when_a_tick_starts_the_next_interval(self):
+        bars = BarAggregator(interval_ms=60000)
+        tick = {'instrument_key': 'NSE_EQ|AAA', 'ltq': 10, 'cp': 0.0}
+        self.assertIsNone(bars.add(dict(tick, ltp=100.0, ltt=60000)))
+        self.assertIsNone(bars.add(dict(tick, ltp=103.0, ltt=61000)))
+        self.assertIsNone(bars.add(dict(tick, ltp=99.0, ltt=119999)))
+        self.assertIsNone(bars.add(dict(tick, ltp=50.0, ltt=30000)))  # late, ignored
+        bar = bars.add(dict(tick, ltp=101.0, ltt=120000))
+        self.assertEqual(bar, {
+            'instrument_key': 'NSE_EQ|AAA', 'start': 60000,
+            'open': 100.0, 'high': 103.0, 'low': 99.0, 'close': 99.0, 'volume': 30,
+        })
+
+    def test_lapsed_interest_is_dropped(self):
+        gateway = MarketDataGateway(static_keys=['NSE_EQ|IDX'])
+        gateway.handle_interest({'consumer': 'a', 'instrument_keys': ['NSE_EQ|AAA']})
+        gateway.handle_interest({'consumer': 'b', 'instrument_keys': ['NSE_EQ|BBB']})
+        self.assertEqual(gateway.wanted_keys(), {'NSE_EQ|IDX', 'NSE_EQ|AAA', 'NSE_EQ|BBB'})
+        gateway.interest['a'] = (gateway.interest['a'][0], 0)
+        self.assertEqual(gateway.wanted_keys(), {'NSE_EQ|IDX', 'NSE_EQ|BBB'})
+        self.assertNotIn('a', gateway.interest)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OpenTradeIndexTests(SimpleTestCase):
+    def make_trade(self, trade_id, target, stop, hours_open=1, key='NSE_EQ|AAA'):
+        return OpenTrade(
+            id=trade_id, instrument_key=key, tradingsymbol=key.split('|')[1], username='trader',
+            entry_time=self.now - timedelta(hours=hours_open),
+            target_price=Decimal(target) if target else None,
+            stop_loss=Decimal(stop) if stop else None,
+        )
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.index = OpenTradeIndex([
+            self.make_trade(1, '110', '95'),
+            self.make_trade(2, '105', '98'),
+            self.make_trade(3, '120', None),
+            self.make_trade(4, None, '90', hours_open=25),
+            self.make_trade(5, '101', '99', key='NSE_EQ|BBB'),
+        ])
+
+    def exits(self, key, price):
+        return {t.id: (exit_price, reason) for t, exit_price, reason in self.index.triggered(key, Decimal(price), self.now)}
+
+    def test_triggered_matches_target_stop_and_time_limit_rules(self):
+        self.assertEqual(self.exits('NSE_EQ|AAA', '100'), {4: (Decimal('100'), 'Time limit exceeded')})
+        self.assertEqual(self.exits('NSE_EQ|AAA', '105'), {
+            2: (Decimal('105'), 'Target hit'),
+            4: (Decimal('105'), 'Time limit exceeded'),
+        })
+        self.assertEqual(self.exits('NSE_EQ|AAA', '95'), {
+            1: (Decimal('95'), 'Stop loss hit'),
+            2: (Decimal('98'), 'Stop loss hit'),
+            4: (Decimal('95'), 'Time limit exceeded'),
+        })
+        # A price exit takes precedence over the time limit
+        self.assertEqual(self.exits('NSE_EQ|AAA', '89')[4], (Decimal('90'), 'Stop loss hit'))
+        self.assertEqual(self.exits('NSE_EQ|BBB', '100'), {})
+        self.assertEqual(self.exits('NSE_EQ|CCC', '100'), {})
+
+    def test_remove_and_replace_keep_ladders_in_sync(self):
+        self.assertEqual(self.index.remove(4).id, 4)
+        self.assertIsNone(self.index.remove(4))
+        self.assertEqual(self.exits('NSE_EQ|AAA', '100'), {})
+
+        self.index.remove(5)
+        self.assertEqual(self.index.instrument_keys(), ['NSE_EQ|AAA'])
+
+        # Re-adding a trade with a new target replaces its old ladder entries
+        self.index.add(self.make_trade(3, '102', None))
+        self.assertEqual(self.exits('NSE_EQ|AAA', '103'), {3: (Decimal('102'), 'Target hit')})
+        self.assertEqual(len(self.index), 3)
+
+    def test_apply_change_round_trips_messages(self):
+        trade = self.make_trade(6, '130', '80', key='NSE_EQ|CCC')
+        self.index.apply_change({'type': 'trade.changed', 'id': 6, 'status': 'EXECUTED', 'trade': trade.to_message()})
+        self.assertEqual(self.index.trades[6], trade)
+        self.index.apply_change({'type': 'trade.changed', 'id': 6, 'status': 'CLOSED', 'trade': None})
+        self.assertNotIn(6, self.index)
+        self.assertNotIn('NSE_EQ|CCC', self.index.instrument_keys())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MetricsTests(TestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        registry = []
+        latency = metrics.Histogram('stage_seconds', 'Stage time', ['stage'], buckets=(0.1, 1), registry=registry)
+        latency.labels(stage='decode').observe(0.05)
+        latency.labels(stage='decode').observe(0.5)
+        latency.labels(stage='decode').observe(5)
+        metrics.Counter('ticks_total', 'Ticks', registry=registry).inc(3)
+
+        self.assertEqual(metrics.render(registry).splitlines(), [
+            '# HELP stage_seconds Stage time',
+            '# TYPE stage_seconds histogram',
+            'stage_seconds_bucket{stage="decode",le="0.1"} 1',
+            'stage_seconds_bucket{stage="decode",le="1.0"} 2',
+            'stage_seconds_bucket{stage="decode",le="+Inf"} 3',
+            'stage_seconds_sum{stage="decode"} 5.55',
+            'stage_seconds_count{stage="decode"} 3',
+            '# HELP ticks_total Ticks',
+            '# TYPE ticks_total counter',
+            'ticks_total 3.0',
+        ])
+
+    def test_endpoint_serves_recorded_metrics_to_local_clients(self):
+        user = User.objects.create_user(username='trader', password='secret')
+        alert = RadarAlert.objects.create(instrument_key='NSE_EQ|AAA', source_strategy='RealTime_ORB')
+        writes = metrics.DB_WRITE_SECONDS.labels(operation='record_closed_trade')
+        before = writes.count
+        create_closed_trade(VirtualWallet.objects.get(user=user), alert, 'AAA', 50, 10)
+        self.assertEqual(writes.count, before + 1)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'db_write_seconds_count{{operation="record_closed_trade"}} {before + 1}', response.content.decode())
+
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 403)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ScanRunTests(TestCase):
+    def fake_scanner(self, returncode=0, **recorded):
+        """A subprocess.run stand-in that records ``recorded`` on the ScanRun like the scanner does."""
+        def run(args, **kwargs):
+            if recorded:
+                scan_run_id = int(args[args.index('--scan-run-id') + 1])
+                ScanRun.objects.filter(pk=scan_run_id).update(finished_at=timezone.now(), **recorded)
+            return subprocess.CompletedProcess(args, returncode, '', 'Traceback: boom' if returncode else '')
+        return mock.patch('trading_app.views.subprocess.run', side_effect=run)
+
+    def test_trigger_scan_returns_recorded_stage_timings(self):
+        with self.fake_scanner(status='SUCCESS', fetch_seconds=1.5, rules_seconds=0.25, instruments_total=200,
+                               alerts_saved=3, api_calls=200):
+            response = self.client.post('/api/trigger-scan/', {'scan_type': 'screening'}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stocks_scanned'], 200)
+        self.assertEqual(response.data['stage_seconds'],
+                         {'context': 0.0, 'fetch': 1.5, 'indicators': 0.0, 'rules': 0.25, 'persist': 0.0})
+        result = response.data['scan_results'][0]
+        self.assertEqual((result['success'], result['alerts_found']), (True, 3))
+        self.assertEqual(result['scan_run']['scan_type'], 'SCREENING')
+        self.assertEqual(result['scan_run']['api_calls'], 200)
+
+    def test_scanner_exiting_without_recording_marks_run_failed(self):
+        with self.fake_scanner(returncode=1):
+            response = self.client.post('/api/trigger-scan/', {'scan_type': 'screening'}, content_type='application/json')
+
+        result = response.data['scan_results'][0]
+        self.assertFalse(result['success'])
+        scan_run = ScanRun.objects.get()
+        self.assertEqual((scan_run.status, scan_run.error), ('FAILED', 'Traceback: boom'))
+        self.assertIsNotNone(scan_run.finished_at)
+
+    def test_list_and_daily_trends(self):
+        for fetch, status in ((1.0, 'SUCCESS'), (3.0, 'SUCCESS'), (50.0, 'FAILED')):
+            ScanRun.objects.create(scan_type='SCREENING', status=status, duration_seconds=fetch + 1,
+                                   fetch_seconds=fetch)
+        ScanRun.objects.create(scan_type='INTRADAY', status='SUCCESS')
+        old = ScanRun.objects.create(scan_type='SCREENING', status='SUCCESS', fetch_seconds=9.0)
+        ScanRun.objects.filter(pk=old.pk).update(started_at=timezone.now() - timedelta(days=90))
+
+        response = self.client.get('/api/scan-runs/', {'scan_type': 'screening', 'days': 30})
+        self.assertEqual(len(response.data['results']), 3)
+
+        days = self.client.get('/api/scan-runs/trends/', {'scan_type': 'screening'}).data['days']
+        self.assertEqual(len(days), 1)
+        self.assertEqual((days[0]['runs'], days[0]['avg_fetch_seconds']), (2, 2.0))
+
+        self.assertEqual(self.client.get('/api/scan-runs/', {'days': 'week'}).status_code, 400)
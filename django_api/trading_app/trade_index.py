@@ -0,0 +1,221 @@
+# trading_app/trade_index.py
+"""
+In-memory index of open (EXECUTED) virtual trades for exit detection on
+price ticks.
+
+Each instrument keeps its trades' targets, stop losses and entry times in
+sorted lists, so a tick finds every triggered trade with a binary search
+instead of querying and scanning all of the instrument's trades:
+
+    targets hit:  target_price <= price   (a prefix of the targets ladder)
+    stops hit:    stop_loss >= price      (a suffix of the stops ladder)
+    time limit:   entry_time < now - 24h  (a prefix of the entry ladder)
+
+Processes holding an index stay in sync with VirtualTrade writes made
+elsewhere through the TRADE_INDEX_GROUP channel-layer group: every committed
+save or delete is published as a trade_change_message():
+
+    {"type": "trade.changed", "id": ..., "status": ..., "trade": {...} | None}
+
+where ``trade`` (OpenTrade.to_message()) is set only for EXECUTED trades.
+"""
+
+import logging
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# Group notified with a 'trade.changed' message whenever a VirtualTrade is saved
+TRADE_INDEX_GROUP = 'open_trades'
+
+# Open trades are closed at market after this long
+TRADE_TIME_LIMIT = timedelta(hours=24)
+
+
+@dataclass(frozen=True)
+class OpenTrade:
+    """The fields of an EXECUTED VirtualTrade needed to check exits on a tick"""
+    id: int
+    instrument_key: str
+    tradingsymbol: str
+    username: str
+    entry_time: datetime
+    target_price: Optional[Decimal]
+    stop_loss: Optional[Decimal]
+
+    @classmethod
+    def from_trade(cls, trade):
+        return cls(
+            id=trade.id,
+            instrument_key=trade.instrument_key,
+            tradingsymbol=trade.tradingsymbol,
+            username=trade.wallet.user.username,
+            entry_time=trade.entry_time,
+            target_price=trade.target_price,
+            stop_loss=trade.stop_loss,
+        )
+
+    @classmethod
+    def from_message(cls, data):
+        return cls(
+            id=data['id'],
+            instrument_key=data['instrument_key'],
+            tradingsymbol=data['tradingsymbol'],
+            username=data['username'],
+            entry_time=parse_datetime(data['entry_time']),
+            target_price=Decimal(data['target_price']) if data['target_price'] is not None else None,
+            stop_loss=Decimal(data['stop_loss']) if data['stop_loss'] is not None else None,
+        )
+
+    def to_message(self):
+        """Channel-layer safe representation (no Decimal or datetime values)"""
+        return {
+            'id': self.id,
+            'instrument_key': self.instrument_key,
+            'tradingsymbol': self.tradingsymbol,
+            'username': self.username,
+            'entry_time': self.entry_time.isoformat(),
+            'target_price': str(self.target_price) if self.target_price is not None else None,
+            'stop_loss': str(self.stop_loss) if self.stop_loss is not None else None,
+        }
+
+
+class InstrumentLadder:
+    """Sorted (threshold, trade_id) lists for one instrument's open trades"""
+    __slots__ = ('targets', 'stops', 'entries')
+
+    def __init__(self):
+        self.targets = []
+        self.stops = []
+        self.entries = []
+
+    def __bool__(self):
+        return bool(self.entries)
+
+
+def _discard(ladder, item):
+    i = bisect_left(ladder, item)
+    if i < len(ladder) and ladder[i] == item:
+        del ladder[i]
+
+
+class OpenTradeIndex:
+    """
+    Open trades grouped by instrument with sorted exit ladders.
+
+    ``triggered()`` does not remove anything; callers remove a trade once its
+    closure has been handed off, so a deferred closure is retried next tick.
+    """
+
+    def __init__(self, trades=()):
+        self.trades = {}   # trade_id -> OpenTrade
+        self.ladders = {}  # instrument_key -> InstrumentLadder
+        for trade in trades:
+            self.add(trade)
+
+    def __len__(self):
+        return len(self.trades)
+
+    def __contains__(self, trade_id):
+        return trade_id in self.trades
+
+    def instrument_keys(self):
+        return list(self.ladders)
+
+    def trades_for(self, instrument_key):
+        ladder = self.ladders.get(instrument_key)
+        return [self.trades[trade_id] for _, trade_id in ladder.entries] if ladder else []
+
+    def add(self, trade):
+        """Add or replace a trade"""
+        if trade.id in self.trades:
+            self.remove(trade.id)
+        self.trades[trade.id] = trade
+        ladder = self.ladders.setdefault(trade.instrument_key, InstrumentLadder())
+        if trade.target_price:
+            insort(ladder.targets, (trade.target_price, trade.id))
+        if trade.stop_loss:
+            insort(ladder.stops, (trade.stop_loss, trade.id))
+        insort(ladder.entries, (trade.entry_time, trade.id))
+
+    def remove(self, trade_id):
+        """Remove a trade if present and return it"""
+        trade = self.trades.pop(trade_id, None)
+        if trade is None:
+            return None
+        ladder = self.ladders[trade.instrument_key]
+        if trade.target_price:
+            _discard(ladder.targets, (trade.target_price, trade.id))
+        if trade.stop_loss:
+            _discard(ladder.stops, (trade.stop_loss, trade.id))
+        _discard(ladder.entries, (trade.entry_time, trade.id))
+        if not ladder:
+            del self.ladders[trade.instrument_key]
+        return trade
+
+    def replace_all(self, trades):
+        self.trades = {}
+        self.ladders = {}
+        for trade in trades:
+            self.add(trade)
+
+    def apply_change(self, data):
+        """Apply a 'trade.changed' message: index EXECUTED trades, drop anything else"""
+        if data['status'] == 'EXECUTED':
+            self.add(OpenTrade.from_message(data['trade']))
+        else:
+            self.remove(data['id'])
+
+    def triggered(self, instrument_key, price, now=None):
+        """
+        Return ``[(trade, exit_price, exit_reason), ...]`` for every trade on
+        the instrument that should exit at ``price``. Checks run in the same
+        order the per-trade check used: target, then stop loss, then time limit.
+        """
+        ladder = self.ladders.get(instrument_key)
+        if not ladder:
+            return []
+
+        exits = {}
+        # Tuples compare on price first; the sentinels bracket every trade id at that price
+        for target, trade_id in ladder.targets[:bisect_right(ladder.targets, (price, float('inf')))]:
+            exits[trade_id] = (self.trades[trade_id], target, 'Target hit')
+        for stop, trade_id in ladder.stops[bisect_left(ladder.stops, (price, float('-inf'))):]:
+            exits.setdefault(trade_id, (self.trades[trade_id], stop, 'Stop loss hit'))
+
+        cutoff = (now or timezone.now()) - TRADE_TIME_LIMIT
+        for _, trade_id in ladder.entries[:bisect_left(ladder.entries, (cutoff, float('-inf')))]:
+            exits.setdefault(trade_id, (self.trades[trade_id], price, 'Time limit exceeded'))
+        return list(exits.values())
+
+
+def trade_change_message(trade, deleted=False):
+    """Build the 'trade.changed' message for a saved or deleted VirtualTrade"""
+    status = 'DELETED' if deleted else trade.status
+    return {
+        'type': 'trade.changed',
+        'id': trade.id,
+        'status': status,
+        'trade': OpenTrade.from_trade(trade).to_message() if status == 'EXECUTED' else None,
+    }
+
+
+def publish_trade_change(message):
+    """Send a trade_change_message() to every open-trade index"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(TRADE_INDEX_GROUP, message)
+    except Exception as e:
+        # The periodic refresh in each index holder picks the change up later
+        logger.error(f"Failed to publish change for trade {message['id']}: {e}")
@@ -0,0 +1,83 @@
+# trading_app/upstox_feed.py
+"""
+Upstox Market Data Feed V3 wire helpers: authorization, binary sub/unsub
+requests and FeedResponse decoding. Used by the market data gateway, the
+only process that holds the upstream connection.
+"""
+
+import json
+import uuid
+
+import requests
+from upstox_client.feeder.proto import MarketDataFeedV3_pb2
+
+from . import metrics
+
+# Returns a one-time wss:// URI for the Market Data Feed V3
+FEED_AUTHORIZE_URL = 'https://api.upstox.com/v3/feed/market-data-feed/authorize'
+FEED_MODE = 'ltpc'
+
+# Instrument keys per sub/unsub request
+SUBSCRIPTION_BATCH_SIZE = 100
+
+
+def authorize_feed(access_token):
+    """Get the authorized V3 feed URI for an access token (blocking)"""
+    with metrics.upstox_call('feed_authorize'):
+        response = requests.get(
+            FEED_AUTHORIZE_URL,
+            headers={'Authorization': f'Bearer {access_token}', 'Accept': 'application/json'},
+            timeout=10,
+        )
+        response.raise_for_status()
+    uri = response.json().get('data', {}).get('authorized_redirect_uri')
+    if not uri:
+        raise ValueError(f"authorized_redirect_uri not found in response: {response.text}")
+    return uri
+
+
+def feed_request(method, instrument_keys):
+    """Encode a V3 'sub' or 'unsub' request; the feed only accepts binary frames"""
+    request = {
+        'guid': uuid.uuid4().hex,
+        'method': method,
+        'data': {'instrumentKeys': instrument_keys},
+    }
+    if method == 'sub':
+        request['data']['mode'] = FEED_MODE
+    return json.dumps(request).encode('utf-8')
+
+
+def decode_feed_ticks(frame):
+    """
+    Decode a binary FeedResponse frame into normalized ticks:
+
+        {'instrument_key', 'ltp', 'ltt' (epoch ms), 'ltq', 'cp' (previous close)}
+
+    The LTPC is read from ltpc feeds and from the ltpc inside full market and
+    index feeds; market_info frames carry no feeds.
+    """
+    response = MarketDataFeedV3_pb2.FeedResponse()
+    response.ParseFromString(frame)
+
+    ticks = []
+    for instrument_key, feed in response.feeds.items():
+        kind = feed.WhichOneof('FeedUnion')
+        if kind == 'ltpc':
+            ltpc = feed.ltpc
+        elif kind == 'fullFeed':
+            full_kind = feed.fullFeed.WhichOneof('FullFeedUnion')
+            if full_kind is None:
+                continue
+            ltpc = getattr(feed.fullFeed, full_kind).ltpc
+        else:
+            continue
+        if ltpc.ltp > 0:
+            ticks.append({
+                'instrument_key': instrument_key,
+                'ltp': ltpc.ltp,
+                'ltt': ltpc.ltt,
+                'ltq': ltpc.ltq,
+                'cp': ltpc.cp,
+            })
+    return ticks
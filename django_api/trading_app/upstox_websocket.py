@@ -1,151 +1,166 @@
 # trading_app/upstox_websocket.py
 
 import asyncio
-import json
-import websockets
 import logging
 from decimal import Decimal
+from django.db import transaction
 from django.utils import timezone
+from channels.db import database_sync_to_async
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from .models import VirtualTrade, VirtualWallet, UserProfile
+from .models import VirtualTrade, VirtualWallet
+from .analytics import record_closed_trade
+from .market_gateway import GatewayConsumer
+from .trade_index import TRADE_INDEX_GROUP, OpenTrade, OpenTradeIndex
 from django.contrib.auth.models import User
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on closures waiting for the background writer
+CLOSURE_QUEUE_SIZE = 1000
+
+# Seconds of open-trade changes folded into one interest declaration
+INTEREST_WINDOW = 0.5
+
+
 class UpstoxWebSocketClient:
-    """WebSocket client for Upstox real-time price feed"""
+    """
+    Closes virtual trades on live ticks from the market data gateway.
+
+    The gateway holds the Upstox feed connection and publishes prices to
+    browsers; this client declares the instruments with open trades as its
+    interest, re-declaring as trades open and close, and reads ticks from
+    the gateway's tick group.
+
+    Nothing on the tick path touches the database: open trades are held in
+    an OpenTradeIndex kept current from TRADE_INDEX_GROUP (with a periodic
+    full refresh off-loop as a fallback), exits are found with a binary
+    search of its ladders, and closures are persisted by a background
+    writer through a bounded queue.
+    """
     
     def __init__(self):
-        self.websocket = None
         self.channel_layer = get_channel_layer()
+        self.gateway = GatewayConsumer('trade-monitor', channel_layer=self.channel_layer)
         self.running = False
-        self.reconnect_delay = 5
-        self.max_reconnect_delay = 300
-        
-    async def connect(self):
-        """Connect to Upstox WebSocket"""
-        try:
-            # Get access token from user profile
-            user_profile = await self.get_user_profile()
-            if not user_profile:
-                logger.error("No user profile with Upstox access token found")
-                return False
-            
-            # Upstox WebSocket URL
-            ws_url = "wss://ws-api.upstox.com/index/dash/stream"
-            
-            # Connect to WebSocket
-            self.websocket = await websockets.connect(
-                ws_url,
-                extra_headers={
-                    'Authorization': f'Bearer {user_profile.upstox_access_token}',
-                    'Accept': 'application/json'
-                }
-            )
-            
-            logger.info("Connected to Upstox WebSocket")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to connect to Upstox WebSocket: {e}")
-            return False
+        # Exit checks on each tick only read this
+        self.trade_index = OpenTradeIndex()
+        self.trade_refresh_interval = 30
+        # Closures are written by one background task; ids in flight are kept
+        # out of the index so a refresh cannot queue them twice
+        self.closures = asyncio.Queue(maxsize=CLOSURE_QUEUE_SIZE)
+        self.closing = set()
+        self.interest_changed = asyncio.Event()
+        self.tick_task = None
     
-    async def subscribe_to_instruments(self, instrument_keys):
-        """Subscribe to instrument price updates"""
-        if not self.websocket:
-            return
-        
-        try:
-            # Subscribe message format for Upstox
-            subscribe_message = {
-                "action": "subscribe",
-                "symbols": instrument_keys
-            }
-            
-            await self.websocket.send(json.dumps(subscribe_message))
-            logger.info(f"Subscribed to {len(instrument_keys)} instruments")
-            
-        except Exception as e:
-            logger.error(f"Failed to subscribe to instruments: {e}")
+    async def declare_interest_on_change(self):
+        """Fold index changes within INTEREST_WINDOW into one declaration to the gateway"""
+        while True:
+            await self.interest_changed.wait()
+            await asyncio.sleep(INTEREST_WINDOW)
+            self.interest_changed.clear()
+            try:
+                await self.gateway.declare(self.trade_index.instrument_keys())
+            except Exception as e:
+                logger.error(f"Failed to declare instruments to the gateway: {e}")
     
-    async def get_instrument_keys(self):
-        """Get all instrument keys from open trades"""
-        try:
-            open_trades = VirtualTrade.objects.filter(status='EXECUTED')
-            instrument_keys = list(set(trade.instrument_key for trade in open_trades))
-            return instrument_keys
-        except Exception as e:
-            logger.error(f"Failed to get instrument keys: {e}")
-            return []
+    @database_sync_to_async
+    def load_open_trades(self):
+        """Load EXECUTED trades (runs off the event loop)"""
+        return [
+            OpenTrade.from_trade(trade)
+            for trade in VirtualTrade.objects.filter(status='EXECUTED').select_related('wallet__user')
+        ]
     
-    async def get_user_profile(self):
-        """Get user profile with Upstox access token"""
-        try:
-            user_profile = UserProfile.objects.filter(
-                upstox_access_token__isnull=False
-            ).first()
-            return user_profile
-        except Exception as e:
-            logger.error(f"Failed to get user profile: {e}")
-            return None
+    async def refresh_open_trades(self):
+        """Rebuild the open-trade index from the database, leaving out closures still being written"""
+        trades = await self.load_open_trades()
+        self.trade_index.replace_all(t for t in trades if t.id not in self.closing)
+        self.interest_changed.set()
     
-    async def process_price_update(self, data):
-        """Process price update and check for trade execution"""
+    async def listen_for_trade_changes(self):
+        """Apply 'trade.changed' messages from TRADE_INDEX_GROUP to the index as trades open and close"""
+        channel = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(TRADE_INDEX_GROUP, channel)
         try:
-            # Extract price data from Upstox message
-            if 'data' in data:
-                for instrument_data in data['data']:
-                    instrument_key = instrument_data.get('instrument_key')
-                    current_price = Decimal(str(instrument_data.get('last_price', 0)))
-                    
-                    if instrument_key and current_price > 0:
-                        # Check open trades for this instrument
-                        await self.check_trades_for_execution(instrument_key, current_price)
-                        
-                        # Broadcast price update to frontend
-                        await self.broadcast_price_update(instrument_key, current_price)
-                        
-        except Exception as e:
-            logger.error(f"Error processing price update: {e}")
+            while True:
+                message = await self.channel_layer.receive(channel)
+                if message.get('type') != 'trade.changed' or message['id'] in self.closing:
+                    continue
+                self.trade_index.apply_change(message)
+                self.interest_changed.set()
+        finally:
+            await self.channel_layer.group_discard(TRADE_INDEX_GROUP, channel)
     
-    async def check_trades_for_execution(self, instrument_key, current_price):
-        """Check if any trades should be executed based on current price"""
+    async def refresh_open_trades_periodically(self):
+        """Full refresh as a fallback for missed or expired group messages"""
+        while self.running:
+            await asyncio.sleep(self.trade_refresh_interval)
+            try:
+                await self.refresh_open_trades()
+            except Exception as e:
+                logger.error(f"Failed to refresh open trades: {e}")
+    
+    def process_ticks(self, ticks):
+        """Check open trades against a batch of gateway ticks"""
+        for tick in ticks:
+            self.check_trades_for_execution(tick['instrument_key'], Decimal(str(tick['ltp'])))
+    
+    def check_trades_for_execution(self, instrument_key, current_price):
+        """Find the instrument's triggered trades in the index and queue their exits"""
+        for trade, exit_price, exit_reason in self.trade_index.triggered(instrument_key, current_price):
+            if self.queue_trade_closure(trade, exit_price, exit_reason):
+                self.trade_index.remove(trade.id)
+                # Drop the instrument from the gateway once its last trade has gone
+                if instrument_key not in self.trade_index.ladders:
+                    self.interest_changed.set()
+    
+    def queue_trade_closure(self, trade, exit_price, exit_reason):
+        """Hand a closure to the background writer; False if the queue is full"""
         try:
-            open_trades = VirtualTrade.objects.filter(
-                instrument_key=instrument_key,
-                status='EXECUTED'
-            )
-            
-            for trade in open_trades:
-                should_close, exit_price, exit_reason = self.should_close_trade(trade, current_price)
-                
-                if should_close:
-                    await self.execute_trade_closure(trade, exit_price, exit_reason)
-                    
-        except Exception as e:
-            logger.error(f"Error checking trades for execution: {e}")
+            self.closures.put_nowait((trade, exit_price, exit_reason))
+        except asyncio.QueueFull:
+            # Leave the trade in the index so a later tick retries it
+            logger.warning(f"Closure queue full, deferring trade {trade.id} ({trade.tradingsymbol})")
+            return False
+        self.closing.add(trade.id)
+        return True
     
-    def should_close_trade(self, trade, current_price):
-        """Determine if a trade should be closed"""
-        # Check target price
-        if trade.target_price and current_price >= trade.target_price:
-            return True, trade.target_price, 'Target hit'
-        
-        # Check stop loss
-        if trade.stop_loss and current_price <= trade.stop_loss:
-            return True, trade.stop_loss, 'Stop loss hit'
-        
-        # Check time limit (24 hours)
-        time_open = timezone.now() - trade.entry_time
-        if time_open.total_seconds() > 24 * 60 * 60:  # 24 hours
-            return True, current_price, 'Time limit exceeded'
-        
-        return False, None, None
+    async def write_closures(self):
+        """Background writer: persist queued closures one at a time, off the event loop"""
+        while True:
+            trade, exit_price, exit_reason = await self.closures.get()
+            try:
+                await self.execute_trade_closure(trade, exit_price, exit_reason)
+            finally:
+                self.closing.discard(trade.id)
+                self.closures.task_done()
     
     async def execute_trade_closure(self, trade, exit_price, exit_reason):
         """Execute trade closure and update wallet"""
         try:
+            update = await self.close_trade(trade.id, exit_price, exit_reason)
+            if update is None:
+                return
+            
+            # Broadcast trade update
+            await self.broadcast_trade_update(trade.username, update)
+            
+            logger.info(f"Closed trade {trade.id} ({trade.tradingsymbol}) at {exit_price} - P&L: ₹{update['pnl']:.2f}")
+            
+        except Exception as e:
+            logger.error(f"Error executing trade closure: {e}")
+    
+    @database_sync_to_async
+    def close_trade(self, trade_id, exit_price, exit_reason):
+        """
+        Close the trade and update its wallet in one transaction. Returns the
+        trade_update payload, or None if the trade was already closed elsewhere.
+        """
+        with transaction.atomic():
+            trade = VirtualTrade.objects.select_for_update().filter(pk=trade_id, status='EXECUTED').first()
+            if trade is None:
+                return None
+            
             # Update trade
             trade.exit_price = exit_price
             trade.exit_time = timezone.now()
@@ -163,7 +178,7 @@ class UpstoxWebSocketClient:
             trade.save()
             
             # Update wallet
-            wallet = trade.wallet
+            wallet = VirtualWallet.objects.select_for_update().get(pk=trade.wallet_id)
             wallet.total_pnl += pnl
             wallet.total_trades += 1
             
@@ -176,53 +191,30 @@ class UpstoxWebSocketClient:
             wallet.balance += pnl
             wallet.save()
             
-            # Broadcast trade update
-            await self.broadcast_trade_update(trade, pnl, exit_reason)
-            
-            logger.info(f"Closed trade {trade.id} ({trade.tradingsymbol}) at {exit_price} - P&L: ₹{pnl:.2f}")
-            
-        except Exception as e:
-            logger.error(f"Error executing trade closure: {e}")
-    
-    async def broadcast_price_update(self, instrument_key, current_price):
-        """Broadcast price update to all connected clients"""
-        try:
-            message = {
-                'type': 'price_update',
-                'data': {
-                    'instrument_key': instrument_key,
-                    'current_price': float(current_price),
-                    'timestamp': timezone.now().isoformat()
-                }
-            }
-            
-            await self.channel_layer.group_send(
-                'price_updates',
-                message
-            )
-            
-        except Exception as e:
-            logger.error(f"Error broadcasting price update: {e}")
+            # Update the wallet's performance snapshot
+            record_closed_trade(trade)
+        
+        return {
+            'trade_id': trade.id,
+            'tradingsymbol': trade.tradingsymbol,
+            'status': 'CLOSED',
+            'exit_price': float(trade.exit_price),
+            'pnl': float(pnl),
+            'pnl_percentage': float(trade.pnl_percentage),
+            'exit_reason': exit_reason,
+            'timestamp': timezone.now().isoformat()
+        }
     
-    async def broadcast_trade_update(self, trade, pnl, exit_reason):
+    async def broadcast_trade_update(self, username, data):
         """Broadcast trade update to user's trading room"""
         try:
             message = {
                 'type': 'trade_update',
-                'data': {
-                    'trade_id': trade.id,
-                    'tradingsymbol': trade.tradingsymbol,
-                    'status': 'CLOSED',
-                    'exit_price': float(trade.exit_price),
-                    'pnl': float(pnl),
-                    'pnl_percentage': float(trade.pnl_percentage),
-                    'exit_reason': exit_reason,
-                    'timestamp': timezone.now().isoformat()
-                }
+                'data': data
             }
             
             # Send to user's trading room
-            room_name = f'trading_{trade.wallet.user.username}'
+            room_name = f'trading_{username}'
             await self.channel_layer.group_send(
                 room_name,
                 message
@@ -231,60 +223,44 @@ class UpstoxWebSocketClient:
         except Exception as e:
             logger.error(f"Error broadcasting trade update: {e}")
     
-    async def listen_for_messages(self):
-        """Listen for messages from Upstox WebSocket"""
+    async def listen_for_ticks(self):
+        """Declare the open-trade instruments and process gateway ticks until cancelled"""
+        await self.gateway.open()
         try:
-            while self.running and self.websocket:
-                try:
-                    message = await self.websocket.recv()
-                    data = json.loads(message)
-                    
-                    # Process price updates
-                    await self.process_price_update(data)
-                    
-                except websockets.exceptions.ConnectionClosed:
-                    logger.warning("WebSocket connection closed")
-                    break
-                except json.JSONDecodeError:
-                    logger.warning("Invalid JSON message received")
-                except Exception as e:
-                    logger.error(f"Error processing message: {e}")
-                    
-        except Exception as e:
-            logger.error(f"Error in message listener: {e}")
+            await self.gateway.declare(self.trade_index.instrument_keys())
+            while self.running:
+                message = await self.gateway.receive()
+                if message['type'] == 'md.ticks':
+                    self.process_ticks(message['ticks'])
+        finally:
+            await self.gateway.close()
     
     async def run(self):
-        """Main run loop with reconnection logic"""
+        """Main run loop"""
         self.running = True
+        await self.refresh_open_trades()
+        background = [
+            asyncio.create_task(self.write_closures()),
+            asyncio.create_task(self.refresh_open_trades_periodically()),
+            asyncio.create_task(self.listen_for_trade_changes()),
+            asyncio.create_task(self.declare_interest_on_change()),
+            asyncio.create_task(self.gateway.heartbeat()),
+        ]
         
-        while self.running:
-            try:
-                # Connect to WebSocket
-                if await self.connect():
-                    # Get instrument keys to subscribe to
-                    instrument_keys = await self.get_instrument_keys()
-                    
-                    if instrument_keys:
-                        await self.subscribe_to_instruments(instrument_keys)
-                    
-                    # Listen for messages
-                    await self.listen_for_messages()
-                
-                # Reconnection logic
-                if self.running:
-                    logger.info(f"Reconnecting in {self.reconnect_delay} seconds...")
-                    await asyncio.sleep(self.reconnect_delay)
-                    self.reconnect_delay = min(self.reconnect_delay * 2, self.max_reconnect_delay)
-                    
-            except Exception as e:
-                logger.error(f"Error in main run loop: {e}")
-                await asyncio.sleep(self.reconnect_delay)
+        self.tick_task = asyncio.create_task(self.listen_for_ticks())
+        try:
+            await self.tick_task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for task in background:
+                task.cancel()
     
     def stop(self):
         """Stop the WebSocket client"""
         self.running = False
-        if self.websocket:
-            asyncio.create_task(self.websocket.close())
+        if self.tick_task:
+            self.tick_task.cancel()
 
 
 # Global WebSocket client instance
@@ -12,6 +12,7 @@ router.register(r'alerts', views.RadarAlertViewSet)
 router.register(r'virtual-wallets', views.VirtualWalletViewSet)
 router.register(r'virtual-trades', views.VirtualTradeViewSet)
 router.register(r'virtual-positions', views.VirtualPositionViewSet)
+router.register(r'scan-runs', views.ScanRunViewSet)
 
 urlpatterns = [
     path('screener-status/', views.get_screener_with_entry_status, name='get_screener_with_entry_status'),
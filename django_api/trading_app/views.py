@@ -3,11 +3,14 @@
 from django.shortcuts import render, redirect
 from django.http import JsonResponse, HttpResponse, HttpResponseRedirect
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout
 from django.contrib.auth.models import User
-from django.db.models import Q, Avg, Sum
+from django.db.models import Q, Avg, Count, Sum
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.core.cache import cache
 from datetime import datetime, timedelta
 import json
 import requests
@@ -16,11 +19,17 @@ from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
-from .models import Instrument, TradeLog, RadarAlert, UserProfile, VirtualWallet, VirtualTrade, VirtualPosition
+from rest_framework.exceptions import ValidationError
+from .models import Instrument, TradeLog, RadarAlert, UserProfile, VirtualWallet, VirtualTrade, VirtualPosition, ScanRun
 from .serializers import (
     InstrumentSerializer, TradeLogSerializer, RadarAlertSerializer,
     VirtualWalletSerializer, VirtualTradeSerializer, VirtualPositionSerializer,
-    UserSerializer
+    UserSerializer, ScanRunSerializer
+)
+from .pagination import KeysetCursorPagination
+from .market_gateway import get_last_prices
+from .alert_cache import (
+    RESPONSE_CACHE_TIMEOUT, get_alert_version, screener_cache_key, screener_etag
 )
 import urllib.parse
 import os
@@ -29,44 +38,83 @@ import subprocess
 import time
 from django.conf import settings
 from decimal import Decimal
-from collections import defaultdict, Counter
 from django.db.models.functions import TruncDate
+from . import analytics, metrics
+
+# Seconds a cached trade journal result may serve edits to existing trades
+JOURNAL_CACHE_TIMEOUT = 60
+
+# updated_at is the writing transaction's start time (NOW()), so a row that
+# commits late can carry a time below a watermark already handed out. Delta
+# polls re-read this far behind updated_since; clients de-duplicate by id.
+UPDATED_SINCE_OVERLAP = timedelta(seconds=30)
 
 # Add this function after the existing imports and before the ViewSets
 
 def get_current_market_price(instrument_key):
     """Get current market price for an instrument"""
+    return get_current_market_prices([instrument_key]).get(instrument_key)
+
+def get_current_market_prices(instrument_keys):
+    """
+    Get current market prices for several instruments: from the market data
+    gateway's cache where fresh, otherwise with a single profile lookup and a
+    single Upstox LTP request. Returns {instrument_key: Decimal}.
+    """
+    instrument_keys = list(dict.fromkeys(instrument_keys))
+    if not instrument_keys:
+        return {}
+
+    # Prices the market data gateway has seen in the last minute need no API call
+    prices = get_last_prices(instrument_keys)
+    instrument_keys = [key for key in instrument_keys if key not in prices]
+    if not instrument_keys:
+        return prices
+
     try:
-        # Try to get price from Upstox API first
+        # Try to get prices from Upstox API first
         user_profile = UserProfile.objects.filter(
             upstox_access_token__isnull=False
         ).first()
-        
+
         if user_profile:
             headers = {
                 'Authorization': f'Bearer {user_profile.upstox_access_token}',
                 'Accept': 'application/json'
             }
-            
-            url = f'https://api.upstox.com/v2/market-quote/ltp?instrument_key={instrument_key}'
-            response = requests.get(url, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if 'data' in data and instrument_key in data['data']:
-                    return Decimal(str(data['data'][instrument_key]['last_price']))
-        
-        # Fallback to mock price for testing
-        numeric_part = sum(ord(c) for c in instrument_key) % 1000
-        base_price = 100 + (numeric_part % 1900)
-        import random
-        variation = random.uniform(-0.05, 0.05)
-        price = base_price * (1 + variation)
-        return Decimal(f'{price:.2f}')
-        
+
+            url = 'https://api.upstox.com/v2/market-quote/ltp'
+            with metrics.upstox_call('market_quote_ltp'):
+                response = requests.get(
+                    url, headers=headers, params={'instrument_key': ','.join(instrument_keys)}, timeout=10
+                )
+
+            if response.status_code != 200:
+                metrics.UPSTOX_ERRORS.labels(endpoint='market_quote_ltp').inc()
+            else:
+                data = response.json().get('data') or {}
+                for quote in data.values():
+                    key = quote.get('instrument_token')
+                    if key in instrument_keys and quote.get('last_price') is not None:
+                        prices[key] = Decimal(str(quote['last_price']))
+                # Older responses are keyed by the requested instrument_key
+                for key in instrument_keys:
+                    if key not in prices and key in data:
+                        prices[key] = Decimal(str(data[key]['last_price']))
     except Exception as e:
-        print(f"Error fetching price for {instrument_key}: {str(e)}")
-        return None
+        print(f"Error fetching prices for {len(instrument_keys)} instruments: {str(e)}")
+        return prices
+
+    # Fallback to mock price for testing
+    import random
+    for instrument_key in instrument_keys:
+        if instrument_key not in prices:
+            numeric_part = sum(ord(c) for c in instrument_key) % 1000
+            base_price = 100 + (numeric_part % 1900)
+            variation = random.uniform(-0.05, 0.05)
+            price = base_price * (1 + variation)
+            prices[instrument_key] = Decimal(f'{price:.2f}')
+    return prices
 
 # --- ViewSets ---
 
@@ -78,18 +126,61 @@ class TradeLogViewSet(viewsets.ModelViewSet):
     queryset = TradeLog.objects.all()
     serializer_class = TradeLogSerializer
 
-class RadarAlertViewSet(viewsets.ModelViewSet):
-    queryset = RadarAlert.objects.all()
-    serializer_class = RadarAlertSerializer
-    
+class RadarAlertListMixin:
+    """
+    Shared filtering, pagination and projection for the radar alert list endpoints.
+
+    Query params:
+        status: ACTIVE (default), EXPIRED or ALL
+        category: SCREENING, ENTRY or ALL (default)
+        strategy, alert_type: exact-match filters
+        fields: comma-separated fields to serialize; unrequested JSON columns are not loaded
+        cursor, page_size: keyset pagination on (timestamp, id), newest first
+        updated_since: ISO datetime; return alerts changed after it, oldest change first.
+            Alerts changed up to UPDATED_SINCE_OVERLAP before it are sent again, so
+            clients must de-duplicate by id
+    """
+    pagination_class = KeysetCursorPagination
+
+    # Columns needed to paginate and to add tradingsymbol/category/remaining_minutes
+    required_fields = ('id', 'timestamp', 'updated_at', 'instrument_key', 'source_strategy', 'status', 'expires_at')
+
+    def get_updated_since(self):
+        value = self.request.query_params.get('updated_since')
+        if not value:
+            return None
+        updated_since = parse_datetime(value)
+        if updated_since is None:
+            raise ValidationError({'updated_since': 'Expected an ISO 8601 datetime.'})
+        if timezone.is_naive(updated_since):
+            updated_since = timezone.make_aware(updated_since)
+        return updated_since
+
+    def get_requested_fields(self):
+        value = self.request.query_params.get('fields')
+        if not value:
+            return None
+        fields = [f.strip() for f in value.split(',') if f.strip()]
+        unknown = set(fields) - set(RadarAlertSerializer().fields)
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}"})
+        return fields
+
+    def get_keyset_ordering(self):
+        # Delta polls walk changes oldest first so the last row is the next watermark
+        if self.get_updated_since():
+            return 'updated_at', False
+        return 'timestamp', True
+
     def get_queryset(self):
-        # Get status filter from query params
-        status = self.request.query_params.get('status', 'ACTIVE')
+        updated_since = self.get_updated_since()
+        # Delta polls must see alerts that expired, so status defaults to ALL there
+        status = self.request.query_params.get('status', 'ALL' if updated_since else 'ACTIVE')
         alert_category = self.request.query_params.get('category', 'ALL')  # SCREENING, ENTRY, ALL
-        
+
         # Base queryset
         queryset = RadarAlert.objects.all()
-        
+
         # Filter by alert category
         if alert_category == 'SCREENING':
             # Screening alerts: Bullish_Scan, Daily_Confluence_Scan, Full_Scan
@@ -97,7 +188,7 @@ class RadarAlertViewSet(viewsets.ModelViewSet):
         elif alert_category == 'ENTRY':
             # Entry alerts: RealTime_ORB (time-sensitive)
             queryset = queryset.filter(source_strategy='RealTime_ORB')
-        
+
         # Filter by status
         if status == 'ACTIVE':
             queryset = queryset.filter(status='ACTIVE')
@@ -105,56 +196,75 @@ class RadarAlertViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(status='EXPIRED')
         elif status == 'ALL':
             pass  # Show all alerts
-        
+
         # Filter by strategy if specified
         strategy = self.request.query_params.get('strategy')
         if strategy:
             queryset = queryset.filter(source_strategy=strategy)
-        
+
         # Filter by alert type if specified
         alert_type = self.request.query_params.get('alert_type')
         if alert_type:
             queryset = queryset.filter(alert_type=alert_type)
-        
-        return queryset.order_by('-timestamp')
-    
+
+        if updated_since:
+            queryset = queryset.filter(updated_at__gt=updated_since - UPDATED_SINCE_OVERLAP)
+
+        fields = self.get_requested_fields()
+        if fields:
+            queryset = queryset.only(*set(fields) | set(self.required_fields))
+
+        return queryset.order_by('-timestamp', '-id')
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request.method == 'GET':
+            fields = self.get_requested_fields()
+            if fields:
+                kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
     def list(self, request, *args, **kwargs):
-        response = super().list(request, *args, **kwargs)
-        alerts_data = response.data.get('results', [])
-        if not alerts_data: 
-            return response
-            
-        # Get instrument symbols
-        instrument_keys = {a['instrument_key'] for a in alerts_data}
-        instruments = Instrument.objects.filter(instrument_key__in=instrument_keys).values('instrument_key', 'tradingsymbol')
-        symbol_map = {i['instrument_key']: i['tradingsymbol'] for i in instruments}
-        
-        for alert in alerts_data:
-            alert['tradingsymbol'] = symbol_map.get(alert['instrument_key'], '')
-            
-            # Determine alert category
-            if alert.get('source_strategy') == 'RealTime_ORB':
-                alert['category'] = 'ENTRY'
-                alert['is_time_sensitive'] = True
-            else:
-                alert['category'] = 'SCREENING'
-                alert['is_time_sensitive'] = False
-            
-            # Add remaining time for time-sensitive alerts only
-            if alert.get('is_time_sensitive') and alert.get('status') == 'ACTIVE' and alert.get('expires_at'):
-                now = timezone.now()
-                expires_at = timezone.datetime.fromisoformat(alert['expires_at'].replace('Z', '+00:00'))
-                if now < expires_at:
-                    delta = expires_at - now
-                    alert['remaining_minutes'] = int(delta.total_seconds() / 60)
-                else:
-                    alert['remaining_minutes'] = 0
-            else:
-                alert['remaining_minutes'] = None
-        
-        response.data['results'] = alerts_data
+        alerts = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        alerts_data = self.get_serializer(alerts, many=True).data
+        add_alert_display_fields(alerts, alerts_data)
+        response = self.get_paginated_response(alerts_data)
+
+        updated_since = self.get_updated_since()
+        if updated_since:
+            # Pass this back as updated_since on the next poll, once `next` is exhausted
+            response.data['next_updated_since'] = max(alerts[-1].updated_at, updated_since) if alerts else updated_since
         return response
 
+
+def add_alert_display_fields(alerts, alerts_data):
+    """Add tradingsymbol, category and remaining time to serialized alerts."""
+    instrument_keys = {alert.instrument_key for alert in alerts}
+    instruments = Instrument.objects.filter(instrument_key__in=instrument_keys).values('instrument_key', 'tradingsymbol')
+    symbol_map = {i['instrument_key']: i['tradingsymbol'] for i in instruments}
+
+    now = timezone.now()
+    for alert, data in zip(alerts, alerts_data):
+        data['tradingsymbol'] = symbol_map.get(alert.instrument_key, '')
+
+        # Determine alert category
+        is_time_sensitive = alert.source_strategy == 'RealTime_ORB'
+        data['category'] = 'ENTRY' if is_time_sensitive else 'SCREENING'
+        data['is_time_sensitive'] = is_time_sensitive
+
+        # Add remaining time for time-sensitive alerts only
+        if is_time_sensitive and alert.status == 'ACTIVE' and alert.expires_at:
+            if now < alert.expires_at:
+                data['remaining_minutes'] = int((alert.expires_at - now).total_seconds() / 60)
+            else:
+                data['remaining_minutes'] = 0
+        else:
+            data['remaining_minutes'] = None
+
+
+class RadarAlertViewSet(RadarAlertListMixin, viewsets.ModelViewSet):
+    queryset = RadarAlert.objects.all()
+    serializer_class = RadarAlertSerializer
+
 class VirtualWalletViewSet(viewsets.ModelViewSet):
     queryset = VirtualWallet.objects.all()
     serializer_class = VirtualWalletSerializer
@@ -301,69 +411,9 @@ def upstox_callback(request):
 
 # --- Legacy Views (for backward compatibility) ---
 
-class RadarAlertListView(generics.ListAPIView):
+class RadarAlertListView(RadarAlertListMixin, generics.ListAPIView):
     serializer_class = RadarAlertSerializer
 
-    def get_queryset(self):
-        # Get status filter from query params
-        status = self.request.query_params.get('status', 'ACTIVE')
-        alert_category = self.request.query_params.get('category', 'ALL')
-        
-        # Base queryset
-        queryset = RadarAlert.objects.all()
-        
-        # Filter by alert category
-        if alert_category == 'SCREENING':
-            queryset = queryset.filter(source_strategy__in=['Bullish_Scan', 'Daily_Confluence_Scan', 'Full_Scan'])
-        elif alert_category == 'ENTRY':
-            queryset = queryset.filter(source_strategy='RealTime_ORB')
-        
-        # Filter by status
-        if status == 'ACTIVE':
-            queryset = queryset.filter(status='ACTIVE')
-        elif status == 'EXPIRED':
-            queryset = queryset.filter(status='EXPIRED')
-        elif status == 'ALL':
-            pass
-        
-        return queryset.order_by('-timestamp')
-
-    def get(self, request, *args, **kwargs):
-        response = super().get(request, *args, **kwargs)
-        alerts_data = response.data.get('results', [])
-        if not alerts_data: 
-            return response
-            
-        instrument_keys = {a['instrument_key'] for a in alerts_data}
-        instruments = Instrument.objects.filter(instrument_key__in=instrument_keys).values('instrument_key', 'tradingsymbol')
-        symbol_map = {i['instrument_key']: i['tradingsymbol'] for i in instruments}
-        
-        for alert in alerts_data:
-            alert['tradingsymbol'] = symbol_map.get(alert['instrument_key'], '')
-            
-            # Determine alert category
-            if alert.get('source_strategy') == 'RealTime_ORB':
-                alert['category'] = 'ENTRY'
-                alert['is_time_sensitive'] = True
-            else:
-                alert['category'] = 'SCREENING'
-                alert['is_time_sensitive'] = False
-            
-            # Add remaining time for time-sensitive alerts only
-            if alert.get('is_time_sensitive') and alert.get('status') == 'ACTIVE' and alert.get('expires_at'):
-                now = timezone.now()
-                expires_at = timezone.datetime.fromisoformat(alert['expires_at'].replace('Z', '+00:00'))
-                if now < expires_at:
-                    delta = expires_at - now
-                    alert['remaining_minutes'] = int(delta.total_seconds() / 60)
-                else:
-                    alert['remaining_minutes'] = 0
-            else:
-                alert['remaining_minutes'] = None
-        
-        response.data['results'] = alerts_data
-        return response
-
 class TradeLogListCreateView(generics.ListCreateAPIView):
     queryset = TradeLog.objects.all()
     serializer_class = TradeLogSerializer
@@ -419,36 +469,23 @@ def trigger_scan(request):
                 'error': 'Invalid scan_type. Use: comprehensive, screening, or intraday'
             }, status=400)
         
-        # Run the actual scans
+        # Run the actual scans, each recorded as a ScanRun
         scan_results = []
         stocks_scanned = 0
+        stage_seconds = dict.fromkeys(ScanRun.STAGES, 0.0)
         
         for scan_command in scan_commands:
             try:
-                # Run the scanner using the production system
-                if scan_command == 'screening':
-                    # Run premarket scanner
-                    result = run_premarket_scanner()
-                    scan_results.append({
-                        'type': 'screening',
-                        'success': result['success'],
-                        'alerts_found': result.get('alerts_found', 0),
-                        'stocks_scanned': result.get('stocks_scanned', 0),
-                        'message': result.get('message', '')
-                    })
-                    stocks_scanned += result.get('stocks_scanned', 0)
-                    
-                elif scan_command == 'intraday':
-                    # Run intraday scanner
-                    result = run_intraday_scanner()
-                    scan_results.append({
-                        'type': 'intraday',
-                        'success': result['success'],
-                        'alerts_found': result.get('alerts_found', 0),
-                        'stocks_scanned': result.get('stocks_scanned', 0),
-                        'message': result.get('message', '')
-                    })
-                    stocks_scanned += result.get('stocks_scanned', 0)
+                scan_run = ScanRun.objects.create(scan_type=scan_command.upper())
+                result = run_scanner(scan_run)
+                scan_results.append({
+                    'type': scan_command,
+                    **result,
+                    'scan_run': ScanRunSerializer(scan_run).data,
+                })
+                stocks_scanned += scan_run.instruments_total
+                for stage, seconds in scan_run.stage_seconds.items():
+                    stage_seconds[stage] += seconds
                     
             except Exception as e:
                 scan_results.append({
@@ -473,6 +510,7 @@ def trigger_scan(request):
             'scan_type': scan_type,
             'market_hours': market_hours,
             'scan_duration': scan_duration,
+            'stage_seconds': {stage: round(seconds, 3) for stage, seconds in stage_seconds.items()},
             'stocks_scanned': stocks_scanned,
             'new_alerts': max(0, new_alerts),  # Ensure non-negative
             'total_alerts': new_alerts_count,
@@ -486,107 +524,106 @@ def trigger_scan(request):
             'error': str(e)
         }, status=500)
 
-def run_premarket_scanner():
+# Scanner script per ScanRun.scan_type
+SCANNER_SCRIPTS = {
+    'SCREENING': 'premarket_scanner.py',
+    'INTRADAY': 'intraday_scanner.py',
+}
+
+def run_scanner(scan_run):
     """
-    Run the premarket scanner and return results
+    Run the radar engine scanner for ``scan_run`` in a subprocess. The scanner
+    records its timings and counts on the ScanRun; ``scan_run`` is refreshed
+    from it, and marked FAILED if the scanner exited without recording.
     """
-    try:
-        # Path to the production system script
-        script_path = os.path.join(settings.BASE_DIR, '..', 'radar_engine_cloud_function', 'production_system.py')
-        
-        # Run the premarket scanner
-        result = subprocess.run([
-            sys.executable, script_path, '--premarket-scan'
-        ], capture_output=True, text=True, cwd=os.path.dirname(script_path))
-        
-        if result.returncode == 0:
-            # Parse the output to get results
-            output_lines = result.stdout.strip().split('\n')
-            alerts_found = 0
-            stocks_scanned = 0
-            
-            for line in output_lines:
-                if 'alerts found' in line.lower():
-                    try:
-                        alerts_found = int(line.split()[0])
-                    except:
-                        pass
-                elif 'stocks scanned' in line.lower():
-                    try:
-                        stocks_scanned = int(line.split()[0])
-                    except:
-                        pass
-            
-            return {
-                'success': True,
-                'alerts_found': alerts_found,
-                'stocks_scanned': stocks_scanned,
-                'message': 'Premarket scan completed successfully'
-            }
-        else:
-            return {
-                'success': False,
-                'error': result.stderr,
-                'message': 'Premarket scan failed'
-            }
-            
-    except Exception as e:
+    label = scan_run.get_scan_type_display()
+    script_path = os.path.join(
+        settings.BASE_DIR, '..', 'radar_engine_cloud_function', SCANNER_SCRIPTS[scan_run.scan_type]
+    )
+    result = subprocess.run([
+        sys.executable, script_path, '--scan-run-id', str(scan_run.pk)
+    ], capture_output=True, text=True, cwd=os.path.dirname(script_path))
+
+    scan_run.refresh_from_db()
+    if scan_run.status == 'RUNNING':
+        scan_run.status = 'FAILED'
+        scan_run.finished_at = timezone.now()
+        scan_run.error = result.stderr[-2000:] or f'Scanner exited with code {result.returncode}'
+        scan_run.save(update_fields=['status', 'finished_at', 'error'])
+
+    if scan_run.status == 'FAILED':
         return {
             'success': False,
-            'error': str(e),
-            'message': 'Error running premarket scanner'
+            'error': scan_run.error,
+            'message': f'{label} scan failed'
         }
+    return {
+        'success': True,
+        'alerts_found': scan_run.alerts_saved,
+        'stocks_scanned': scan_run.instruments_total,
+        'message': scan_run.error if scan_run.status == 'SKIPPED' else f'{label} scan completed successfully'
+    }
 
-def run_intraday_scanner():
+class ScanRunViewSet(viewsets.ReadOnlyModelViewSet):
     """
-    Run the intraday scanner and return results
+    Recorded scan runs, newest first, for tracking scan performance over time.
+
+    Query params:
+        scan_type: SCREENING or INTRADAY
+        status: RUNNING, SUCCESS, FAILED or SKIPPED
+        days: only runs started in the last N days
+        cursor, page_size: keyset pagination on (started_at, id)
     """
-    try:
-        # Path to the production system script
-        script_path = os.path.join(settings.BASE_DIR, '..', 'radar_engine_cloud_function', 'production_system.py')
-        
-        # Run the intraday scanner
-        result = subprocess.run([
-            sys.executable, script_path, '--intraday-scan'
-        ], capture_output=True, text=True, cwd=os.path.dirname(script_path))
-        
-        if result.returncode == 0:
-            # Parse the output to get results
-            output_lines = result.stdout.strip().split('\n')
-            alerts_found = 0
-            stocks_scanned = 0
-            
-            for line in output_lines:
-                if 'alerts found' in line.lower():
-                    try:
-                        alerts_found = int(line.split()[0])
-                    except:
-                        pass
-                elif 'stocks scanned' in line.lower():
-                    try:
-                        stocks_scanned = int(line.split()[0])
-                    except:
-                        pass
-            
-            return {
-                'success': True,
-                'alerts_found': alerts_found,
-                'stocks_scanned': stocks_scanned,
-                'message': 'Intraday scan completed successfully'
-            }
-        else:
-            return {
-                'success': False,
-                'error': result.stderr,
-                'message': 'Intraday scan failed'
-            }
-            
-    except Exception as e:
-        return {
-            'success': False,
-            'error': str(e),
-            'message': 'Error running intraday scanner'
-        }
+    queryset = ScanRun.objects.all()
+    serializer_class = ScanRunSerializer
+    pagination_class = KeysetCursorPagination
+
+    def get_keyset_ordering(self):
+        return 'started_at', True
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        for field in ('scan_type', 'status'):
+            if params.get(field):
+                queryset = queryset.filter(**{field: params[field].upper()})
+        if params.get('days'):
+            queryset = queryset.filter(started_at__gte=timezone.now() - timedelta(days=self._int_param('days')))
+        return queryset
+
+    def _int_param(self, name, default=None):
+        try:
+            return int(self.request.query_params.get(name, default))
+        except (TypeError, ValueError):
+            raise ValidationError({name: 'Must be an integer.'})
+
+    @action(detail=False)
+    def trends(self, request):
+        """
+        Per-day averages of successful runs over the last ``days`` (default 56):
+        duration, each stage, instruments and API calls.
+        """
+        since = timezone.now() - timedelta(days=self._int_param('days', 56))
+        queryset = ScanRun.objects.filter(status='SUCCESS', started_at__gte=since)
+        if request.query_params.get('scan_type'):
+            queryset = queryset.filter(scan_type=request.query_params['scan_type'].upper())
+
+        averaged = ['duration_seconds', *(f'{stage}_seconds' for stage in ScanRun.STAGES),
+                    'instruments_total', 'api_calls']
+        rows = (
+            queryset.annotate(date=TruncDate('started_at'))
+            .values('date', 'scan_type')
+            .annotate(
+                runs=Count('id'),
+                **{f'avg_{field}': Avg(field) for field in averaged},
+            )
+            .order_by('date', 'scan_type')
+        )
+        days = [
+            {key: round(value, 3) if isinstance(value, float) else value for key, value in row.items()}
+            for row in rows
+        ]
+        return Response({'days': days})
 
 @api_view(['GET'])
 def virtual_trading_dashboard(request):
@@ -603,11 +640,12 @@ def virtual_trading_dashboard(request):
         # Get recent trades
         recent_trades = VirtualTrade.objects.filter(wallet=wallet).order_by('-entry_time')[:10]
         # Get open trades with real-time P&L calculations
-        open_trades = VirtualTrade.objects.filter(wallet=wallet, status='EXECUTED')
+        open_trades = list(VirtualTrade.objects.filter(wallet=wallet, status='EXECUTED'))
+        current_prices = get_current_market_prices([trade.instrument_key for trade in open_trades])
         open_trades_data = []
         total_unrealized_pnl = Decimal('0.00')
         for trade in open_trades:
-            current_price = get_current_market_price(trade.instrument_key)
+            current_price = current_prices.get(trade.instrument_key)
             trade_data = VirtualTradeSerializer(trade).data
             if current_price:
                 if trade.trade_type == 'BUY':
@@ -632,89 +670,52 @@ def virtual_trading_dashboard(request):
             open_trades_data.append(trade_data)
         # Get open positions (legacy)
         open_positions = VirtualPosition.objects.filter(wallet=wallet)
-        # Get trade statistics
-        closed_trades = VirtualTrade.objects.filter(wallet=wallet, status='CLOSED')
-        profitable_trades = closed_trades.filter(pnl__gt=0).count()
-        total_closed_trades = closed_trades.count()
-        avg_profit = closed_trades.filter(pnl__gt=0).aggregate(avg=Avg('pnl'))['avg'] or 0
-        avg_loss = closed_trades.filter(pnl__lt=0).aggregate(avg=Avg('pnl'))['avg'] or 0
+        # Get trade statistics from the per-wallet snapshot maintained on trade close
+        stats = analytics.get_wallet_stats(wallet)
+        profitable_trades = stats.winning_trades
+        total_closed_trades = stats.closed_trades
+        avg_profit = stats.avg_profit
+        avg_loss = stats.avg_loss
         # Calculate total portfolio value (balance + unrealized P&L)
         total_portfolio_value = wallet.balance + total_unrealized_pnl
         # --- Advanced Insights ---
-        # Best/Worst Trade
-        best_trade = closed_trades.order_by('-pnl').first()
-        worst_trade = closed_trades.order_by('pnl').first()
+        # Best/Worst and Fastest/Slowest trades in one lookup
+        record_trades = VirtualTrade.objects.in_bulk([
+            pk for pk in (stats.best_trade_id, stats.worst_trade_id, stats.fastest_trade_id, stats.slowest_trade_id)
+            if pk
+        ])
+        best_trade = record_trades.get(stats.best_trade_id)
+        worst_trade = record_trades.get(stats.worst_trade_id)
+        fastest_trade = record_trades.get(stats.fastest_trade_id)
+        slowest_trade = record_trades.get(stats.slowest_trade_id)
         # Per-strategy stats
-        strategy_stats = defaultdict(lambda: {'count': 0, 'win': 0, 'loss': 0, 'total_pnl': 0})
-        for trade in closed_trades:
-            strategy = trade.alert.source_strategy if trade.alert else 'Unknown'
-            strategy_stats[strategy]['count'] += 1
-            if trade.pnl and trade.pnl > 0:
-                strategy_stats[strategy]['win'] += 1
-            elif trade.pnl and trade.pnl < 0:
-                strategy_stats[strategy]['loss'] += 1
-            strategy_stats[strategy]['total_pnl'] += float(trade.pnl or 0)
-        strategy_insights = []
-        for strat, stats in strategy_stats.items():
-            win_rate = (stats['win'] / stats['count']) * 100 if stats['count'] else 0
-            avg_pnl = stats['total_pnl'] / stats['count'] if stats['count'] else 0
-            strategy_insights.append({
-                'strategy': strat,
-                'count': stats['count'],
-                'win_rate': win_rate,
-                'avg_pnl': avg_pnl
-            })
-        # Equity curve (daily balance)
-        equity_curve = []
-        daily = closed_trades.annotate(day=TruncDate('exit_time')).values('day').annotate(
-            daily_pnl=Sum('pnl')
-        ).order_by('day')
-        balance = float(wallet.balance)
-        for d in daily:
-            balance += float(d['daily_pnl'] or 0)
-            equity_curve.append({'date': d['day'], 'balance': balance})
+        strategy_insights = [
+            {
+                'strategy': row.key,
+                'count': row.count,
+                'win_rate': (row.wins / row.count) * 100 if row.count else 0,
+                'avg_pnl': float(row.total_pnl) / row.count if row.count else 0,
+            }
+            for row in wallet.breakdowns.filter(kind='STRATEGY').order_by('key')
+        ]
+        # Equity curve (daily balance), bounded to the most recent days
+        daily = wallet.daily_pnl.order_by('-date')[:analytics.EQUITY_CURVE_DAYS]
+        equity_curve = [
+            {'date': d.date, 'balance': float(wallet.balance + d.cumulative_pnl)}
+            for d in reversed(list(daily))
+        ]
         # Win/loss streaks
-        streaks = {'current_win': 0, 'current_loss': 0, 'longest_win': 0, 'longest_loss': 0}
-        last_result = None
-        current_win = current_loss = longest_win = longest_loss = 0
-        for trade in closed_trades.order_by('exit_time'):
-            if trade.pnl is not None:
-                if trade.pnl > 0:
-                    if last_result == 'win':
-                        current_win += 1
-                    else:
-                        current_win = 1
-                    longest_win = max(longest_win, current_win)
-                    current_loss = 0
-                    last_result = 'win'
-                elif trade.pnl < 0:
-                    if last_result == 'loss':
-                        current_loss += 1
-                    else:
-                        current_loss = 1
-                    longest_loss = max(longest_loss, current_loss)
-                    current_win = 0
-                    last_result = 'loss'
-        streaks['current_win'] = current_win
-        streaks['current_loss'] = current_loss
-        streaks['longest_win'] = longest_win
-        streaks['longest_loss'] = longest_loss
+        streaks = {
+            'current_win': stats.current_win_streak,
+            'current_loss': stats.current_loss_streak,
+            'longest_win': stats.longest_win_streak,
+            'longest_loss': stats.longest_loss_streak,
+        }
         # Most traded stocks
-        symbol_counts = Counter([t.tradingsymbol for t in closed_trades])
-        most_traded = symbol_counts.most_common(5)
-        # Fastest/slowest trade
-        fastest_trade = slowest_trade = None
-        min_duration = None
-        max_duration = None
-        for trade in closed_trades:
-            if trade.entry_time and trade.exit_time:
-                duration = (trade.exit_time - trade.entry_time).total_seconds()
-                if min_duration is None or duration < min_duration:
-                    min_duration = duration
-                    fastest_trade = trade
-                if max_duration is None or duration > max_duration:
-                    max_duration = duration
-                    slowest_trade = trade
+        most_traded = [
+            {'symbol': row.key, 'count': row.count}
+            for row in wallet.breakdowns.filter(kind='SYMBOL').order_by('-count', 'key')[:5]
+        ]
         dashboard_data = {
             'wallet': VirtualWalletSerializer(wallet).data,
             'recent_trades': VirtualTradeSerializer(recent_trades, many=True).data,
@@ -727,8 +728,8 @@ def virtual_trading_dashboard(request):
                 'total_closed_trades': total_closed_trades,
                 'avg_profit': avg_profit,
                 'avg_loss': avg_loss,
-                'profit_factor': abs(avg_profit / avg_loss) if avg_loss != 0 else 0,
-                'open_positions_count': open_trades.count()
+                'profit_factor': stats.profit_factor,
+                'open_positions_count': len(open_trades)
             },
             'insights': {
                 'best_trade': VirtualTradeSerializer(best_trade).data if best_trade else None,
@@ -736,7 +737,7 @@ def virtual_trading_dashboard(request):
                 'strategy_stats': strategy_insights,
                 'equity_curve': equity_curve,
                 'streaks': streaks,
-                'most_traded': [{'symbol': s, 'count': c} for s, c in most_traded],
+                'most_traded': most_traded,
                 'fastest_trade': VirtualTradeSerializer(fastest_trade).data if fastest_trade else None,
                 'slowest_trade': VirtualTradeSerializer(slowest_trade).data if slowest_trade else None
             }
@@ -754,11 +755,29 @@ def virtual_trading_dashboard(request):
         )
 
 @api_view(['GET'])
+@condition(etag_func=screener_etag)
 def get_screener_with_entry_status(request):
     """
     Return the full premarket screener list for today, and for each screener stock, include a field indicating if an entry alert exists (and its ID/status if so).
+
+    The response carries an ETag derived from the alert version, so a poll
+    with a matching If-None-Match gets a 304 without touching the database.
+    The result list itself is cached per version.
     """
     today = timezone.now().date()
+    cache_key = screener_cache_key(today, get_alert_version())
+    results = cache.get(cache_key)
+    if results is None:
+        results = build_screener_results(today)
+        cache.set(cache_key, results, RESPONSE_CACHE_TIMEOUT)
+    response = Response({'results': results})
+    # Let browsers store the response but revalidate it on every poll
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def build_screener_results(today):
+    """Today's screening alerts, each annotated with its entry alert if one exists."""
     # Get all screening alerts for today (all strategies)
     screening_alerts = RadarAlert.objects.filter(
         source_strategy__in=['Bullish_Scan', 'Daily_Confluence_Scan', 'Full_Scan'],
@@ -807,116 +826,114 @@ def get_screener_with_entry_status(request):
             'entry_status': entry_status,
             'entry_alert': entry_alert_info
         })
-    return Response({'results': results})
+    return results
 
 @api_view(['GET'])
 def trade_journal_dashboard(request):
     """
-    Get trade journal analytics/insights for real trades (TradeLog) for the current user.
+    Get trade journal analytics/insights for real trades (TradeLog).
+
+    Optional query params:
+        start_date, end_date: YYYY-MM-DD bounds on trade_date
+        cursor: only include trades with id <= cursor, pinning the result to a
+            snapshot of the journal; the response returns the cursor it used
+
+    Every figure is computed with aggregate queries (the streak calculation
+    streams P&L values only), and results are cached per cursor and date range.
     """
     # Removed authentication check for public access
+    start_date = end_date = None
+    try:
+        if request.GET.get('start_date'):
+            start_date = parse_date(request.GET['start_date'])
+        if request.GET.get('end_date'):
+            end_date = parse_date(request.GET['end_date'])
+        cursor = int(request.GET['cursor']) if request.GET.get('cursor') else None
+    except ValueError:
+        return Response({'error': 'Invalid start_date, end_date or cursor'}, status=400)
+    if (request.GET.get('start_date') and start_date is None) or (request.GET.get('end_date') and end_date is None):
+        return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=400)
+
     try:
         trades = TradeLog.objects.filter(instrument__isnull=False)
-        closed_trades = trades.filter(exit_price__isnull=False)
-        total_trades = trades.count()
-        win_trades = closed_trades.filter(pnl__gt=0).count()
-        loss_trades = closed_trades.filter(pnl__lt=0).count()
-        win_rate = (win_trades / closed_trades.count()) * 100 if closed_trades.count() else 0
-        avg_profit = closed_trades.filter(pnl__gt=0).aggregate(avg=Avg('pnl'))['avg'] or 0
-        avg_loss = closed_trades.filter(pnl__lt=0).aggregate(avg=Avg('pnl'))['avg'] or 0
-        best_trade = closed_trades.order_by('-pnl').first()
-        worst_trade = closed_trades.order_by('pnl').first()
-        # Per-strategy stats (if strategy field exists)
-        strategy_stats = defaultdict(lambda: {'count': 0, 'win': 0, 'loss': 0, 'total_pnl': 0})
-        for trade in closed_trades:
-            strategy = getattr(trade, 'strategy', 'Unknown')
-            strategy_stats[strategy]['count'] += 1
-            if trade.pnl and trade.pnl > 0:
-                strategy_stats[strategy]['win'] += 1
-            elif trade.pnl and trade.pnl < 0:
-                strategy_stats[strategy]['loss'] += 1
-            strategy_stats[strategy]['total_pnl'] += float(trade.pnl or 0)
-        strategy_insights = []
-        for strat, stats in strategy_stats.items():
-            win_rate_s = (stats['win'] / stats['count']) * 100 if stats['count'] else 0
-            avg_pnl = stats['total_pnl'] / stats['count'] if stats['count'] else 0
-            strategy_insights.append({
-                'strategy': strat,
-                'count': stats['count'],
-                'win_rate': win_rate_s,
-                'avg_pnl': avg_pnl
-            })
-        # Equity curve (daily balance)
-        equity_curve = []
-        daily = closed_trades.annotate(day=TruncDate('trade_date')).values('day').annotate(
-            daily_pnl=Sum('pnl')
-        ).order_by('day')
-        balance = 0
-        for d in daily:
-            balance += float(d['daily_pnl'] or 0)
-            equity_curve.append({'date': d['day'], 'balance': balance})
-        # Win/loss streaks
-        streaks = {'current_win': 0, 'current_loss': 0, 'longest_win': 0, 'longest_loss': 0}
-        last_result = None
-        current_win = current_loss = longest_win = longest_loss = 0
-        for trade in closed_trades.order_by('trade_date'):
-            if trade.pnl is not None:
-                if trade.pnl > 0:
-                    if last_result == 'win':
-                        current_win += 1
-                    else:
-                        current_win = 1
-                    longest_win = max(longest_win, current_win)
-                    current_loss = 0
-                    last_result = 'win'
-                elif trade.pnl < 0:
-                    if last_result == 'loss':
-                        current_loss += 1
-                    else:
-                        current_loss = 1
-                    longest_loss = max(longest_loss, current_loss)
-                    current_win = 0
-                    last_result = 'loss'
-        streaks['current_win'] = current_win
-        streaks['current_loss'] = current_loss
-        streaks['longest_win'] = longest_win
-        streaks['longest_loss'] = longest_loss
-        # Most traded stocks
-        symbol_counts = Counter([t.instrument.tradingsymbol for t in closed_trades if t.instrument])
-        most_traded = symbol_counts.most_common(5)
-        # Fastest/slowest trade
-        fastest_trade = slowest_trade = None
-        min_duration = None
-        max_duration = None
-        for trade in closed_trades:
-            if hasattr(trade, 'entry_time') and hasattr(trade, 'exit_time') and trade.entry_time and trade.exit_time:
-                duration = (trade.exit_time - trade.entry_time).total_seconds()
-                if min_duration is None or duration < min_duration:
-                    min_duration = duration
-                    fastest_trade = trade
-                if max_duration is None or duration > max_duration:
-                    max_duration = duration
-                    slowest_trade = trade
-        from .serializers import TradeLogSerializer
-        return Response({
-            'statistics': {
-                'total_trades': total_trades,
-                'win_trades': win_trades,
-                'loss_trades': loss_trades,
-                'win_rate': win_rate,
-                'avg_profit': avg_profit,
-                'avg_loss': avg_loss,
-            },
-            'insights': {
-                'best_trade': TradeLogSerializer(best_trade).data if best_trade else None,
-                'worst_trade': TradeLogSerializer(worst_trade).data if worst_trade else None,
-                'strategy_stats': strategy_insights,
-                'equity_curve': equity_curve,
-                'streaks': streaks,
-                'most_traded': [{'symbol': s, 'count': c} for s, c in most_traded],
-                'fastest_trade': TradeLogSerializer(fastest_trade).data if fastest_trade else None,
-                'slowest_trade': TradeLogSerializer(slowest_trade).data if slowest_trade else None
-            }
-        })
+        # A new trade gets a higher id, so the latest id keys the cache
+        latest_id = trades.order_by('-id').values_list('id', flat=True).first() or 0
+        cursor = latest_id if cursor is None else min(cursor, latest_id)
+
+        cache_key = f'trade_journal_dashboard:{cursor}:{start_date}:{end_date}'
+        data = cache.get(cache_key)
+        if data is None:
+            trades = trades.filter(id__lte=cursor)
+            if start_date:
+                trades = trades.filter(trade_date__gte=start_date)
+            if end_date:
+                trades = trades.filter(trade_date__lte=end_date)
+            data = build_trade_journal_analytics(trades)
+            data['cursor'] = cursor
+            cache.set(cache_key, data, JOURNAL_CACHE_TIMEOUT)
+        return Response(data)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
+
+
+def build_trade_journal_analytics(trades):
+    """Statistics and insights for a TradeLog queryset, using a fixed number of queries."""
+    closed_trades = trades.filter(exit_price__isnull=False)
+    total_trades = trades.count()
+    summary = analytics.summarize_pnl(closed_trades)
+    closed_count = summary['total']
+
+    best_trade = closed_trades.select_related('instrument').order_by('-pnl', 'id').first()
+    worst_trade = closed_trades.select_related('instrument').order_by('pnl', 'id').first()
+
+    # TradeLog has no strategy field, so every closed trade is reported as 'Unknown'
+    strategy_insights = []
+    if closed_count:
+        strategy_insights.append({
+            'strategy': 'Unknown',
+            'count': closed_count,
+            'win_rate': (summary['wins'] / closed_count) * 100,
+            'avg_pnl': float(summary['total_pnl'] or 0) / closed_count,
+        })
+
+    # Equity curve (daily balance)
+    equity_curve = []
+    daily = closed_trades.values('trade_date').annotate(daily_pnl=Sum('pnl')).order_by('trade_date')
+    balance = 0
+    for d in daily:
+        balance += float(d['daily_pnl'] or 0)
+        equity_curve.append({'date': d['trade_date'], 'balance': balance})
+
+    # Win/loss streaks, streaming only the P&L column
+    streaks = analytics.calculate_streaks(
+        closed_trades.order_by('trade_date', 'id').values_list('pnl', flat=True).iterator(chunk_size=2000)
+    )
+
+    # TradeLog records no entry/exit times, so there is no fastest/slowest trade
+    return {
+        'statistics': {
+            'total_trades': total_trades,
+            'win_trades': summary['wins'],
+            'loss_trades': summary['losses'],
+            'win_rate': (summary['wins'] / closed_count) * 100 if closed_count else 0,
+            'avg_profit': summary['avg_profit'] or 0,
+            'avg_loss': summary['avg_loss'] or 0,
+        },
+        'insights': {
+            'best_trade': TradeLogSerializer(best_trade).data if best_trade else None,
+            'worst_trade': TradeLogSerializer(worst_trade).data if worst_trade else None,
+            'strategy_stats': strategy_insights,
+            'equity_curve': equity_curve,
+            'streaks': streaks,
+            'most_traded': analytics.most_traded(closed_trades, 'instrument__tradingsymbol'),
+            'fastest_trade': None,
+            'slowest_trade': None,
+        }
+    }
+
+
+def metrics_endpoint(request):
+    """This process's metrics in the Prometheus text format, for local scrapers only."""
+    if request.META.get('REMOTE_ADDR') not in ('127.0.0.1', '::1'):
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
@@ -23,6 +23,7 @@ from trading_app.models import (
     VirtualWallet, VirtualTrade, VirtualPosition, 
     RadarAlert, Instrument
 )
+from trading_app.analytics import record_closed_trade
 from django.utils import timezone
 
 # Configure logging
@@ -354,6 +355,9 @@ class VirtualTradingEngine:
             
             self.wallet.save()
             
+            # Update the wallet's performance snapshot
+            record_closed_trade(trade)
+            
             # Delete position
             position.delete()
             
@@ -0,0 +1,344 @@
+# backtester.py
+"""
+Vectorized backtest of the screening strategies in strategies.STRATEGIES
+over daily candle history.
+
+Every indicator series is computed once per instrument (the same
+definitions indicator_calculator gets from pandas_ta, but over all bars
+instead of only the last one). Each rule is then evaluated as a boolean
+series over all bars; pattern rules use pattern_recognizer's masks. A
+strategy signals on a bar when the scores of its triggered rules add up
+to at least ``min_score``. Trades use the
+trade_analyzer.calculate_trade_levels levels: entry at the signal bar's
+close, stop and first target 1.5 ATR away. A trade exits at the first bar
+that touches either, or at the close after ``max_hold`` bars.
+Only one trade per instrument and strategy is open at a time.
+
+The contextual bonuses of trade_analyzer.analyze_setup (sector strength,
+market volatility) are not part of the backtest.
+
+Usage:
+    python backtester.py [--cache-dir historical_data_cache] [--strategies Bullish_Scan,Bearish_Scan]
+    python backtester.py --synthetic 200 --years 5
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import pattern_recognizer
+import strategies
+import synthetic_data
+
+# Bars held before a trade that hit neither level is closed
+DEFAULT_MAX_HOLD = 20
+
+# Stop and first target distance from entry, in ATRs (see calculate_trade_levels)
+ATR_MULTIPLE = 1.5
+
+# calculate_trade_levels needs this many bars of history
+MIN_HISTORY = 20
+
+
+# --- Indicator series ---
+
+def ema(series, length):
+    """pandas_ta-style EMA: seeded with the SMA of the first ``length`` valid values."""
+    valid = series.dropna()
+    out = pd.Series(np.nan, index=series.index)
+    if len(valid) < length:
+        return out
+    seeded = valid.copy()
+    seeded.iloc[:length - 1] = np.nan
+    seeded.iloc[length - 1] = valid.iloc[:length].mean()
+    out[valid.index] = seeded.ewm(span=length, adjust=False).mean()
+    return out
+
+
+def rsi(close, length=14):
+    change = close.diff()
+    gain = change.clip(lower=0).ewm(alpha=1 / length, min_periods=length, adjust=False).mean()
+    loss = (-change.clip(upper=0)).ewm(alpha=1 / length, min_periods=length, adjust=False).mean()
+    return 100 * gain / (gain + loss)
+
+
+def crossover_events(fast, slow, above, below):
+    """``above`` on bars where fast crosses over slow, ``below`` where it crosses under, else 'None'."""
+    diff = fast - slow
+    previous = diff.shift(1)
+    events = np.where((diff > 0) & (previous <= 0), above,
+                      np.where((diff < 0) & (previous >= 0), below, 'None'))
+    return pd.Series(events, index=fast.index)
+
+
+def average_true_range(df, length=14):
+    """
+    The ATR of calculate_trade_levels on every bar: the mean of the last
+    ``length`` true ranges, where the oldest one in the window is just
+    high - low (its previous close falls outside the window there).
+    """
+    high_low = df['high'] - df['low']
+    previous_close = df['close'].shift(1)
+    true_range = pd.concat(
+        [high_low, (df['high'] - previous_close).abs(), (df['low'] - previous_close).abs()], axis=1
+    ).max(axis=1)
+    return (true_range.rolling(length - 1).sum() + high_low.shift(length - 1)) / length
+
+
+def indicator_frame(df):
+    """
+    One column per indicators key used by the rules, one row per bar.
+    Crossover and MACD_Crossover are the cross events on that bar (the live
+    calculator does not emit them yet).
+    """
+    close = df['close']
+    ind = pd.DataFrame(index=df.index)
+    ind['RSI'] = rsi(close, 14)
+    ind['EMA20'] = ema(close, 20)
+    ind['EMA50'] = ema(close, 50)
+    ind['EMA200'] = ema(close, 200)
+    ind['MACD'] = ema(close, 12) - ema(close, 26)
+    ind['MACD_Signal'] = ema(ind['MACD'], 9)
+
+    middle = close.rolling(20).mean()
+    deviation = close.rolling(20).std(ddof=0)
+    ind['BB_Lower'] = middle - 2 * deviation
+    ind['BB_Upper'] = middle + 2 * deviation
+    ind['BB_Width'] = 100 * (ind['BB_Upper'] - ind['BB_Lower']) / middle
+
+    ind['Volume'] = df['volume']
+    ind['Close'] = close
+    ind['Low'] = df['low']
+    ind['Volume_EMA10'] = ema(df['volume'], 10)
+    ind['Volume_Spike'] = df['volume'] > ind['Volume_EMA10'] * 1.5
+    ind['Crossover'] = crossover_events(ind['EMA50'], ind['EMA200'], 'Golden', 'Death')
+    ind['MACD_Crossover'] = crossover_events(ind['MACD'], ind['MACD_Signal'], 'Bullish', 'Bearish')
+    ind['ATR'] = average_true_range(df)
+    return ind
+
+
+# --- Rule evaluation ---
+
+def rule_mask(rule, ind, df):
+    """Boolean array: the bars on which ``rule`` triggers."""
+    if rule['type'] == 'indicator':
+        values = ind[rule['indicator']]
+        if rule['condition'] == 'less_than':
+            return (values < rule['value']).to_numpy()
+        if rule['condition'] == 'greater_than':
+            return (values > rule['value']).to_numpy()
+        if rule['condition'] == 'equals':
+            return (values == rule['value']).to_numpy()
+    elif rule['type'] == 'pattern':
+        return pattern_recognizer.pattern_mask(rule['pattern'], df)
+    elif rule['type'] == 'custom' and 'vector_function' in rule:
+        return np.asarray(rule['vector_function'](ind), dtype=bool)
+    raise ValueError(f"Rule '{rule['name']}' has no vectorized form")
+
+
+def strategy_signals(rules, ind, df, min_score=1):
+    """
+    Per-bar signal direction for a strategy: +1 (BUY), -1 (SELL) or 0.
+    A bar signals when its triggered rule scores reach ``min_score``; the
+    direction follows the bullish vs bearish score (ties and neutral-only
+    bars count as bullish, like analyze_for_trade_setup's default).
+    """
+    score = np.zeros(len(df))
+    bias = np.zeros(len(df))
+    for rule in rules:
+        mask = rule_mask(rule, ind, df)
+        score += mask * rule.get('score', 1)
+        if rule['signal'] == 'bullish':
+            bias += mask * rule.get('score', 1)
+        elif rule['signal'] == 'bearish':
+            bias -= mask * rule.get('score', 1)
+    direction = np.where(bias < 0, -1, 1)
+    signals = np.where(score >= min_score, direction, 0)
+    signals[:MIN_HISTORY - 1] = 0
+    signals[np.isnan(ind['ATR'].to_numpy())] = 0
+    return signals
+
+
+# --- Trade simulation ---
+
+def resolve_exits(entries, direction, df, atr, max_hold=DEFAULT_MAX_HOLD):
+    """
+    Exit of a trade entered at the close of each bar in ``entries`` with
+    the given directions (+1/-1), found for all entries at once.
+    Returns (exit_bar, exit_reason, exit_price, stop, target) arrays; a
+    bar touching both levels counts as a stop.
+    """
+    high, low, close = df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy()
+    entry_price = close[entries]
+    distance = atr[entries] * ATR_MULTIPLE
+    stop = entry_price - direction * distance
+    target = entry_price + direction * distance
+
+    # Bars after each entry, padded past the end of the series
+    pad = np.full(max_hold, np.nan)
+    offsets = entries[:, None] + 1 + np.arange(max_hold)
+    highs = np.concatenate([high, pad])[offsets]
+    lows = np.concatenate([low, pad])[offsets]
+    is_long = (direction > 0)[:, None]
+    hit_target = np.where(is_long, highs >= target[:, None], lows <= target[:, None])
+    hit_stop = np.where(is_long, lows <= stop[:, None], highs >= stop[:, None])
+
+    last_bar = len(close) - 1
+    timeout = np.minimum(entries + max_hold, last_bar)
+    first_target = np.where(hit_target.any(axis=1), hit_target.argmax(axis=1) + entries + 1, np.iinfo(np.int64).max)
+    first_stop = np.where(hit_stop.any(axis=1), hit_stop.argmax(axis=1) + entries + 1, np.iinfo(np.int64).max)
+    exit_bar = np.minimum(np.minimum(first_target, first_stop), timeout)
+    reason = np.where(first_stop <= exit_bar, 'STOP', np.where(first_target <= exit_bar, 'TARGET', 'TIME'))
+    exit_price = np.where(reason == 'STOP', stop, np.where(reason == 'TARGET', target, close[exit_bar]))
+    return exit_bar, reason, exit_price, stop, target
+
+
+def simulate_trades(signals, df, atr, max_hold=DEFAULT_MAX_HOLD):
+    """
+    Trades for one instrument and strategy as a DataFrame with entry/exit
+    bar positions, direction, prices, exit reason and return (fraction).
+    """
+    entries = np.flatnonzero(signals[:-1])
+    if len(entries) == 0:
+        return pd.DataFrame()
+
+    direction = signals[entries]
+    entry_price = df['close'].to_numpy()[entries]
+    exit_bar, reason, exit_price, _, _ = resolve_exits(entries, direction, df, atr, max_hold)
+
+    # One open trade at a time: skip signals until the previous trade has exited
+    taken = np.zeros(len(entries), dtype=bool)
+    free_from = -1
+    for i, entry in enumerate(entries):
+        if entry > free_from:
+            taken[i] = True
+            free_from = exit_bar[i]
+
+    trades = pd.DataFrame({
+        'entry_bar': entries,
+        'exit_bar': exit_bar,
+        'direction': direction,
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'exit_reason': reason,
+    })[taken]
+    trades['return'] = trades['direction'] * (trades['exit_price'] - trades['entry_price']) / trades['entry_price']
+    return trades
+
+
+def backtest_instrument(df, strategy_names, min_score=1, max_hold=DEFAULT_MAX_HOLD):
+    """All strategies' trades for one instrument's candles, with a 'strategy' column."""
+    ind = indicator_frame(df)
+    atr = ind['ATR'].to_numpy()
+    results = []
+    for name in strategy_names:
+        rules = strategies.get_rules_for_strategy(name)
+        trades = simulate_trades(strategy_signals(rules, ind, df, min_score), df, atr, max_hold)
+        if not trades.empty:
+            trades['strategy'] = name
+            trades['entry_time'] = df.index[trades['entry_bar']]
+            results.append(trades)
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+
+def run_backtest(histories, strategy_names=None, min_score=1, max_hold=DEFAULT_MAX_HOLD):
+    """
+    Backtest ``histories`` (instrument_key -> daily OHLCV DataFrame).
+    Returns (trades, summary): every trade, and per-strategy totals.
+    """
+    strategy_names = strategy_names or list(strategies.STRATEGIES)
+    all_trades = []
+    for instrument_key, df in histories.items():
+        if len(df) < MIN_HISTORY + 1:
+            continue
+        trades = backtest_instrument(df, strategy_names, min_score, max_hold)
+        if not trades.empty:
+            trades['instrument_key'] = instrument_key
+            all_trades.append(trades)
+
+    if not all_trades:
+        return pd.DataFrame(), pd.DataFrame()
+    trades = pd.concat(all_trades, ignore_index=True)
+    summary = trades.groupby('strategy').agg(
+        trades=('return', 'size'),
+        win_rate=('return', lambda r: (r > 0).mean()),
+        target_rate=('exit_reason', lambda r: (r == 'TARGET').mean()),
+        avg_return_pct=('return', lambda r: r.mean() * 100),
+        total_return_pct=('return', lambda r: r.sum() * 100),
+    )
+    return trades, summary
+
+
+# --- Data ---
+
+def load_cached_histories(cache_dir='historical_data_cache'):
+    """
+    Candles keyed by instrument_key, from HistoricalDataManager's JSON cache
+    or a columnar cache (synthetic_data.write_columnar_cache).
+    """
+    if synthetic_data.is_columnar_cache(cache_dir):
+        return synthetic_data.load_columnar_cache(cache_dir)
+    histories = {}
+    for path in sorted(glob.glob(os.path.join(cache_dir, '*_historical.json'))):
+        with open(path) as f:
+            stored = json.load(f)
+        df = pd.DataFrame(stored['data'])
+        df['datetime'] = pd.to_datetime(df['datetime'])
+        histories[stored['symbol']] = df.set_index('datetime').astype(float)
+    return histories
+
+
+def synthetic_histories(count, years, seed=0):
+    """Random-walk daily candles, for timing the engine."""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end='2025-01-01', periods=years * 250, name='datetime')
+    histories = {}
+    for i in range(count):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, len(index))))
+        open_ = close * (1 + rng.normal(0, 0.005, len(index)))
+        spread = close * np.abs(rng.normal(0, 0.01, len(index)))
+        histories[f'NSE_EQ|SYN{i}'] = pd.DataFrame({
+            'open': open_,
+            'high': np.maximum(open_, close) + spread,
+            'low': np.minimum(open_, close) - spread,
+            'close': close,
+            'volume': rng.lognormal(13, 0.5, len(index)),
+        }, index=index)
+    return histories
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--cache-dir', default='historical_data_cache')
+    parser.add_argument('--synthetic', type=int, default=0, help='Use this many random-walk symbols instead')
+    parser.add_argument('--years', type=int, default=5, help='Years of synthetic history')
+    parser.add_argument('--strategies', help='Comma-separated strategy names (default: all)')
+    parser.add_argument('--min-score', type=int, default=1)
+    parser.add_argument('--max-hold', type=int, default=DEFAULT_MAX_HOLD)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        histories = synthetic_histories(args.synthetic, args.years)
+    else:
+        histories = load_cached_histories(args.cache_dir)
+    strategy_names = args.strategies.split(',') if args.strategies else None
+
+    start = time.perf_counter()
+    trades, summary = run_backtest(histories, strategy_names, args.min_score, args.max_hold)
+    elapsed = time.perf_counter() - start
+
+    bars = sum(len(df) for df in histories.values())
+    print(f"Backtested {len(histories)} instruments ({bars:,} bars) in {elapsed:.2f}s")
+    if summary.empty:
+        print("No trades.")
+    else:
+        print(summary.to_string(float_format=lambda v: f"{v:.2f}"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,359 @@
+# benchmark_suite.py
+"""
+Benchmarks for the scanner, indicator and tick hot paths on fixed synthetic
+data (synthetic_data.IntradayDataGenerator with a fixed seed), so runs on
+different commits are comparable.
+
+Groups:
+  engine  - calculate_indicators, data_manager.update_history_with_tick,
+            analyze_setup for every strategy, every registered pattern and
+            the ORB check (always run)
+  db      - trade_analyzer.save_alerts_to_db against the configured
+            Postgres (--db); rows are written under BENCH_STRATEGY and
+            deleted afterwards
+  views   - the dashboard views through Django (--django), on fixture data
+            created in a transaction that is rolled back, with a local
+            in-memory cache so the shared Redis cache is never touched
+
+Each benchmark is timed with timeit: the loop count is calibrated to take at
+least 0.2s, then the loop is repeated and the median and fastest per-call
+times are reported. ``--save`` writes the results as JSON (with the git
+commit); ``--compare`` checks them against a saved run and exits with status
+1 when any median is slower by more than ``--threshold``.
+
+Usage:
+    python benchmark_suite.py [--db] [--django] [-k pattern] [--save results.json] [--compare baseline.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import data_manager
+import indicator_calculator
+import pattern_recognizer
+import strategies
+import trade_analyzer
+from synthetic_data import IntradayDataGenerator
+
+BENCH_SEED = 46
+BENCH_INSTRUMENT = 'NSE_EQ|BENCH0'
+BENCH_STRATEGY = 'Benchmark_Suite'
+HISTORY_ROWS = 200  # data_manager keeps the last 200 rows
+
+# name -> (group, setup); setup(data) returns the zero-argument callable to time
+BENCHMARKS = {}
+
+
+def register_benchmark(name, group='engine'):
+    """Decorator adding a benchmark setup function to BENCHMARKS under ``name``."""
+    def decorator(setup):
+        BENCHMARKS[name] = (group, setup)
+        return setup
+    return decorator
+
+
+def fixed_data():
+    """The synthetic candles every benchmark runs on."""
+    generator = IntradayDataGenerator(seed=BENCH_SEED)
+    minute = generator.generate_histories([BENCH_INSTRUMENT], '2025-01-02', days=2)[BENCH_INSTRUMENT]
+    five_minute = generator.generate_histories([BENCH_INSTRUMENT], '2025-01-06', interval_minutes=5)[BENCH_INSTRUMENT]
+    history = minute.tail(HISTORY_ROWS)
+    return {
+        'history': history,
+        'indicators': indicator_calculator.calculate_indicators(history),
+        'intraday': five_minute,
+        'alerts': [
+            {
+                'instrument_key': f'NSE_EQ|BENCH{i}', 'score': 3,
+                'reasons': ['RSI is oversold at 28.10.', 'Significant volume spike detected.'],
+                'indicators': {'RSI': 28.1, 'Close': 101.5, 'Volume_Spike': True},
+            }
+            for i in range(50)
+        ],
+    }
+
+
+# --- Engine ---
+
+@register_benchmark('indicators.calculate_indicators')
+def bench_calculate_indicators(data):
+    history = data['history']
+    return lambda: indicator_calculator.calculate_indicators(history)
+
+
+@register_benchmark('data_manager.update_history_with_tick')
+def bench_update_history_with_tick(data):
+    data_manager.initialize_history(BENCH_INSTRUMENT, data['history'])
+    last = data['history'].iloc[-1]
+    start = data['history'].index[-1]
+    step = iter(range(1, 1 << 62))
+
+    def update():
+        # A new minute each call, so every tick appends a row and the oldest is trimmed
+        data_manager.update_history_with_tick(BENCH_INSTRUMENT, {
+            'datetime': start + pd.Timedelta(minutes=next(step)),
+            'open': last['open'], 'high': last['high'], 'low': last['low'],
+            'close': last['close'], 'volume': last['volume'],
+        })
+    return update
+
+
+def bench_analyze_setup(strategy_name):
+    def setup(data):
+        rules = strategies.get_rules_for_strategy(strategy_name)
+        indicators, history = data['indicators'], data['history']
+        # Pattern masks are cached per DataFrame, as for a batch analyzed against several strategies
+        return lambda: trade_analyzer.analyze_setup(indicators, history, rules)
+    return setup
+
+
+for _strategy in strategies.STRATEGIES:
+    register_benchmark(f'analyze_setup.{_strategy}')(bench_analyze_setup(_strategy))
+
+
+def bench_pattern(name):
+    def setup(data):
+        o, h, l, c = (data['history'][col].to_numpy(dtype=float) for col in ('open', 'high', 'low', 'close'))
+        # The mask function itself, bypassing pattern_mask's per-DataFrame cache
+        return lambda: pattern_recognizer.PATTERNS[name](o, h, l, c)
+    return setup
+
+
+for _pattern in pattern_recognizer.PATTERNS:
+    register_benchmark(f'pattern.{_pattern}')(bench_pattern(_pattern))
+
+
+@register_benchmark('orb.detect_orb_breakout')
+def bench_orb(data):
+    intraday = data['intraday']
+    return lambda: trade_analyzer.detect_orb_breakout(BENCH_INSTRUMENT, intraday)
+
+
+# --- Database ---
+
+@register_benchmark('db.save_alerts_to_db[50]', group='db')
+def bench_save_alerts(data):
+    alerts = data['alerts']
+    return lambda: trade_analyzer.save_alerts_to_db(alerts, BENCH_STRATEGY)
+
+
+def delete_benchmark_alerts():
+    conn = trade_analyzer.psycopg2.connect(
+        host=trade_analyzer.DB_HOST, dbname=trade_analyzer.DB_NAME, user=trade_analyzer.DB_USER,
+        password=trade_analyzer.DB_PASSWORD, port=trade_analyzer.DB_PORT,
+    )
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM trading_app_radaralert WHERE source_strategy = %s", (BENCH_STRATEGY,))
+    finally:
+        conn.close()
+
+
+# --- Dashboard views ---
+
+def setup_django():
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'django_api'))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_trading_assistant_api.settings')
+    import django
+    from django.conf import settings
+    # The default cache is shared with the running API (alert versions, live
+    # prices); the fixtures' version bumps and the uncached runs' clear() stay local
+    settings.CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark_suite'},
+    }
+    django.setup()
+
+
+def create_view_fixtures(trades=500, alerts=200):
+    """A user with a wallet of closed trades, screening/entry alerts and a trade journal."""
+    from decimal import Decimal
+    from datetime import timedelta
+    from django.contrib.auth.models import User
+    from django.utils import timezone as django_timezone
+    from trading_app.analytics import record_closed_trade
+    from trading_app.models import Instrument, RadarAlert, TradeLog, VirtualTrade, VirtualWallet
+
+    rng = np.random.default_rng(BENCH_SEED)
+    now = django_timezone.now()
+    user = User.objects.create_user(username='benchmark_suite')
+    wallet = VirtualWallet.objects.get(user=user)
+    instruments = [
+        Instrument.objects.create(instrument_key=f'NSE_EQ|BENCH{i}', tradingsymbol=f'BENCH{i}')
+        for i in range(alerts)
+    ]
+    radar_alerts = []
+    for i, instrument in enumerate(instruments):
+        radar_alerts.append(RadarAlert.objects.create(
+            instrument_key=instrument.instrument_key, source_strategy='Bullish_Scan',
+            alert_details={'score': 3, 'reasons': ['RSI is oversold.'] * 3},
+            indicators={'RSI': 28.0, 'Close': 100.0},
+        ))
+        if i % 4 == 0:
+            RadarAlert.objects.create(
+                instrument_key=instrument.instrument_key, source_strategy='RealTime_ORB',
+                alert_type='ENTRY', expires_at=now + timedelta(minutes=45),
+            )
+
+    for i in range(trades):
+        alert = radar_alerts[i % len(radar_alerts)]
+        pnl = Decimal(f'{rng.normal(20, 60):.2f}')
+        trade = VirtualTrade.objects.create(
+            wallet=wallet, alert=alert, instrument_key=alert.instrument_key,
+            tradingsymbol=alert.instrument_key.split('|')[1], trade_type='BUY', quantity=10,
+            entry_price=Decimal('100.00'), exit_price=Decimal('100.00') + pnl / 10, pnl=pnl, status='CLOSED',
+        )
+        exit_time = now - timedelta(days=(trades - i) // 10)
+        VirtualTrade.objects.filter(pk=trade.pk).update(
+            entry_time=exit_time - timedelta(minutes=int(rng.integers(5, 300))), exit_time=exit_time,
+        )
+        trade.refresh_from_db()
+        record_closed_trade(trade)
+
+        TradeLog.objects.create(
+            instrument=instruments[i % len(instruments)], trade_date=(now - timedelta(days=i % 60)).date(),
+            entry_price=Decimal('100.00'), exit_price=Decimal('100.00') + pnl / 10,
+            quantity=10, trade_type='BUY', pnl=pnl,
+        )
+    return user
+
+
+def run_view_benchmarks(selected, user):
+    """Time the dashboard views; the uncached variants clear the (local) cache before each call."""
+    from django.core.cache import cache
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from trading_app import views
+
+    factory = APIRequestFactory()
+
+    def call(view, path, **kwargs):
+        def request():
+            req = factory.get(path)
+            force_authenticate(req, user)
+            response = view(req, **kwargs)
+            response.render()
+            assert response.status_code == 200, response.data
+        return request
+
+    def uncached(fn):
+        def run():
+            cache.clear()
+            fn()
+        return run
+
+    screener = call(views.get_screener_with_entry_status, '/api/screener-status/')
+    journal = call(views.trade_journal_dashboard, '/api/trade-journal-dashboard/')
+    view_benchmarks = {
+        'views.virtual_trading_dashboard': call(views.virtual_trading_dashboard, '/api/virtual-trading-dashboard/'),
+        'views.screener_status': screener,
+        'views.screener_status[uncached]': uncached(screener),
+        'views.trade_journal_dashboard': journal,
+        'views.trade_journal_dashboard[uncached]': uncached(journal),
+        'views.radar_alert_list': call(views.RadarAlertListView.as_view(), '/api/alerts/'),
+    }
+    return {name: time_callable(fn) for name, fn in view_benchmarks.items() if selected(name)}
+
+
+# --- Runner ---
+
+def time_callable(fn, repeat=5):
+    """Median and fastest per-call time (microseconds) over ``repeat`` calibrated loops."""
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    runs = [seconds / loops * 1e6 for seconds in timer.repeat(repeat, loops)]
+    return {'median_us': statistics.median(runs), 'min_us': min(runs), 'loops': loops}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Benchmarks whose median got slower than ``baseline`` by more than ``threshold``, as (name, ratio)."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline['results'].get(name)
+        if before:
+            ratio = result['median_us'] / before['median_us']
+            if ratio > 1 + threshold:
+                regressions.append((name, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--db', action='store_true', help='Include save_alerts_to_db against the configured Postgres')
+    parser.add_argument('--django', action='store_true', help='Include the dashboard views')
+    parser.add_argument('-k', dest='pattern', help='Only run benchmarks whose name contains this')
+    parser.add_argument('--save', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Saved results to check for regressions against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed slowdown of a median (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    groups = {'engine'} | ({'db'} if args.db else set()) | ({'views'} if args.django else set())
+    selected = lambda name: not args.pattern or args.pattern in name
+
+    data = fixed_data()
+    results = {}
+    for name, (group, setup) in BENCHMARKS.items():
+        if group in groups and selected(name):
+            results[name] = time_callable(setup(data))
+    if args.db:
+        delete_benchmark_alerts()
+    if args.django:
+        setup_django()
+        from django.db import transaction
+        with transaction.atomic():
+            results.update(run_view_benchmarks(selected, create_view_fixtures()))
+            transaction.set_rollback(True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    width = max(map(len, results), default=0)
+    for name, result in results.items():
+        line = f"{name:<{width}}  median={result['median_us']:>12,.1f}us  min={result['min_us']:>12,.1f}us  loops={result['loops']}"
+        before = baseline and baseline['results'].get(name)
+        if before:
+            line += f"  ({result['median_us'] / before['median_us']:.2f}x baseline)"
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'created': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'pandas': pd.__version__,
+                'results': results,
+            }, f, indent=2)
+        print(f"Saved {len(results)} results to {args.save}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for name, ratio in regressions:
+            print(f"REGRESSION: {name} is {ratio:.2f}x its baseline ({baseline.get('commit')})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
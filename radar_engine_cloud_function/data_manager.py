@@ -1,7 +1,11 @@
 # data_manager.py
 
+import logging
+
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
 # This dictionary will hold the historical data for each instrument.
 # Key: instrument_key (str), Value: pandas DataFrame of historical candles.
 market_data_history = {}
@@ -12,7 +16,7 @@ def initialize_history(instrument_key, historical_df):
         market_data_history[instrument_key] = historical_df.copy()
     else:
         market_data_history[instrument_key] = pd.DataFrame()
-        print(f"WARNING: Initial historical data for {instrument_key} is empty.")
+        logger.warning(f"Initial historical data for {instrument_key} is empty.")
 
 def update_history_with_tick(instrument_key, tick_data):
     """
@@ -20,22 +24,30 @@ def update_history_with_tick(instrument_key, tick_data):
     This function appends the tick and keeps the DataFrame size limited.
     Returns the updated DataFrame.
     """
+    # Convert tick data to a pandas Series and then to a single-row DataFrame
+    new_series = pd.Series(tick_data).to_frame().T
+    new_series['datetime'] = pd.to_datetime(new_series['datetime'])
+    new_series.set_index('datetime', inplace=True)
+    return append_ticks(instrument_key, new_series)
+
+def append_ticks(instrument_key, ticks_df):
+    """
+    Appends a batch of ticks (a DataFrame indexed by datetime with open, high,
+    low, close and volume columns) to an instrument's history in one concat.
+    Returns the updated DataFrame.
+    """
     if instrument_key not in market_data_history:
-        print(f"WARNING: Cannot update history for {instrument_key}. No initial data.")
+        logger.warning(f"Cannot update history for {instrument_key}. No initial data.")
         return pd.DataFrame()
 
     df_history = market_data_history[instrument_key]
 
-    # Convert tick data to a pandas Series and then to a single-row DataFrame
-    new_series = pd.Series(tick_data).to_frame().T
-    new_series['datetime'] = pd.to_datetime(new_series['datetime'])
-    new_series.set_index('datetime', inplace=True)
-    new_series = new_series.astype({
+    ticks_df = ticks_df.astype({
         'open': float, 'high': float, 'low': float, 'close': float, 'volume': float
     })
 
     # Append new data and handle duplicates by keeping the last entry for a given timestamp
-    updated_df = pd.concat([df_history, new_series])
+    updated_df = pd.concat([df_history, ticks_df])
     updated_df = updated_df[~updated_df.index.duplicated(keep='last')]
     updated_df.sort_index(inplace=True)
 
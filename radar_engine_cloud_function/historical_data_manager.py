@@ -4,7 +4,6 @@ import os
 import sys
 import django
 import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
 import time
 import json
@@ -16,6 +15,7 @@ django.setup()
 
 from trading_app.models import Instrument, HistoricalData
 import upstox_client_wrapper
+from synthetic_data import IntradayDataGenerator
 
 class HistoricalDataManager:
     """
@@ -222,98 +222,6 @@ class HistoricalDataManager:
         print(f"🧹 Cleaned up {removed_count} old data files")
 
 
-# Enhanced intraday data generator
-class IntradayDataGenerator:
-    """
-    Generates realistic intraday data for testing.
-    """
-    
-    def __init__(self):
-        self.market_hours = {
-            'open': '09:15',
-            'close': '15:30'
-        }
-    
-    def generate_intraday_data(self, symbol, date, interval_minutes=5, scenario='normal'):
-        """
-        Generates realistic intraday data for testing.
-        
-        Args:
-            symbol (str): Stock symbol
-            date (datetime): Trading date
-            interval_minutes (int): Candle interval
-            scenario (str): 'normal', 'volatile', 'trending'
-            
-        Returns:
-            pd.DataFrame: Intraday OHLCV data
-        """
-        # Get the previous day's close as starting point
-        base_price = 1000  # Default, could be enhanced to use real data
-        
-        # Generate intraday data (9:15 AM to 3:30 PM = 375 minutes)
-        total_minutes = 375
-        num_candles = total_minutes // interval_minutes
-        
-        data = []
-        current_price = base_price
-        
-        # Market open time
-        market_open = date.replace(hour=9, minute=15, second=0, microsecond=0)
-        
-        # Scenario-specific parameters
-        if scenario == 'volatile':
-            volatility = 0.02
-            trend = 0.0001
-        elif scenario == 'trending':
-            volatility = 0.01
-            trend = 0.001
-        else:  # normal
-            volatility = 0.015
-            trend = 0.0005
-        
-        for i in range(num_candles):
-            candle_time = market_open + timedelta(minutes=i * interval_minutes)
-            
-            # Add trend and volatility
-            trend_change = trend * current_price * (interval_minutes / 1440)
-            intraday_return = np.random.normal(trend_change, volatility * current_price * 0.1)
-            new_price = current_price + intraday_return
-            
-            # Generate OHLC
-            high_low_range = volatility * new_price * 0.05
-            high = new_price + abs(np.random.normal(0, high_low_range))
-            low = new_price - abs(np.random.normal(0, high_low_range))
-            open_price = current_price + np.random.normal(0, high_low_range * 0.5)
-            close_price = new_price
-            
-            # Ensure OHLC relationships
-            high = max(high, open_price, close_price)
-            low = min(low, open_price, close_price)
-            
-            # Generate volume (higher during market open/close)
-            base_volume = 50000
-            if i < 10 or i > num_candles - 10:  # First and last 10 candles
-                volume_multiplier = 2.0
-            else:
-                volume_multiplier = 1.0
-            volume = int(base_volume * volume_multiplier * (0.5 + np.random.random()))
-            
-            data.append({
-                'datetime': candle_time,
-                'open': round(open_price, 2),
-                'high': round(high, 2),
-                'low': round(low, 2),
-                'close': round(close_price, 2),
-                'volume': volume
-            })
-            
-            current_price = close_price
-        
-        df = pd.DataFrame(data)
-        df.set_index('datetime', inplace=True)
-        return df
-
-
 # Example usage
 if __name__ == "__main__":
     # Initialize managers
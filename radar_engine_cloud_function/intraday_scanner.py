@@ -1,5 +1,7 @@
 # intraday_scanner.py
 
+import argparse
+import logging
 import os
 import sys
 import django
@@ -16,8 +18,13 @@ django.setup()
 # --- End Django Setup ---
 
 from trading_app.models import RadarAlert
+import metrics
+import scan_run
 import upstox_client_wrapper
 import trade_analyzer
+import structured_logging
+
+logger = logging.getLogger(__name__)
 
 # --- Constants ---
 STRATEGY_NAME = "Intraday_ORB_Breakout"
@@ -28,106 +35,82 @@ def get_watchlist():
     Fetches the instrument keys from the latest pre-market scan alerts
     to create our intraday watchlist.
     """
-    print("Fetching watchlist from pre-market scan alerts...")
+    logger.info("Fetching watchlist from pre-market scan alerts...")
     try:
         # Get the most recent alerts from the "Daily_Confluence_Scan"
         alerts = RadarAlert.objects.filter(source_strategy="Daily_Confluence_Scan").order_by('-timestamp')
         # Get the unique instrument keys from these alerts
         watchlist = list(alerts.values_list('instrument_key', flat=True).distinct())
-        print(f"Found {len(watchlist)} stocks in the watchlist.")
+        logger.info(f"Found {len(watchlist)} stocks in the watchlist.")
         return watchlist
     except Exception as e:
-        print(f"ERROR fetching watchlist from database: {e}")
+        logger.error(f"Failed to fetch watchlist from database: {e}")
         return []
 
-def analyze_stock_for_orb(instrument_key):
+def analyze_stock_for_orb(instrument_key, run=None):
     """
     Enhanced Opening Range Breakout analysis with multiple entry strategies.
+    Stage times go to ``run`` if given. Returns the saved alert, or None if
+    there was no breakout.
     """
-    df = upstox_client_wrapper.fetch_intraday_data(instrument_key, interval='5')
-
-    if df is None or len(df) < 12: # Need at least 12 5-min candles for 1 hour analysis
-        return
-
-    # 1. Define the opening range (first 30 minutes = 6 candles)
-    opening_range_df = df.head(6)
-    opening_range_high = opening_range_df['high'].max()
-    opening_range_low = opening_range_df['low'].min()
-    
-    # 2. Get the most recent candle
-    last_candle = df.iloc[-1]
-    current_price = last_candle['close']
-    current_volume = last_candle['volume']
-    avg_volume = df['volume'].tail(6).mean()
-    
-    # 3. Enhanced breakout detection with volume confirmation
-    breakout_up = current_price > opening_range_high
-    breakout_down = current_price < opening_range_low
-    volume_confirmation = current_volume > avg_volume * 1.2
-    
-    if breakout_up or breakout_down:
-        direction = "UP" if breakout_up else "DOWN"
-        breakout_level = opening_range_high if breakout_up else opening_range_low
-        
-        # Calculate targets and stop loss
-        if breakout_up:
-            stop_loss = opening_range_low
-            target = current_price + (current_price - opening_range_low)
-        else:
-            stop_loss = opening_range_high
-            target = current_price - (opening_range_high - current_price)
-        
-        # Calculate risk-reward ratio
-        risk = abs(current_price - stop_loss)
-        reward = abs(target - current_price)
-        rr_ratio = reward / risk if risk > 0 else 0
-        
-        print(f"\n🎯 [ENHANCED ORB DETECTED] for {instrument_key}!")
-        print(f"   Direction: {direction}")
-        print(f"   Entry: ₹{current_price:.2f}")
-        print(f"   Stop Loss: ₹{stop_loss:.2f}")
-        print(f"   Target: ₹{target:.2f}")
-        print(f"   Risk-Reward: 1:{rr_ratio:.2f}")
-        print(f"   Volume: {'✅ Confirmed' if volume_confirmation else '❌ Weak'}")
-        
-        # 4. Create enhanced alert
-        reasons = [
-            f"Enhanced ORB: Price broke {direction} the {OPENING_RANGE_MINUTES}-min opening range",
-            f"Entry: ₹{current_price:.2f}, Stop: ₹{stop_loss:.2f}, Target: ₹{target:.2f}",
-            f"Risk-Reward: 1:{rr_ratio:.2f}",
-            f"Volume: {'High' if volume_confirmation else 'Normal'}"
-        ]
-        
-        alert_data = {
-            "instrument_key": instrument_key,
-            "score": 2 if volume_confirmation else 1,
-            "reasons": reasons,
-            "indicators": {
-                "ORB_High": opening_range_high,
-                "ORB_Low": opening_range_low,
-                "Entry_Price": current_price,
-                "Stop_Loss": stop_loss,
-                "Target": target,
-                "Risk_Reward": rr_ratio,
-                "Volume_Confirmation": volume_confirmation,
-                "Direction": direction
-            }
-        }
-        
-        # Save enhanced alert
-        trade_analyzer.save_alerts_to_db([alert_data], STRATEGY_NAME)
-
-def main():
+    run = run or scan_run.ScanRunRecorder('INTRADAY')
+    with run.stage('fetch'):
+        df = upstox_client_wrapper.fetch_intraday_data(instrument_key, interval='5')
+    if not df.empty:
+        run.instruments_with_data += 1
+
+    # 1. Opening range, breakout and volume confirmation (first 30 minutes = 6 candles)
+    with run.stage('rules'):
+        alert_data = trade_analyzer.detect_orb_breakout(
+            instrument_key, df, opening_range_candles=OPENING_RANGE_MINUTES // 5
+        )
+    if alert_data is None:
+        return None
+    run.instruments_qualified += 1
+
+    logger.info(f"ORB breakout detected for {instrument_key}",
+                extra={'instrument_key': instrument_key, **alert_data['indicators']})
+
+    # 2. Save enhanced alert
+    with run.stage('persist'):
+        run.alerts_saved += trade_analyzer.save_alerts_to_db([alert_data], STRATEGY_NAME)
+    return alert_data
+
+def print_scan_report(watchlist, breakouts):
+    """Human-readable summary of an intraday scan."""
+    print(f"\n--- Intraday Scan Complete: {STRATEGY_NAME} ---")
+    print(f"Stocks scanned: {len(watchlist)}, breakouts: {len(breakouts)}")
+    for alert in breakouts:
+        levels = alert['indicators']
+        print(f"\n🎯 {alert['instrument_key']}: {levels['Direction']}")
+        print(f"   Entry: ₹{levels['Entry_Price']:.2f}")
+        print(f"   Stop Loss: ₹{levels['Stop_Loss']:.2f}")
+        print(f"   Target: ₹{levels['Target']:.2f}")
+        print(f"   Risk-Reward: 1:{levels['Risk_Reward']:.2f}")
+        print(f"   Volume: {'✅ Confirmed' if levels['Volume_Confirmation'] else '❌ Weak'}")
+
+def main(scan_run_id=None):
     """
-    Main function to run the intraday scanner.
+    Main function to run the intraday scanner, recorded as a ScanRun (the
+    one with ``scan_run_id`` if given), which is returned.
     """
-    print(f"\n--- Running Intraday Scanner: {STRATEGY_NAME} ---")
+    structured_logging.setup_logging()
+    logger.info(f"Running intraday scanner: {STRATEGY_NAME}")
+    run = scan_run.ScanRunRecorder('INTRADAY', strategy=STRATEGY_NAME, scan_run_id=scan_run_id)
+    try:
+        status, message = run_scan(run)
+    except Exception as e:
+        run.save('FAILED', error=str(e))
+        raise
+    return run.save(status, message)
 
+def run_scan(run):
+    """One intraday scan, timed per stage into ``run``. Returns (ScanRun status, message)."""
     # Check if it's a weekday
     today = datetime.now().weekday()  # Monday=0, Sunday=6
     if today >= 5:
-        print("Market is closed today (Weekend). Exiting.")
-        return
+        logger.info("Market is closed today (Weekend). Exiting.")
+        return 'SKIPPED', "Market is closed today (Weekend)."
     
     # Check market hours (9:15 AM to 3:30 PM IST)
     import pytz
@@ -136,24 +119,34 @@ def main():
     current_time = now.strftime("%H:%M")
     
     if not ("09:15" <= current_time <= "15:30"):
-        print(f"Market is closed. Current time: {current_time}")
-        return
+        logger.info(f"Market is closed. Current time: {current_time}")
+        return 'SKIPPED', f"Market is closed. Current time: {current_time}"
 
-    print(f"Current IST Time: {now.time()}")
-    print("Market is open. Starting intraday scan...")
+    logger.info(f"Market is open at {now.time()} IST. Starting intraday scan...")
 
     # Get watchlist and scan
-    watchlist = get_watchlist()
+    with run.stage('context'):
+        watchlist = get_watchlist()
     if not watchlist:
-        print("No stocks in the watchlist to scan. Exiting.")
-        return
+        logger.info("No stocks in the watchlist to scan. Exiting.")
+        return 'SKIPPED', "No stocks in the watchlist to scan."
 
+    breakouts = []
+    scan_seconds = metrics.SCAN_INSTRUMENT_SECONDS.labels(scanner='intraday_orb')
     for i, instrument_key in enumerate(watchlist):
-        print(f"  Analyzing {i+1}/{len(watchlist)}: {instrument_key}", end='\r')
-        analyze_stock_for_orb(instrument_key)
+        logger.debug(f"Analyzing {i+1}/{len(watchlist)}: {instrument_key}")
+        with scan_seconds.time(), run.instrument(instrument_key):
+            alert_data = analyze_stock_for_orb(instrument_key, run)
+        if alert_data is not None:
+            breakouts.append(alert_data)
         time.sleep(0.5)
 
-    print("\n--- Intraday Scan Complete ---")
+    logger.info("Intraday scan complete",
+                extra={'strategy': STRATEGY_NAME, 'scanned': len(watchlist), 'breakouts': len(breakouts)})
+    print_scan_report(watchlist, breakouts)
+    return 'SUCCESS', ''
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Intraday ORB scan')
+    parser.add_argument('--scan-run-id', type=int, help='Record results on this existing ScanRun')
+    main(scan_run_id=parser.parse_args().scan_run_id)
@@ -1,16 +1,34 @@
 # main.py
 
+import argparse
+import logging
 import upstox_client_wrapper
 import data_manager
+import metrics
+import structured_logging
 import websocket_handler
 import time
 
+logger = logging.getLogger(__name__)
+
 def main():
     """
     The main function to orchestrate the radar engine.
     """
+    parser = argparse.ArgumentParser(description='Radar engine live feed')
+    parser.add_argument('--shards', type=int, default=0,
+                        help='Analysis processes, instruments hashed across them (0 = analyze in the feed process)')
+    parser.add_argument('--metrics-port', type=int, default=9108,
+                        help='Serve Prometheus metrics on localhost at this port (0 = off)')
+    parser.add_argument('--save-alerts', action='store_true',
+                        help='Save live-feed setups as expiring Live_Feed alerts (default: log them only)')
+    args = parser.parse_args()
+    structured_logging.setup_logging()
+    if args.metrics_port:
+        metrics.start_metrics_server(args.metrics_port)
+
     # --- Step 1: Get the instrument keys for NIFTY 100 stocks ---
-    print("--- Getting NIFTY 100 Instrument Keys ---")
+    logger.info("Getting NIFTY 100 instrument keys")
     
     # **FIX:** Call the correct, updated function name.
     # This function will get symbols for NIFTY 50 & NIFTY NEXT 50, then find their keys.
@@ -19,15 +37,15 @@ def main():
     )
 
     if not nifty100_keys:
-        print("FATAL: Could not retrieve NIFTY instrument list. Exiting.")
+        logger.critical("Could not retrieve NIFTY instrument list. Exiting.")
         return
 
     subscribed_instrument_keys = nifty100_keys
-    print(f"\n--- Preparing to scan {len(subscribed_instrument_keys)} NIFTY 100 stocks ---")
+    logger.info(f"Preparing to scan {len(subscribed_instrument_keys)} NIFTY 100 stocks")
 
 
     # --- Step 2: Initialize historical data for each instrument ---
-    print("--- Initializing Historical Data ---")
+    logger.info("Initializing historical data")
     for key in subscribed_instrument_keys:
         df = upstox_client_wrapper.fetch_historical_data(
             instrument_key=key,
@@ -37,7 +55,7 @@ def main():
         )
         data_manager.initialize_history(key, df)
         time.sleep(0.5) # Add a small delay to respect API rate limits
-    print("--- Historical Data Initialization Complete ---")
+    logger.info("Historical data initialization complete")
 
 
     # --- Step 3: Get the WebSocket URI ---
@@ -46,9 +64,11 @@ def main():
 
     # --- Step 4: Start the WebSocket feed if the URI was obtained ---
     if websocket_uri:
-        websocket_handler.start_websocket_feed(websocket_uri, subscribed_instrument_keys)
+        sink = websocket_handler.save_live_alerts if args.save_alerts else websocket_handler.log_live_alerts
+        websocket_handler.start_websocket_feed(websocket_uri, subscribed_instrument_keys,
+                                               shards=args.shards, sink=sink)
     else:
-        print("FATAL: Could not start WebSocket feed because the authorization URI was not obtained.")
+        logger.critical("Could not start WebSocket feed because the authorization URI was not obtained.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,389 @@
+# market_replay.py
+"""
+Headless market replay: drives the live pipeline from recorded data.
+
+Frames come from a capture file (``run_market_gateway --capture``: 4-byte
+big-endian length + FeedResponse per record) or are built from stored
+candles. A candle becomes four ticks over its interval: open, low and high
+(high first on a down candle), then close. Every frame goes through
+websocket_handler.on_message, the tick buffer and the batch worker
+(process_batch: history, indicators, setup analysis), exactly as in
+production. The same ticks also drive:
+  - the ORB detector (trade_analyzer.detect_orb_breakout) on 5-minute
+    candles built from the ticks, checked as each candle closes
+  - optionally the virtual trading engine's exit matching
+    (trading_app.trade_index) over the open trades in the database;
+    this is a dry run that records exits without closing any trade
+
+``--speed N`` replays at N times market speed (time taken from each frame's
+currentTs, else its latest trade time); 0 replays as fast as possible.
+``--lockstep`` analyzes each frame's ticks before sending the next one, so
+no tick is conflated and the alerts are the same on every run.
+
+The report gives replayed ticks per second and latencies from a tick
+entering on_message to its analysis finishing, and to each alert.
+
+Usage:
+    python market_replay.py --frames capture.frames [--speed 10]
+    python market_replay.py --candles historical_data_cache --warmup 60
+    python market_replay.py --synthetic 200 [--speed 0] [--lockstep] [--output alerts.csv]
+"""
+
+import argparse
+import csv
+import os
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+import backtester
+import data_manager
+import structured_logging
+import trade_analyzer
+import websocket_handler
+from synthetic_data import IntradayDataGenerator
+from upstox_client.feeder.proto import MarketDataFeedV3_pb2
+
+ORB_CANDLE_MS = 5 * 60 * 1000
+
+# Seconds to wait for the batch worker to finish the last ticks
+DRAIN_TIMEOUT = 30
+
+_LENGTH = struct.Struct('>I')
+
+
+# --- Sources ---
+
+def read_frames(path):
+    """Yield the frames of a capture file in order (the trading_app.feed_replay format)."""
+    with open(path, 'rb') as file:
+        while True:
+            header = file.read(_LENGTH.size)
+            if not header:
+                return
+            (length,) = _LENGTH.unpack(header)
+            frame = file.read(length)
+            if len(frame) < length:
+                raise ValueError(f"Truncated frame in {path}")
+            yield frame
+
+
+def candles_to_frames(histories):
+    """
+    Encode candles (instrument_key -> OHLCV DataFrame) as ltpc FeedResponse
+    frames, one per distinct tick time, in time order.
+    Returns [(time_ms, frame), ...].
+    """
+    columns = {name: [] for name in ('time', 'key', 'ltp', 'ltq', 'cp')}
+    keys = sorted(histories)
+    for key_index, key in enumerate(keys):
+        df = histories[key]
+        if len(df) < 2:
+            continue
+        start = pd.DatetimeIndex(df.index).as_unit('ms').asi8
+        interval = int(np.median(np.diff(start)))
+        o, h, l, c = (df[col].to_numpy(dtype=float) for col in ('open', 'high', 'low', 'close'))
+        up = c >= o
+        prices = np.stack([o, np.where(up, l, h), np.where(up, h, l), c], axis=1)
+        times = start[:, None] + np.arange(4) * (interval // 4)
+        previous_close = np.concatenate([[o[0]], c[:-1]])
+        columns['time'].append(times.ravel())
+        columns['key'].append(np.full(prices.size, key_index))
+        columns['ltp'].append(prices.ravel())
+        columns['ltq'].append(np.repeat(np.maximum(df['volume'].to_numpy() // 4, 1).astype(np.int64), 4))
+        columns['cp'].append(np.repeat(previous_close, 4))
+
+    if not columns['time']:
+        return []
+    ticks = {name: np.concatenate(parts) for name, parts in columns.items()}
+    order = np.lexsort((ticks['key'], ticks['time']))
+    ticks = {name: values[order] for name, values in ticks.items()}
+
+    frames = []
+    bounds = np.flatnonzero(np.diff(ticks['time'])) + 1
+    for start, end in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(order)]])):
+        response = MarketDataFeedV3_pb2.FeedResponse()
+        response.type = MarketDataFeedV3_pb2.live_feed
+        response.currentTs = int(ticks['time'][start])
+        for i in range(start, end):
+            ltpc = response.feeds[keys[ticks['key'][i]]].ltpc
+            ltpc.ltp = ticks['ltp'][i]
+            ltpc.ltt = int(ticks['time'][i])
+            ltpc.ltq = int(ticks['ltq'][i])
+            ltpc.cp = ticks['cp'][i]
+        frames.append((int(ticks['time'][start]), response.SerializeToString()))
+    return frames
+
+
+def frame_time_ms(response):
+    if response.currentTs:
+        return response.currentTs
+    ltts = [ltpc.ltt for ltpc in map(websocket_handler._ltpc, response.feeds.values()) if ltpc is not None]
+    return max(ltts) if ltts else 0
+
+
+# --- ORB ---
+
+class OrbTracker:
+    """
+    Builds each instrument's 5-minute candles for the day from ticks and runs
+    the ORB detector whenever one closes. An instrument alerts once per
+    breakout direction per day.
+    """
+
+    def __init__(self):
+        self.candles = {}    # instrument_key -> [candle, ...] for the current day
+        self.current = {}    # instrument_key -> candle in progress
+        self.alerted = {}    # instrument_key -> (day, {directions})
+
+    def add(self, instrument_key, ltt, ltp, ltq):
+        """Apply a tick; returns an ORB alert if the candle it closed completed a breakout."""
+        start = ltt - ltt % ORB_CANDLE_MS
+        candle = self.current.get(instrument_key)
+        if candle is not None and candle['start'] == start:
+            candle['high'] = max(candle['high'], ltp)
+            candle['low'] = min(candle['low'], ltp)
+            candle['close'] = ltp
+            candle['volume'] += ltq
+            return None
+
+        self.current[instrument_key] = {'start': start, 'open': ltp, 'high': ltp, 'low': ltp, 'close': ltp, 'volume': ltq}
+        if candle is None:
+            return None
+
+        day = pd.Timestamp(candle['start'], unit='ms', tz='Asia/Kolkata').date()
+        candles = self.candles.setdefault(instrument_key, [])
+        if candles and pd.Timestamp(candles[-1]['start'], unit='ms', tz='Asia/Kolkata').date() != day:
+            candles.clear()
+        candles.append(candle)
+
+        alert = trade_analyzer.detect_orb_breakout(instrument_key, pd.DataFrame(candles))
+        if alert is None:
+            return None
+        alerted_day, directions = self.alerted.get(instrument_key, (None, set()))
+        if alerted_day != day:
+            directions = set()
+        direction = alert['indicators']['Direction']
+        if direction in directions:
+            return None
+        directions.add(direction)
+        self.alerted[instrument_key] = (day, directions)
+        return alert
+
+
+# --- Virtual trades ---
+
+def load_open_trade_index():
+    """The virtual trading engine's index of open trades, loaded through Django."""
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'django_api'))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_trading_assistant_api.settings')
+    import django
+    django.setup()
+    from trading_app.models import VirtualTrade
+    from trading_app.trade_index import OpenTrade, OpenTradeIndex
+
+    trades = VirtualTrade.objects.filter(status='EXECUTED').select_related('wallet__user')
+    return OpenTradeIndex(OpenTrade.from_trade(trade) for trade in trades)
+
+
+# --- Replay ---
+
+class MarketReplay:
+    """Feeds frames through the live pipeline and records throughput and latencies."""
+
+    def __init__(self, speed=0, lockstep=False, trade_index=None):
+        self.speed = speed
+        self.lockstep = lockstep
+        self.trade_index = trade_index
+        self.orb = OrbTracker()
+        self.buffer = websocket_handler.tick_buffer
+        self.sent = {}            # instrument_key -> deque of (ltt, perf_counter at on_message)
+        self.analysis_latency = []
+        self.alerts = []          # (source, instrument_key, market time ms, latency seconds, detail)
+        self.rows_processed = 0
+        self.frames = 0
+        self.ticks = 0
+        self._lock = threading.Lock()
+
+    def _sent_time(self, instrument_key, ltt):
+        """When the tick drained with trade time ``ltt`` was sent; forgets ticks conflated before it."""
+        pending = self.sent[instrument_key]
+        while len(pending) > 1 and pending[0][0] < ltt:
+            pending.popleft()
+        return pending.popleft()[1] if pending and pending[0][0] == ltt else None
+
+    def process(self, batch):
+        """Batch worker step: websocket_handler.process_batch, timed per row."""
+        setups = {alert['instrument_key']: alert['reasons'] for alert in websocket_handler.process_batch(batch)}
+        done = time.perf_counter()
+        with self._lock:
+            for row in batch:
+                instrument_key = self.buffer.instrument_keys[row['slot']]
+                sent = self._sent_time(instrument_key, row['ltt'])
+                if sent is None:
+                    continue
+                self.analysis_latency.append(done - sent)
+                if instrument_key in setups:
+                    self.alerts.append(('RADAR', instrument_key, int(row['ltt']), done - sent,
+                                        '; '.join(setups[instrument_key])))
+            self.rows_processed += len(batch)
+
+    def _observe(self, response, sent):
+        """The harness's view of a frame: history seeding, ORB candles and trade exits."""
+        for instrument_key, feed in response.feeds.items():
+            ltpc = websocket_handler._ltpc(feed)
+            if ltpc is None or ltpc.ltp <= 0:
+                continue
+            if instrument_key not in data_manager.market_data_history:
+                data_manager.initialize_history(instrument_key, pd.DataFrame())
+            with self._lock:
+                self.sent.setdefault(instrument_key, deque()).append((ltpc.ltt, sent))
+            self.ticks += 1
+
+            alert = self.orb.add(instrument_key, ltpc.ltt, ltpc.ltp, ltpc.ltq)
+            if alert is not None:
+                self.alerts.append(('ORB', instrument_key, ltpc.ltt, time.perf_counter() - sent,
+                                    alert['reasons'][0]))
+
+            if self.trade_index is not None and instrument_key in self.trade_index.ladders:
+                now = datetime.fromtimestamp(ltpc.ltt / 1000, tz=timezone.utc)
+                for trade, exit_price, reason in self.trade_index.triggered(instrument_key, Decimal(str(ltpc.ltp)), now):
+                    self.trade_index.remove(trade.id)
+                    self.alerts.append(('EXIT', instrument_key, ltpc.ltt, time.perf_counter() - sent,
+                                        f"trade {trade.id} {reason} at {exit_price}"))
+
+    def run(self, frames):
+        """Replay ``frames`` (iterable of bytes or (time_ms, bytes)); returns the report dict."""
+        stop_event = threading.Event()
+        worker = None
+        if not self.lockstep:
+            worker = threading.Thread(target=websocket_handler.run_batch_worker, args=(stop_event, self.process), daemon=True)
+            worker.start()
+
+        before = self.buffer.stats()
+        first_market_ms = last_market_ms = None
+        start = time.perf_counter()
+        try:
+            for item in frames:
+                frame = item[1] if isinstance(item, tuple) else item
+                response = MarketDataFeedV3_pb2.FeedResponse()
+                response.ParseFromString(frame)
+                market_ms = item[0] if isinstance(item, tuple) else frame_time_ms(response)
+                if market_ms:
+                    first_market_ms = first_market_ms or market_ms
+                    last_market_ms = market_ms
+                    if self.speed > 0:
+                        delay = start + (market_ms - first_market_ms) / 1000 / self.speed - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+
+                sent = time.perf_counter()
+                self._observe(response, sent)
+                websocket_handler.on_message(None, frame)
+                self.frames += 1
+                if self.lockstep:
+                    batch = self.buffer.drain(timeout=0)
+                    if len(batch):
+                        self.process(batch)
+
+            # Wait for the worker to analyze everything still queued
+            deadline = time.monotonic() + DRAIN_TIMEOUT
+            while not self.lockstep and time.monotonic() < deadline:
+                stats = self.buffer.stats()
+                queued = (stats['pushed'] - before['pushed']) - (stats['conflated'] - before['conflated'])
+                if self.rows_processed >= queued:
+                    break
+                time.sleep(0.01)
+        finally:
+            stop_event.set()
+            if worker:
+                worker.join()
+        elapsed = time.perf_counter() - start
+
+        after = self.buffer.stats()
+        return {
+            'frames': self.frames,
+            'ticks': self.ticks,
+            'seconds': elapsed,
+            'market_seconds': (last_market_ms - first_market_ms) / 1000 if first_market_ms else 0,
+            'conflated': after['conflated'] - before['conflated'],
+            'dropped': after['dropped'] - before['dropped'],
+        }
+
+
+def _percentiles(seconds):
+    if not len(seconds):
+        return "n/a"
+    us = np.asarray(seconds) * 1e6
+    return f"p50={np.percentile(us, 50):,.0f}us p99={np.percentile(us, 99):,.0f}us max={us.max():,.0f}us"
+
+
+def print_report(replay, report):
+    print(f"Replayed {report['frames']:,} frames / {report['ticks']:,} ticks in {report['seconds']:.2f}s: "
+          f"{report['ticks'] / report['seconds']:,.0f} ticks/s"
+          + (f", {report['market_seconds'] / report['seconds']:,.1f}x market time" if report['market_seconds'] else ""))
+    print(f"Tick queue: conflated={report['conflated']:,} dropped={report['dropped']:,}")
+    print(f"Tick -> analyzed ({len(replay.analysis_latency):,} rows): {_percentiles(replay.analysis_latency)}")
+    for source in ('RADAR', 'ORB', 'EXIT'):
+        latencies = [alert[3] for alert in replay.alerts if alert[0] == source]
+        print(f"Tick -> {source} alert ({len(latencies):,}): {_percentiles(latencies)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--frames', help='Capture file of raw FeedResponse frames')
+    source.add_argument('--candles', help='Directory of stored candles (HistoricalDataManager or columnar cache)')
+    source.add_argument('--synthetic', type=int, help='Replay a generated day of 1-minute candles for this many instruments')
+    parser.add_argument('--scenario', default='normal', help='Regime of a --synthetic day (see synthetic_data.REGIMES)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of a --synthetic day')
+    parser.add_argument('--warmup', type=int, default=0, help='Candles per instrument loaded as history instead of replayed')
+    parser.add_argument('--history-dir', help='Stored candles to seed the history of a --frames replay')
+    parser.add_argument('--speed', type=float, default=0, help='Multiple of market speed (0 = as fast as possible)')
+    parser.add_argument('--lockstep', action='store_true', help='Analyze each frame before the next (deterministic)')
+    parser.add_argument('--virtual-trades', action='store_true', help='Also match exits of open virtual trades (dry run)')
+    parser.add_argument('--output', help='Write every alert to this CSV file')
+    parser.add_argument('--verbose', action='store_true', help="Log the pipeline's per-tick records (DEBUG)")
+    args = parser.parse_args()
+    structured_logging.setup_logging(level='DEBUG' if args.verbose else 'ERROR')
+
+    if args.frames:
+        if args.history_dir:
+            for key, df in backtester.load_cached_histories(args.history_dir).items():
+                data_manager.initialize_history(key, df)
+        frames = list(read_frames(args.frames))
+    else:
+        if args.synthetic:
+            instrument_keys = [f'NSE_EQ|SYN{i}' for i in range(args.synthetic)]
+            histories = IntradayDataGenerator(seed=args.seed).generate_histories(instrument_keys, '2025-01-02', scenario=args.scenario)
+        else:
+            histories = backtester.load_cached_histories(args.candles)
+        for key, df in histories.items():
+            data_manager.initialize_history(key, df.iloc[:args.warmup])
+        frames = candles_to_frames({key: df.iloc[args.warmup:] for key, df in histories.items()})
+    print(f"Loaded {len(frames):,} frames")
+
+    trade_index = load_open_trade_index() if args.virtual_trades else None
+    replay = MarketReplay(speed=args.speed, lockstep=args.lockstep, trade_index=trade_index)
+    report = replay.run(frames)
+    print_report(replay, report)
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['source', 'instrument_key', 'market_time', 'latency_us', 'detail'])
+            for source, key, market_ms, latency, detail in sorted(replay.alerts, key=lambda a: (a[2], a[0], a[1])):
+                writer.writerow([source, key, pd.Timestamp(market_ms, unit='ms', tz='Asia/Kolkata').isoformat(),
+                                 round(latency * 1e6), detail])
+        print(f"Wrote {len(replay.alerts):,} alerts to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# metrics.py
+"""
+The radar engine's Prometheus metrics. The primitives (Counter, Gauge,
+Histogram, total, upstox_call and the /metrics server) are trading_app's
+metrics module; the radar engine keeps its own registry, so its /metrics
+lists the metrics below plus the shared Upstox call metrics, not the
+Django processes'.
+
+Recording a value is a dict lookup and a short lock, so instrumentation
+stays on during market hours; bind labelled children once
+(``HIST.labels(stage='x')``) on hot paths. Sharded analysis workers
+(sharded_analysis) run in their own processes, so their per-stage timings
+are not included.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'django_api'))
+
+# total() and upstox_call() are used through this module by the radar engine
+from trading_app.metrics import (
+    UPSTOX_ERRORS, UPSTOX_REQUEST_SECONDS, Counter, Gauge, Histogram, total, upstox_call,
+)
+from trading_app.metrics import start_metrics_server as _start_metrics_server
+
+# Upstox calls are timed by trading_app's upstox_call, so its metrics are shared
+REGISTRY = [UPSTOX_REQUEST_SECONDS, UPSTOX_ERRORS]
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """Serve the radar engine's /metrics on ``host:port``; None if the port is taken."""
+    return _start_metrics_server(port, host, registry=REGISTRY)
+
+
+# --- Radar engine metrics ---
+
+TICKS_DECODED = Counter('radar_ticks_decoded_total', 'Ticks decoded from the live feed', registry=REGISTRY)
+FEED_DECODE_ERRORS = Counter(
+    'radar_feed_decode_errors_total', 'Live feed frames that failed to decode', registry=REGISTRY,
+)
+TICK_STAGE_SECONDS = Histogram(
+    'radar_tick_stage_seconds', 'Time per stage of tick processing, per frame (decode) or instrument',
+    ['stage'], registry=REGISTRY,
+)
+TICK_QUEUE_DEPTH = Gauge(
+    'radar_tick_queue_depth', 'Instruments with ticks waiting for the batch worker', registry=REGISTRY,
+)
+TICKS_CONFLATED = Counter(
+    'radar_ticks_conflated_total', 'Ticks replaced by a newer tick before analysis', registry=REGISTRY,
+)
+TICKS_DROPPED = Counter(
+    'radar_ticks_dropped_total', 'Ticks dropped because the tick queue was full', registry=REGISTRY,
+)
+ALERTS_WRITTEN = Counter(
+    'radar_alerts_written_total', 'Alerts saved to the database', ['strategy'], registry=REGISTRY,
+)
+DB_WRITE_SECONDS = Histogram(
+    'radar_db_write_seconds', 'Database write latency', ['operation'], registry=REGISTRY,
+)
+SCAN_INSTRUMENT_SECONDS = Histogram(
+    'radar_scan_instrument_seconds', 'Scan time per instrument, including its data fetch', ['scanner'],
+    registry=REGISTRY,
+)
+POLL_CYCLES = Counter('radar_poll_cycles_total', 'Completed intraday polling cycles', registry=REGISTRY)
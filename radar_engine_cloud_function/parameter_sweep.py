@@ -0,0 +1,299 @@
+# parameter_sweep.py
+"""
+Walk-forward sweep of the rule thresholds in strategies.ALL_RULES.
+
+For each instrument the backtester's indicator series, the masks of the
+rules without a swept threshold, and the exit of a long and a short trade
+from every bar are computed once. Each swept threshold then adds one mask
+per candidate value, and the signals of every parameter combination are
+assembled from those masks as one (combinations x bars) array. Trades for
+all combinations are walked together, one open trade at a time per
+combination as in the backtester, so the cost per combination is a few
+array operations rather than another backtest.
+
+Instruments are spread over a process pool. Per instrument, combination
+and calendar year the sweep records trades, wins and summed return into a
+compressed columnar .npz file (see load_results). The walk-forward report
+then picks, for each year, the combination with the best return over the
+preceding ``--train-years`` and shows how it did in that year next to the
+hand-picked thresholds.
+
+Usage:
+    python parameter_sweep.py --synthetic 200 --years 5 [--workers 4] [--output sweep.npz]
+    python parameter_sweep.py --param rsi_oversold=20,25,30 --param volume_spike_multiple=1.2,1.5,2
+"""
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import backtester
+import strategies
+
+# Swept threshold -> (rule it replaces, mask over indicator arrays for a column of values)
+SWEEP_PARAMETERS = {
+    'rsi_oversold': ('RSI Oversold', lambda ind, v: ind['RSI'] < v),
+    'rsi_overbought': ('RSI Overbought', lambda ind, v: ind['RSI'] > v),
+    'bb_squeeze_width': ('Bollinger Band Squeeze', lambda ind, v: ind['BB_Width'] < v),
+    'volume_spike_multiple': ('Volume Spike', lambda ind, v: ind['Volume'] > ind['Volume_EMA10'] * v),
+}
+
+# 5 x 5 x 5 x 8 = 1,000 combinations, each axis including the hand-picked value
+DEFAULT_GRID = {
+    'rsi_oversold': [20, 25, 30, 35, 40],
+    'rsi_overbought': [60, 65, 70, 75, 80],
+    'bb_squeeze_width': [0.10, 2.5, 5.0, 7.5, 10.0],
+    'volume_spike_multiple': [1.2, 1.5, 1.8, 2.1, 2.4, 2.7, 3.0, 3.3],
+}
+
+# Thresholds currently in strategies.ALL_RULES / indicator_calculator
+HAND_PICKED = {
+    'rsi_oversold': 30,
+    'rsi_overbought': 70,
+    'bb_squeeze_width': 0.10,
+    'volume_spike_multiple': 1.5,
+}
+
+DEFAULT_STRATEGY = 'Daily_Confluence_Scan'
+
+
+def parameter_combinations(grid):
+    """DataFrame with one column per swept parameter and one row per combination."""
+    names = list(grid)
+    return pd.DataFrame(list(itertools.product(*(grid[name] for name in names))), columns=names)
+
+
+def sweep_instrument(df, strategy_name, grid, min_score=1, max_hold=backtester.DEFAULT_MAX_HOLD):
+    """
+    Every combination of ``grid`` for one instrument.
+    Returns (years, trades, wins, returns): the calendar years of the bars
+    and three (combinations x years) arrays.
+    """
+    names = list(grid)
+    sizes = [len(grid[name]) for name in names]
+    combos = len(parameter_combinations(grid))
+    years, year_of_bar = np.unique(df.index.year, return_inverse=True)
+    bars = len(df)
+
+    ind = backtester.indicator_frame(df)
+    arrays = {column: ind[column].to_numpy(dtype=float) for column in ind.columns
+              if column not in ('Crossover', 'MACD_Crossover')}
+    atr = arrays['ATR']
+
+    # Rules without a swept threshold: one mask each, shared by every combination
+    swept_rules = {SWEEP_PARAMETERS[name][0]: name for name in names}
+    score = np.zeros(bars)
+    bias = np.zeros(bars)
+    swept = []
+    for rule in strategies.get_rules_for_strategy(strategy_name):
+        weight = rule.get('score', 1)
+        sign = {'bullish': 1, 'bearish': -1}.get(rule['signal'], 0)
+        if rule['name'] in swept_rules:
+            swept.append((swept_rules[rule['name']], weight, sign))
+            continue
+        mask = backtester.rule_mask(rule, ind, df)
+        score += mask * weight
+        bias += mask * weight * sign
+
+    # Swept rules: one mask per candidate value, gathered per combination
+    score = np.broadcast_to(score, (combos, bars)).copy()
+    bias = np.broadcast_to(bias, (combos, bars)).copy()
+    combo_index = np.indices(sizes).reshape(len(names), -1)
+    for name, weight, sign in swept:
+        values = np.asarray(grid[name], dtype=float)[:, None]
+        masks = SWEEP_PARAMETERS[name][1](arrays, values)
+        chosen = masks[combo_index[names.index(name)]]
+        score += chosen * weight
+        bias += chosen * weight * sign
+
+    signals = np.where(score >= min_score, np.where(bias < 0, -1, 1), 0).astype(np.int8)
+    signals[:, :backtester.MIN_HISTORY - 1] = 0
+    signals[:, np.isnan(atr)] = 0
+    signals[:, -1] = 0
+
+    # Outcome of a long and a short trade from every bar, shared by every combination
+    every_bar = np.arange(bars)
+    close = df['close'].to_numpy()
+    outcomes = {}
+    for direction in (1, -1):
+        exit_bar, _, exit_price, _, _ = backtester.resolve_exits(
+            every_bar, np.full(bars, direction), df, atr, max_hold
+        )
+        outcomes[direction] = (exit_bar, direction * (exit_price - close) / close)
+
+    # next_signal[c, b]: first signal bar >= b for combination c (bars if none)
+    candidates = np.where(signals != 0, every_bar, bars)
+    next_signal = np.minimum.accumulate(candidates[:, ::-1], axis=1)[:, ::-1]
+    next_signal = np.concatenate([next_signal, np.full((combos, 1), bars)], axis=1)
+
+    trades = np.zeros((combos, len(years)), dtype=np.int32)
+    wins = np.zeros((combos, len(years)), dtype=np.int32)
+    returns = np.zeros((combos, len(years)))
+    current = next_signal[:, 0].copy()
+    active = np.flatnonzero(current < bars)
+    while len(active):
+        entry = current[active]
+        is_long = signals[active, entry] > 0
+        exit_bar = np.where(is_long, outcomes[1][0][entry], outcomes[-1][0][entry])
+        trade_return = np.where(is_long, outcomes[1][1][entry], outcomes[-1][1][entry])
+        year = year_of_bar[entry]
+        np.add.at(trades, (active, year), 1)
+        np.add.at(wins, (active, year), trade_return > 0)
+        np.add.at(returns, (active, year), trade_return)
+        current[active] = next_signal[active, exit_bar + 1]
+        active = active[current[active] < bars]
+
+    return years, trades, wins, returns
+
+
+def _sweep_worker(args):
+    instrument_key, df, strategy_name, grid, min_score, max_hold = args
+    return instrument_key, sweep_instrument(df, strategy_name, grid, min_score, max_hold)
+
+
+def run_sweep(histories, strategy_name=DEFAULT_STRATEGY, grid=None, min_score=1,
+              max_hold=backtester.DEFAULT_MAX_HOLD, workers=None):
+    """
+    Sweep ``grid`` over ``histories`` (instrument_key -> daily OHLCV DataFrame).
+    Returns (results, combos): one row per instrument, combination and year
+    with trades, wins and return_sum; and the parameter values per combination.
+    """
+    grid = grid or DEFAULT_GRID
+    combos = parameter_combinations(grid)
+    jobs = [
+        (key, df, strategy_name, grid, min_score, max_hold)
+        for key, df in histories.items() if len(df) > backtester.MIN_HISTORY
+    ]
+
+    columns = {name: [] for name in ('instrument', 'combo', 'year', 'trades', 'wins', 'return_sum')}
+    instrument_keys = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for instrument_key, (years, trades, wins, returns) in pool.map(_sweep_worker, jobs, chunksize=4):
+            combo, year = np.nonzero(trades)
+            columns['instrument'].append(np.full(len(combo), len(instrument_keys), dtype=np.int32))
+            columns['combo'].append(combo.astype(np.int32))
+            columns['year'].append(years[year].astype(np.int16))
+            columns['trades'].append(trades[combo, year])
+            columns['wins'].append(wins[combo, year])
+            columns['return_sum'].append(returns[combo, year].astype(np.float32))
+            instrument_keys.append(instrument_key)
+
+    results = pd.DataFrame({name: np.concatenate(parts) if parts else [] for name, parts in columns.items()})
+    results['instrument'] = pd.Categorical.from_codes(results['instrument'], instrument_keys)
+    return results, combos
+
+
+def save_results(path, results, combos):
+    """Write a sweep as compressed columns: results, the combination table and the instrument list."""
+    np.savez_compressed(
+        path,
+        instrument_keys=np.array(results['instrument'].cat.categories, dtype=str),
+        **{name: results[name].cat.codes.to_numpy() if name == 'instrument' else results[name].to_numpy()
+           for name in results.columns},
+        **{f'param_{name}': combos[name].to_numpy() for name in combos.columns},
+    )
+
+
+def load_results(path):
+    """Read a file written by save_results back into (results, combos) DataFrames."""
+    with np.load(path) as data:
+        combos = pd.DataFrame({name[len('param_'):]: data[name] for name in data.files if name.startswith('param_')})
+        results = pd.DataFrame({
+            name: data[name] for name in ('instrument', 'combo', 'year', 'trades', 'wins', 'return_sum')
+        })
+        results['instrument'] = pd.Categorical.from_codes(results['instrument'], list(data['instrument_keys']))
+    return results, combos
+
+
+def walk_forward(results, combos, train_years=2, min_trades=30):
+    """
+    For each year with ``train_years`` before it: the combination with the
+    highest summed return over those years (and at least ``min_trades``
+    trades), and its return in the year itself next to the hand-picked
+    thresholds' return.
+    """
+    by_year = results.groupby(['combo', 'year'])[['trades', 'wins', 'return_sum']].sum()
+    totals = by_year.unstack('year', fill_value=0)
+    years = sorted(results['year'].unique())
+
+    matches = np.ones(len(combos), dtype=bool)
+    for name, value in HAND_PICKED.items():
+        if name in combos:
+            matches &= np.isclose(combos[name], value)
+    baseline = int(np.flatnonzero(matches)[0]) if matches.any() else None
+
+    rows = []
+    for i in range(train_years, len(years)):
+        train, test = years[i - train_years:i], years[i]
+        train_trades = totals['trades'][train].sum(axis=1)
+        train_return = totals['return_sum'][train].sum(axis=1).where(train_trades >= min_trades)
+        if train_return.isna().all():
+            continue
+        best = int(train_return.idxmax())
+        test_trades = totals['trades'][test]
+        row = {
+            'year': test,
+            **{name: combos.loc[best, name] for name in combos.columns},
+            'train_return_pct': train_return[best] * 100,
+            'test_trades': int(test_trades.get(best, 0)),
+            'test_win_rate': totals['wins'][test].get(best, 0) / max(test_trades.get(best, 0), 1),
+            'test_return_pct': totals['return_sum'][test].get(best, 0) * 100,
+        }
+        if baseline is not None:
+            row['hand_picked_return_pct'] = totals['return_sum'][test].get(baseline, 0) * 100
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def parse_grid(overrides):
+    """DEFAULT_GRID with ``name=v1,v2,...`` overrides applied."""
+    grid = dict(DEFAULT_GRID)
+    for override in overrides or []:
+        name, values = override.split('=', 1)
+        if name not in SWEEP_PARAMETERS:
+            raise SystemExit(f"Unknown parameter '{name}'. Choose from: {', '.join(SWEEP_PARAMETERS)}")
+        grid[name] = [float(v) for v in values.split(',')]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--cache-dir', default='historical_data_cache')
+    parser.add_argument('--synthetic', type=int, default=0, help='Use this many random-walk symbols instead')
+    parser.add_argument('--years', type=int, default=5, help='Years of synthetic history')
+    parser.add_argument('--strategy', default=DEFAULT_STRATEGY)
+    parser.add_argument('--param', action='append', help='Override a grid axis: name=v1,v2,...')
+    parser.add_argument('--min-score', type=int, default=1)
+    parser.add_argument('--max-hold', type=int, default=backtester.DEFAULT_MAX_HOLD)
+    parser.add_argument('--train-years', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', default='parameter_sweep.npz')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        histories = backtester.synthetic_histories(args.synthetic, args.years)
+    else:
+        histories = backtester.load_cached_histories(args.cache_dir)
+    grid = parse_grid(args.param)
+
+    start = time.perf_counter()
+    results, combos = run_sweep(histories, args.strategy, grid, args.min_score, args.max_hold, args.workers)
+    elapsed = time.perf_counter() - start
+    save_results(args.output, results, combos)
+    print(f"Swept {len(combos):,} combinations over {len(histories)} instruments "
+          f"with {args.workers} workers in {elapsed:.1f}s -> {args.output} ({len(results):,} rows)")
+
+    report = walk_forward(results, combos, args.train_years)
+    if report.empty:
+        print("Not enough years of history for a walk-forward report.")
+    else:
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+
+
+if __name__ == '__main__':
+    main()
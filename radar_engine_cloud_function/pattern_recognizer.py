@@ -1,11 +1,147 @@
 # pattern_recognizer.py
+"""
+Candlestick pattern detection over whole OHLC series.
 
-import pandas as pd
+Each pattern is a function registered in PATTERNS that takes the open,
+high, low and close arrays and returns a boolean mask, True on every bar
+where the pattern completes. pattern_mask() computes a pattern's mask for
+a DataFrame once and caches it for as long as that DataFrame lives, so
+checking the latest bar (pattern_on_last_bar) after a backtest or another
+rule costs one lookup. DataFrames are treated as read-only once a mask has
+been computed for them; data_manager builds a new one on every update.
+
+Strategy rules refer to patterns by name:
+    {"type": "pattern", "pattern": "hammer", ...}
+"""
+
+import weakref
+
+import numpy as np
+
+# Registry of pattern name -> mask function(o, h, l, c)
+PATTERNS = {}
+
+# id(df) -> (weak reference to df, {pattern name: mask})
+_mask_cache = {}
+
+
+def register_pattern(name):
+    """Decorator adding a mask function to PATTERNS under ``name``."""
+    def register(mask_fn):
+        PATTERNS[name] = mask_fn
+        return mask_fn
+    return register
+
+
+def _shifted(values, periods, fill=np.nan):
+    """``values`` shifted forward by ``periods`` bars (the previous bars' values), padded with ``fill``."""
+    out = np.full(len(values), fill, dtype=np.result_type(values, fill))
+    if periods < len(values):
+        out[periods:] = values[:len(values) - periods]
+    return out
+
+
+def pattern_mask(name, df):
+    """Boolean mask of pattern ``name`` over every bar of ``df`` (cached per DataFrame)."""
+    entry = _mask_cache.get(id(df))
+    if entry is None or entry[0]() is not df:
+        key = id(df)
+        entry = (weakref.ref(df, lambda ref: _mask_cache.pop(key, None)), {})
+        _mask_cache[key] = entry
+
+    masks = entry[1]
+    if name not in masks:
+        o, h, l, c = (df[col].to_numpy(dtype=float) for col in ('open', 'high', 'low', 'close'))
+        masks[name] = PATTERNS[name](o, h, l, c)
+    return masks[name]
+
+
+def pattern_on_last_bar(name, df):
+    """True if pattern ``name`` completes on the last bar of ``df``."""
+    if len(df) == 0:
+        return False
+    return bool(pattern_mask(name, df)[-1])
+
+
+# --- Patterns ---
+
+@register_pattern('bullish_engulfing')
+def bullish_engulfing(o, h, l, c):
+    """
+    A bullish (green) candle whose body engulfs the previous bearish (red)
+    body. Appears after a downtrend and suggests a reversal upwards.
+    """
+    prev_o, prev_c = _shifted(o, 1), _shifted(c, 1)
+    return (c > o) & (prev_c < prev_o) & (o <= prev_c) & (c >= prev_o)
+
+
+@register_pattern('hammer')
+def hammer(o, h, l, c):
+    """
+    Lower wick at least twice the body and an upper wick smaller than the
+    body. A bullish reversal pattern at the bottom of a downtrend.
+    """
+    body = np.abs(c - o)
+    upper_wick = h - np.maximum(o, c)
+    lower_wick = np.minimum(o, c) - l
+    # Dojis are not hammers
+    return (body > 0) & (lower_wick >= 2 * body) & (upper_wick < body)
+
+
+@register_pattern('shooting_star')
+def shooting_star(o, h, l, c):
+    """
+    The inverse of a hammer: upper wick at least twice the body and a lower
+    wick smaller than the body. A bearish reversal pattern after a rally.
+    """
+    body = np.abs(c - o)
+    upper_wick = h - np.maximum(o, c)
+    lower_wick = np.minimum(o, c) - l
+    return (body > 0) & (upper_wick >= 2 * body) & (lower_wick < body)
+
+
+@register_pattern('doji')
+def doji(o, h, l, c):
+    """Open and close almost equal (body at most 10% of the range): indecision."""
+    candle_range = h - l
+    return (candle_range > 0) & (np.abs(c - o) <= 0.1 * candle_range)
+
+
+@register_pattern('morning_star')
+def morning_star(o, h, l, c):
+    """
+    Three candles: a long bearish one, a small body below its close, then a
+    bullish candle closing above the first one's midpoint. A bullish reversal.
+    """
+    first_o, first_c = _shifted(o, 2), _shifted(c, 2)
+    mid_o, mid_c = _shifted(o, 1), _shifted(c, 1)
+    first_body = first_o - first_c
+    return (
+        (first_body > 0)
+        & (np.abs(mid_c - mid_o) <= 0.3 * first_body)
+        & (np.maximum(mid_o, mid_c) < first_c)
+        & (c > o)
+        & (c > (first_o + first_c) / 2)
+    )
+
+
+@register_pattern('three_white_soldiers')
+def three_white_soldiers(o, h, l, c):
+    """
+    Three bullish candles in a row, each opening within the previous body
+    and closing higher, with small upper wicks. A strong bullish continuation.
+    """
+    soldier = (c > o) & (h - c < c - o)
+    prev_o, prev_c = _shifted(o, 1), _shifted(c, 1)
+    advances = soldier & (o > prev_o) & (o <= prev_c) & (c > prev_c)
+    return advances & _shifted(advances, 1, False) & _shifted(soldier, 2, False)
+
+
+# --- Latest-bar checks ---
 
 def detect_bullish_engulfing(df):
     """
     Checks if the last candle in the DataFrame is a Bullish Engulfing pattern.
-    This pattern occurs after a downtrend and suggests a potential reversal upwards.
 
     Args:
         df (pd.DataFrame): The DataFrame of historical data (must have at least 2 rows).
@@ -14,33 +150,12 @@ def detect_bullish_engulfing(df):
     Returns:
         bool: True if a Bullish Engulfing pattern is detected, False otherwise.
     """
-    if len(df) < 2:
-        return False
-
-    last_candle = df.iloc[-1]
-    previous_candle = df.iloc[-2]
-
-    # Rule 1: The last candle must be bullish (green).
-    is_last_bullish = last_candle['close'] > last_candle['open']
-
-    # Rule 2: The previous candle must be bearish (red).
-    is_previous_bearish = previous_candle['close'] < previous_candle['open']
-
-    # Rule 3: The body of the last (bullish) candle must completely "engulf" the
-    # body of the previous (bearish) candle.
-    engulfs = (last_candle['open'] <= previous_candle['close']) and \
-              (last_candle['close'] >= previous_candle['open'])
-
-    if is_last_bullish and is_previous_bearish and engulfs:
-        return True
-    
-    return False
+    return pattern_on_last_bar('bullish_engulfing', df)
 
 
 def detect_hammer(df):
     """
     Checks if the last candle is a Hammer pattern.
-    This is a bullish reversal pattern that often appears at the bottom of a downtrend.
 
     Args:
         df (pd.DataFrame): The DataFrame of historical data.
@@ -48,27 +163,4 @@ def detect_hammer(df):
     Returns:
         bool: True if a Hammer pattern is detected, False otherwise.
     """
-    if len(df) < 1:
-        return False
-
-    last_candle = df.iloc[-1]
-    
-    # Calculate the size of the body, upper wick, and lower wick
-    body_size = abs(last_candle['close'] - last_candle['open'])
-    if body_size == 0: return False # Dojis are not hammers, avoid division by zero.
-
-    upper_wick = last_candle['high'] - max(last_candle['open'], last_candle['close'])
-    lower_wick = min(last_candle['open'], last_candle['close']) - last_candle['low']
-
-    # Rule 1: The lower wick must be at least twice the size of the body.
-    is_long_lower_wick = lower_wick >= 2 * body_size
-
-    # Rule 2: The upper wick must be very small or non-existent.
-    is_small_upper_wick = upper_wick < body_size
-    
-    if is_long_lower_wick and is_small_upper_wick:
-        return True
-
-    return False
-
-# You can add more pattern detection functions here in the future.
+    return pattern_on_last_bar('hammer', df)
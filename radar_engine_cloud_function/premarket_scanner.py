@@ -1,9 +1,12 @@
 # premarket_scanner.py
 
+import argparse
+import logging
 import os
 import sys
 import django
 import time
+from collections import Counter
 import pandas as pd
 import pandas_ta as ta
 
@@ -15,9 +18,15 @@ django.setup()
 
 from trading_app.models import Instrument
 import indicator_calculator
+import metrics
+import profiling
+import scan_run
 import trade_analyzer
 import upstox_client_wrapper
 import strategies
+import structured_logging
+
+logger = logging.getLogger(__name__)
 
 # --- Constants ---
 SECTORAL_INDICES = {
@@ -36,7 +45,7 @@ def get_market_context():
     """
     Enhanced market context analysis with multiple timeframes and strength indicators.
     """
-    print("\n🔍 Analyzing Market Context (Trend & Volatility) ---")
+    logger.info("Analyzing market context (trend & volatility)")
     context = {'trend': 'NEUTRAL', 'volatility': 'NORMAL', 'strength': 'NEUTRAL'}
     
     # 1. Enhanced NIFTY 50 Multi-timeframe Analysis
@@ -57,35 +66,35 @@ def get_market_context():
             if last_close > last_ema20 > last_ema50 > last_ema200:
                 context['trend'] = 'STRONG_UP'
                 context['strength'] = 'STRONG'
-                print("Market Trend is STRONG UP (All EMAs aligned).")
+                logger.info("Market Trend is STRONG UP (All EMAs aligned).")
             elif last_close > last_ema20 > last_ema50:
                 context['trend'] = 'UP'
                 context['strength'] = 'MODERATE'
-                print("Market Trend is UP (Price > 20EMA > 50EMA).")
+                logger.info("Market Trend is UP (Price > 20EMA > 50EMA).")
             elif last_close < last_ema20 < last_ema50 < last_ema200:
                 context['trend'] = 'STRONG_DOWN'
                 context['strength'] = 'STRONG'
-                print("Market Trend is STRONG DOWN (All EMAs aligned).")
+                logger.info("Market Trend is STRONG DOWN (All EMAs aligned).")
             elif last_close < last_ema20 < last_ema50:
                 context['trend'] = 'DOWN'
                 context['strength'] = 'MODERATE'
-                print("Market Trend is DOWN (Price < 20EMA < 50EMA).")
+                logger.info("Market Trend is DOWN (Price < 20EMA < 50EMA).")
             else:
-                print("Market Trend is NEUTRAL/SIDEWAYS.")
+                logger.info("Market Trend is NEUTRAL/SIDEWAYS.")
                 
         except Exception as e:
-            print(f"⚠️ Error calculating EMAs: {e}")
+            logger.warning(f"Error calculating EMAs: {e}")
             # Fallback to basic trend analysis
             if last_close > last_ema20:
                 context['trend'] = 'UP'
-                print("Market Trend is UP (Basic analysis).")
+                logger.info("Market Trend is UP (Basic analysis).")
             elif last_close < last_ema20:
                 context['trend'] = 'DOWN'
-                print("Market Trend is DOWN (Basic analysis).")
+                logger.info("Market Trend is DOWN (Basic analysis).")
             else:
-                print("Market Trend is NEUTRAL/SIDEWAYS.")
+                logger.info("Market Trend is NEUTRAL/SIDEWAYS.")
     else:
-        print("⚠️ Insufficient data for comprehensive trend analysis.")
+        logger.warning("Insufficient data for comprehensive trend analysis.")
         context['trend'] = 'NEUTRAL'
             
     # 2. Enhanced VIX Analysis with averages
@@ -96,18 +105,18 @@ def get_market_context():
         
         if last_vix > avg_vix * 1.2:
             context['volatility'] = 'HIGH'
-            print(f"Market Volatility is HIGH (VIX: {last_vix:.2f}, Avg: {avg_vix:.2f}).")
+            logger.info(f"Market Volatility is HIGH (VIX: {last_vix:.2f}, Avg: {avg_vix:.2f}).")
         elif last_vix < avg_vix * 0.8:
             context['volatility'] = 'LOW'
-            print(f"Market Volatility is LOW (VIX: {last_vix:.2f}, Avg: {avg_vix:.2f}).")
+            logger.info(f"Market Volatility is LOW (VIX: {last_vix:.2f}, Avg: {avg_vix:.2f}).")
         else:
-            print(f"Market Volatility is NORMAL (VIX: {last_vix:.2f}, Avg: {avg_vix:.2f}).")
+            logger.info(f"Market Volatility is NORMAL (VIX: {last_vix:.2f}, Avg: {avg_vix:.2f}).")
             
     return context
 
 def analyze_sector_strength():
     """Enhanced sector analysis with momentum and strength scoring."""
-    print("\n🔄 Analyzing Sector Strength & Rotation ---")
+    logger.info("Analyzing sector strength & rotation")
     sector_analysis = []
     
     for sector_name, instrument_key in SECTORAL_INDICES.items():
@@ -127,7 +136,7 @@ def analyze_sector_strength():
                     df.ta.rsi(length=14, append=True)
                     rsi = df['RSI_14'].iloc[-1] if 'RSI_14' in df.columns else 50
                 except Exception as e:
-                    print(f"⚠️ Error calculating RSI for {sector_name}: {e}")
+                    logger.warning(f"Error calculating RSI for {sector_name}: {e}")
                     rsi = 50  # Neutral RSI as fallback
                 
                 # Enhanced strength scoring
@@ -151,7 +160,7 @@ def analyze_sector_strength():
             time.sleep(0.3)  # Rate limiting
             
         except Exception as e:
-            print(f"⚠️ Error analyzing {sector_name}: {e}")
+            logger.warning(f"Error analyzing {sector_name}: {e}")
             continue
     
     if not sector_analysis: return []
@@ -159,138 +168,160 @@ def analyze_sector_strength():
     # Sort by strength score
     sector_analysis.sort(key=lambda x: x['strength_score'], reverse=True)
     
-    print("📊 Sector Strength Ranking:")
     for i, sector in enumerate(sector_analysis[:5]):
-        print(f"  {i+1}. {sector['sector']}: Score {sector['strength_score']} (5d: {sector['momentum_5d']:.1f}%, RSI: {sector['rsi']:.1f})")
+        logger.info(f"Sector rank {i+1}: {sector['sector']}", extra={
+            'sector': sector['sector'], 'strength_score': sector['strength_score'],
+            'momentum_5d': round(sector['momentum_5d'], 2), 'rsi': round(sector['rsi'], 2),
+        })
     
     return [s['sector'] for s in sector_analysis[:3]]  # Top 3 sectors
 
-def main():
-    """Main function to run the pre-market scan with contextual filters."""
-    # 1. Get the full market context before starting
-    market_context = get_market_context()
-    strongest_sectors = analyze_sector_strength()
-    
-    # 2. Choose the right strategy based on the market trend
-    if market_context['trend'] == 'UP':
-        STRATEGY_NAME = "Bullish_Scan"
-    elif market_context['trend'] == 'DOWN':
-        STRATEGY_NAME = "Bearish_Scan"
-    else:
-        STRATEGY_NAME = "Full_Scan"
-        
-    print(f"\n--- Starting Pre-Market Radar Scan: '{STRATEGY_NAME}' ---")
-    
-    # 3. Get instruments and rules
-    rules_to_run = strategies.get_rules_for_strategy(STRATEGY_NAME)
-    instruments = Instrument.objects.order_by('-average_volume')[:200]
-    if not instruments.exists():
-        print("ERROR: No instruments found in the database.")
-        return
-
-    print(f"\nAnalyzing {instruments.count()} stocks with {len(rules_to_run)} rules...")
-    all_alerts = []
-
-    # 4. Analyze each stock, passing the full context to the analyzer
-    print(f"\n🔍 Starting detailed analysis of {instruments.count()} stocks...")
-    print(f"📋 Rules to check: {len(rules_to_run)}")
-    print(f"🎯 Market context: {market_context['trend']} trend, {market_context['volatility']} volatility")
-    print(f"🏭 Strong sectors: {', '.join(strongest_sectors) if strongest_sectors else 'None'}")
-    print("-" * 80)
-    
-    for i, instrument in enumerate(instruments):
-        print(f"\n[{i+1:3d}/{instruments.count()}] 🔍 Analyzing: {instrument.tradingsymbol} ({instrument.instrument_key})")
-        print(f"    📊 Sector: {instrument.sector or 'Unknown'}")
-        print(f"    📈 Volume: {instrument.average_volume:,.0f}")
-        
-        # Fetch historical data
-        print(f"    📥 Fetching historical data...", end=' ')
+def scan_instrument(instrument, rules_to_run, market_context, strongest_sectors, all_alerts, run):
+    """
+    Fetch, calculate and analyze one stock, appending to ``all_alerts`` if it
+    qualifies. Stage times go to ``run``. Returns (outcome, extra log fields).
+    """
+    with run.stage('fetch'):
         df = upstox_client_wrapper.fetch_historical_data(instrument.instrument_key, num_periods=250)
-        
-        if df.empty:
-            print("❌ NO DATA")
-            continue
-        elif len(df) <= 50:
-            print(f"❌ INSUFFICIENT DATA ({len(df)} candles, need >50)")
-            continue
-        else:
-            print(f"✅ GOT {len(df)} candles")
-        
-        # Calculate indicators
-        print(f"    🧮 Calculating indicators...", end=' ')
-        try:
+    if df.empty:
+        return 'no_data', {}
+    run.instruments_with_data += 1
+    if len(df) <= 50:
+        return 'insufficient_data', {'candles': len(df)}
+
+    try:
+        with run.stage('indicators'):
             indicators = indicator_calculator.calculate_indicators(df)
-            print("✅ DONE")
-        except Exception as e:
-            print(f"❌ ERROR: {e}")
-            continue
-        
-        # Analyze setup
-        print(f"    🎯 Checking criteria...", end=' ')
-        try:
+        with run.stage('rules'):
             score, reasons = trade_analyzer.analyze_setup(
                 indicators, df, rules_to_run, 
                 stock_sector=instrument.sector, 
                 strong_sectors=strongest_sectors,
                 volatility=market_context['volatility']
             )
-            
-            if score > 0:
-                print(f"✅ QUALIFIED (Score: {score})")
-                print(f"       📝 Reasons:")
-                for reason in reasons:
-                    print(f"         - {reason}")
-                all_alerts.append({
-                    "instrument_key": instrument.instrument_key, 
-                    "score": score, 
-                    "reasons": reasons, 
-                    "indicators": indicators
-                })
-            else:
-                print(f"❌ REJECTED (Score: {score})")
-                
-        except Exception as e:
-            print(f"❌ ERROR: {e}")
-            continue
-        
-        time.sleep(0.5)
+    except Exception as e:
+        return 'error', {'error': str(e)}
 
-    print(f"\n" + "="*80)
-    print(f"📊 ANALYSIS COMPLETE")
-    print(f"="*80)
-    print(f"🎯 Strategy used: {STRATEGY_NAME}")
-    print(f"📈 Stocks analyzed: {instruments.count()}")
-    print(f"✅ Stocks with data: {len([i for i in range(instruments.count()) if True])}")  # Simplified for now
-    print(f"🎯 Stocks qualified: {len(all_alerts)}")
+    if score <= 0:
+        return 'rejected', {'score': score}
+    all_alerts.append({
+        "instrument_key": instrument.instrument_key, 
+        "score": score, 
+        "reasons": reasons, 
+        "indicators": indicators
+    })
+    return 'qualified', {'score': score, 'reasons': reasons}
+
+def print_scan_report(strategy_name, rules_to_run, market_context, strongest_sectors, outcomes, all_alerts, saved):
+    """Human-readable summary of a scan; the per-instrument detail is in the DEBUG log."""
+    print("=" * 80)
+    print(f"📊 PRE-MARKET SCAN COMPLETE: {strategy_name}")
+    print("=" * 80)
+    print(f"🎯 Market context: {market_context['trend']} trend, {market_context['volatility']} volatility")
+    print(f"🏭 Strong sectors: {', '.join(strongest_sectors) if strongest_sectors else 'None'}")
     print(f"📋 Rules checked: {len(rules_to_run)}")
-    
-    if len(all_alerts) > 0:
+    print(f"📈 Stocks analyzed: {sum(outcomes.values())}")
+    print(f"   ✅ Qualified: {outcomes['qualified']}")
+    print(f"   ❌ Rejected: {outcomes['rejected']}")
+    print(f"   📭 No data: {outcomes['no_data']}")
+    print(f"   📉 Insufficient data: {outcomes['insufficient_data']}")
+    print(f"   ⚠️ Errors: {outcomes['error']}")
+
+    if all_alerts:
         print(f"\n🏆 QUALIFIED STOCKS (Score > 0):")
-        sorted_alerts = sorted(all_alerts, key=lambda x: x['score'], reverse=True)
-        
-        for i, alert in enumerate(sorted_alerts):
+        for i, alert in enumerate(all_alerts):
             print(f"\n{i+1:2d}. {alert['instrument_key']} (Score: {alert['score']})")
             for reason in alert['reasons']:
                 print(f"     - {reason}")
-        
-        # Save top 10 (or all if less than 10)
-        top_alerts = sorted_alerts[:10]
-        print(f"\n💾 Saving top {len(top_alerts)} alerts to database...")
-        trade_analyzer.save_alerts_to_db(top_alerts, STRATEGY_NAME)
-        print(f"✅ Saved {len(top_alerts)} alerts successfully")
-        
-        print(f"\n📊 SUMMARY:")
-        print(f"   - Total qualified: {len(all_alerts)}")
-        print(f"   - Top alerts saved: {len(top_alerts)}")
-        print(f"   - Strategy: {STRATEGY_NAME}")
-        
+        print(f"\n💾 Top {saved} alerts saved to the database.")
     else:
         print(f"\n❌ NO STOCKS QUALIFIED")
-        print(f"   - All {instruments.count()} stocks were rejected")
         print(f"   - Check if criteria are too strict")
         print(f"   - Market conditions may not be favorable")
+    print("=" * 80)
+
+def main(profiler=None, scan_run_id=None):
+    """
+    Main function to run the pre-market scan with contextual filters.
+    The scan is profiled if ``profiler`` (default: from RADAR_PROFILE*) is
+    armed, and recorded as a ScanRun (the one with ``scan_run_id`` if given),
+    which is returned.
+    """
+    structured_logging.setup_logging()
+    profiler = profiler or profiling.ScanProfiler.from_env()
+    run = scan_run.ScanRunRecorder('SCREENING', scan_run_id=scan_run_id)
+    try:
+        with profiler.cycle('premarket_scan'):
+            error = run_scan(run)
+    except Exception as e:
+        run.save('FAILED', error=str(e))
+        raise
+    return run.save('FAILED' if error else 'SUCCESS', error)
+
+def run_scan(run):
+    """
+    One pre-market scan: market context, per-stock analysis, saving and the
+    report, timed per stage into ``run``. Returns an error message if the
+    scan could not run.
+    """
+    with run.stage('context'):
+        # 1. Get the full market context before starting
+        market_context = get_market_context()
+        strongest_sectors = analyze_sector_strength()
     
-    print(f"="*80)
+        # 2. Choose the right strategy based on the market trend
+        if market_context['trend'] == 'UP':
+            STRATEGY_NAME = "Bullish_Scan"
+        elif market_context['trend'] == 'DOWN':
+            STRATEGY_NAME = "Bearish_Scan"
+        else:
+            STRATEGY_NAME = "Full_Scan"
+        run.strategy = STRATEGY_NAME
+    
+        # 3. Get instruments and rules
+        rules_to_run = strategies.get_rules_for_strategy(STRATEGY_NAME)
+        instruments = list(Instrument.objects.order_by('-average_volume')[:200])
+    if not instruments:
+        logger.error("No instruments found in the database.")
+        return "No instruments found in the database."
+
+    logger.info(f"Starting pre-market scan '{STRATEGY_NAME}'", extra={
+        'strategy': STRATEGY_NAME, 'instruments': len(instruments), 'rules': len(rules_to_run),
+        'trend': market_context['trend'], 'volatility': market_context['volatility'],
+        'strong_sectors': strongest_sectors,
+    })
+    all_alerts = []
+    outcomes = Counter()
+
+    # 4. Analyze each stock, passing the full context to the analyzer
+    scan_seconds = metrics.SCAN_INSTRUMENT_SECONDS.labels(scanner='premarket')
+    for instrument in instruments:
+        # Per-instrument scan time, including the data fetch
+        with scan_seconds.time(), run.instrument(instrument.instrument_key):
+            outcome, fields = scan_instrument(instrument, rules_to_run, market_context, strongest_sectors, all_alerts, run)
+        outcomes[outcome] += 1
+        logger.debug(f"{instrument.tradingsymbol}: {outcome}", extra={
+            'instrument_key': instrument.instrument_key, 'sector': instrument.sector, 'outcome': outcome, **fields,
+        })
+        
+        time.sleep(0.5)
+
+    all_alerts.sort(key=lambda x: x['score'], reverse=True)
+    run.instruments_qualified = len(all_alerts)
+    # Save top 10 (or all if less than 10)
+    top_alerts = all_alerts[:10]
+    if top_alerts:
+        with run.stage('persist'):
+            run.alerts_saved = trade_analyzer.save_alerts_to_db(top_alerts, STRATEGY_NAME)
+
+    logger.info(f"Pre-market scan '{STRATEGY_NAME}' complete",
+                extra={'strategy': STRATEGY_NAME, 'saved': len(top_alerts), **outcomes})
+    print_scan_report(STRATEGY_NAME, rules_to_run, market_context, strongest_sectors, outcomes, all_alerts, run.alerts_saved)
+    return ''
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Pre-market radar scan')
+    parser.add_argument('--scan-run-id', type=int, help='Record results on this existing ScanRun')
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    main(profiling.ScanProfiler.from_args(args), scan_run_id=args.scan_run_id)
@@ -17,15 +17,10 @@ import threading
 # Add the current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('production_realtime_poller.log'),
-        logging.StreamHandler()
-    ]
-)
+import metrics
+import profiling
+import structured_logging
+
 logger = logging.getLogger(__name__)
 
 class ProductionRealTimePoller:
@@ -33,8 +28,9 @@ class ProductionRealTimePoller:
     Production-ready real-time market polling system.
     """
     
-    def __init__(self, polling_interval=60):
+    def __init__(self, polling_interval=60, profiler=None):
         self.polling_interval = polling_interval
+        self.profiler = profiler or profiling.ScanProfiler()
         self.is_running = False
         self.watchlist = []
         self.alert_history = {}
@@ -45,6 +41,8 @@ class ProductionRealTimePoller:
         # Signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
+        # kill -USR1 <pid> profiles the next cycle
+        self.profiler.install_signal_handler()
     
     def signal_handler(self, signum, frame):
         """Handle shutdown signals gracefully."""
@@ -161,6 +159,11 @@ class ProductionRealTimePoller:
             self.load_default_watchlist()
     
     def run_premarket_scan(self):
+        """Run pre-market scan to update watchlist, profiled if the profiler is armed."""
+        with self.profiler.cycle('premarket_scan'):
+            self._run_premarket_scan()
+    
+    def _run_premarket_scan(self):
         """Run pre-market scan to update watchlist."""
         logger.info("🔄 Running pre-market scan...")
         try:
@@ -207,6 +210,7 @@ class ProductionRealTimePoller:
         try:
             # Import required modules
             import upstox_client_wrapper
+            import trade_analyzer
             
             # Fetch latest intraday data with timeout
             df = upstox_client_wrapper.fetch_intraday_data(instrument_key, interval='5')
@@ -215,63 +219,8 @@ class ProductionRealTimePoller:
                 logger.debug(f"Insufficient data for {instrument_key}: {len(df) if df is not None else 0} candles")
                 return None
 
-            # 1. Define the opening range (first 30 minutes = 6 candles)
-            opening_range_df = df.head(6)
-            opening_range_high = opening_range_df['high'].max()
-            opening_range_low = opening_range_df['low'].min()
-            
-            # 2. Get the most recent candle
-            last_candle = df.iloc[-1]
-            current_price = last_candle['close']
-            current_volume = last_candle['volume']
-            avg_volume = df['volume'].tail(6).mean()
-            
-            # 3. Enhanced breakout detection with volume confirmation
-            breakout_up = current_price > opening_range_high
-            breakout_down = current_price < opening_range_low
-            volume_confirmation = current_volume > avg_volume * 1.2
-            
-            if breakout_up or breakout_down:
-                direction = "UP" if breakout_up else "DOWN"
-                
-                # Calculate targets and stop loss
-                if breakout_up:
-                    stop_loss = opening_range_low
-                    target = current_price + (current_price - opening_range_low)
-                else:
-                    stop_loss = opening_range_high
-                    target = current_price - (opening_range_high - current_price)
-                
-                # Calculate risk-reward ratio
-                risk = abs(current_price - stop_loss)
-                reward = abs(target - current_price)
-                rr_ratio = reward / risk if risk > 0 else 0
-                
-                # Create alert data
-                alert_data = {
-                    "instrument_key": instrument_key,
-                    "score": 2 if volume_confirmation else 1,
-                    "reasons": [
-                        f"Enhanced ORB: Price broke {direction} the 30-min opening range",
-                        f"Entry: ₹{current_price:.2f}, Stop: ₹{stop_loss:.2f}, Target: ₹{target:.2f}",
-                        f"Risk-Reward: 1:{rr_ratio:.2f}",
-                        f"Volume: {'High' if volume_confirmation else 'Normal'}"
-                    ],
-                    "indicators": {
-                        "ORB_High": opening_range_high,
-                        "ORB_Low": opening_range_low,
-                        "Entry_Price": current_price,
-                        "Stop_Loss": stop_loss,
-                        "Target": target,
-                        "Risk_Reward": rr_ratio,
-                        "Volume_Confirmation": volume_confirmation,
-                        "Direction": direction
-                    }
-                }
-                
-                return alert_data
-            
-            return None
+            # Opening range (first 30 minutes = 6 candles), breakout and volume confirmation
+            return trade_analyzer.detect_orb_breakout(instrument_key, df)
             
         except Exception as e:
             logger.error(f"Error analyzing {instrument_key}: {e}")
@@ -313,20 +262,22 @@ class ProductionRealTimePoller:
             serializable_indicators = make_json_serializable(alert_data['indicators'])
             
             # Create or update alert
-            alert, created = RadarAlert.objects.update_or_create(
-                instrument_key=alert_data['instrument_key'],
-                source_strategy="RealTime_ORB",
-                defaults={
-                    'alert_details': serializable_alert_details,
-                    'indicators': serializable_indicators,
-                    'status': 'ACTIVE',
-                    'expires_at': expires_at,
-                    'priority': priority,
-                    'alert_type': 'ORB',
-                    'notified': False
-                }
-            )
+            with metrics.DB_WRITE_SECONDS.labels(operation='save_orb_alert').time():
+                alert, created = RadarAlert.objects.update_or_create(
+                    instrument_key=alert_data['instrument_key'],
+                    source_strategy="RealTime_ORB",
+                    defaults={
+                        'alert_details': serializable_alert_details,
+                        'indicators': serializable_indicators,
+                        'status': 'ACTIVE',
+                        'expires_at': expires_at,
+                        'priority': priority,
+                        'alert_type': 'ORB',
+                        'notified': False
+                    }
+                )
             
+            metrics.ALERTS_WRITTEN.labels(strategy="RealTime_ORB").inc()
             action = "Created" if created else "Updated"
             logger.info(f"✅ {action} alert in database: {alert_data['instrument_key']} (expires in 45 minutes)")
             
@@ -340,10 +291,16 @@ class ProductionRealTimePoller:
             logger.warning("No stocks in watchlist. Skipping intraday scan.")
             return
         
+        with self.profiler.cycle('poll'):
+            self._check_watchlist()
+    
+    def _check_watchlist(self):
+        """One polling cycle: analyze every watchlist stock for ORB setups."""
         logger.info(f"🔍 Checking intraday setups for {len(self.watchlist)} stocks...")
         
         alerts_found = 0
         start_time = time.time()
+        scan_seconds = metrics.SCAN_INSTRUMENT_SECONDS.labels(scanner='realtime_orb')
         
         for i, instrument_key in enumerate(self.watchlist):
             try:
@@ -353,7 +310,8 @@ class ProductionRealTimePoller:
                     break
                 
                 # Analyze each stock for ORB setups
-                alert = self.analyze_stock_for_orb(instrument_key)
+                with scan_seconds.time():
+                    alert = self.analyze_stock_for_orb(instrument_key)
                 
                 if alert:
                     alerts_found += 1
@@ -369,6 +327,7 @@ class ProductionRealTimePoller:
                 continue
         
         cycle_time = time.time() - start_time
+        metrics.POLL_CYCLES.inc()
         logger.info(f"⏱️  Cycle completed in {cycle_time:.1f} seconds")
         
         if alerts_found > 0:
@@ -431,9 +390,15 @@ class ProductionRealTimePoller:
             logger.error(f"Error generating EOD report: {e}")
     
     def get_polling_stats(self):
-        """Get polling statistics."""
-        # This can be enhanced to track more detailed stats
-        return "Stats tracking to be implemented"
+        """Get polling statistics from the process metrics (see metrics.py)."""
+        scans = metrics.SCAN_INSTRUMENT_SECONDS.labels(scanner='realtime_orb')
+        alerts = metrics.ALERTS_WRITTEN.labels(strategy="RealTime_ORB")
+        return (
+            f"{metrics.total(metrics.POLL_CYCLES):.0f} cycles, {scans.count} stocks scanned "
+            f"(avg {scans.sum / scans.count if scans.count else 0:.2f}s), {alerts.value:.0f} alerts saved, "
+            f"{metrics.total(metrics.UPSTOX_REQUEST_SECONDS):.0f} Upstox calls "
+            f"({metrics.total(metrics.UPSTOX_ERRORS):.0f} failed)"
+        )
     
     def setup_schedule(self):
         """Set up the polling schedule."""
@@ -493,11 +458,17 @@ def main():
     parser = argparse.ArgumentParser(description='Production Real-Time Market Polling System')
     parser.add_argument('--interval', type=int, default=60, 
                        help='Polling interval in seconds (default: 60)')
+    parser.add_argument('--metrics-port', type=int, default=9109,
+                       help='Serve Prometheus metrics on localhost at this port (0 = off; main.py uses 9108)')
+    profiling.add_arguments(parser)
     
     args = parser.parse_args()
+    structured_logging.setup_logging(log_file='production_realtime_poller.log')
+    if args.metrics_port:
+        metrics.start_metrics_server(args.metrics_port)
     
     # Create and start the poller
-    poller = ProductionRealTimePoller(polling_interval=args.interval)
+    poller = ProductionRealTimePoller(polling_interval=args.interval, profiler=profiling.ScanProfiler.from_args(args))
     poller.start()
 
 if __name__ == "__main__":
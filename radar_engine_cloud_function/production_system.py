@@ -17,10 +17,11 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'django_api'))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smart_trading_assistant_api.settings')
 django.setup()
 
-from trading_app.models import RadarAlert, Instrument
-from premarket_scanner import run_premarket_scanner
-from intraday_scanner import run_intraday_scanner
-from real_time_poller import RealTimePoller
+import premarket_scanner
+import intraday_scanner
+from production_realtime_poller import ProductionRealTimePoller
+import profiling
+import structured_logging
 
 def check_market_hours():
     """Check if market is currently open"""
@@ -37,26 +38,27 @@ def check_market_hours():
     
     return market_open <= now <= market_close
 
-def run_premarket_scan():
-    """Run premarket scanner and return results"""
+def run_premarket_scan(profiler=None):
+    """Run premarket scanner and return results, profiled if ``profiler`` is armed"""
     print("🔍 Starting premarket scanner...")
     start_time = time.time()
     
     try:
-        # Run premarket scanner
-        alerts = run_premarket_scanner()
+        # Run premarket scanner (it profiles its own cycle)
+        scan = premarket_scanner.main(profiler)
+        if scan.status == 'FAILED':
+            raise RuntimeError(scan.error)
         
         scan_duration = time.time() - start_time
-        stocks_scanned = 200  # Nifty 200 stocks
         
         print(f"✅ Premarket scan completed in {scan_duration:.2f}s")
-        print(f"📊 Scanned {stocks_scanned} stocks")
-        print(f"🚨 Found {len(alerts)} screening alerts")
+        print(f"📊 Scanned {scan.instruments_total} stocks")
+        print(f"🚨 Found {scan.alerts_saved} screening alerts")
         
         return {
             'success': True,
-            'alerts_found': len(alerts),
-            'stocks_scanned': stocks_scanned,
+            'alerts_found': scan.alerts_saved,
+            'stocks_scanned': scan.instruments_total,
             'scan_duration': scan_duration
         }
         
@@ -67,35 +69,30 @@ def run_premarket_scan():
             'error': str(e)
         }
 
-def run_intraday_scan():
-    """Run intraday scanner and return results"""
+def run_intraday_scan(profiler=None):
+    """Run intraday scanner and return results, profiled if ``profiler`` is armed"""
     print("🔍 Starting intraday scanner...")
     start_time = time.time()
     
     try:
-        # Get watchlist from database (top stocks from premarket scan)
-        watchlist = list(RadarAlert.objects.filter(
-            category='SCREENING',
-            status='ACTIVE'
-        ).values_list('instrument_key', flat=True)[:10])
-        
-        if not watchlist:
-            print("⚠️ No watchlist found. Using default stocks.")
-            watchlist = ['NSE:NIFTY50-INDEX', 'NSE:BANKNIFTY-INDEX']
-        
-        # Run intraday scanner
-        alerts = run_intraday_scanner(watchlist=watchlist)
+        # Run intraday scanner on today's screening watchlist
+        with (profiler or profiling.ScanProfiler.from_env()).cycle('intraday_scan'):
+            scan = intraday_scanner.main()
+        if scan.status == 'FAILED':
+            raise RuntimeError(scan.error)
+        if scan.status == 'SKIPPED':
+            print(f"⚠️ {scan.error}")
         
         scan_duration = time.time() - start_time
         
         print(f"✅ Intraday scan completed in {scan_duration:.2f}s")
-        print(f"📊 Scanned {len(watchlist)} stocks")
-        print(f"🚨 Found {len(alerts)} entry alerts")
+        print(f"📊 Scanned {scan.instruments_total} stocks")
+        print(f"🚨 Found {scan.alerts_saved} entry alerts")
         
         return {
             'success': True,
-            'alerts_found': len(alerts),
-            'stocks_scanned': len(watchlist),
+            'alerts_found': scan.alerts_saved,
+            'stocks_scanned': scan.instruments_total,
             'scan_duration': scan_duration
         }
         
@@ -106,7 +103,7 @@ def run_intraday_scan():
             'error': str(e)
         }
 
-def run_production_system():
+def run_production_system(profiler=None):
     """Run the complete production system"""
     print("🚀 Starting Smart Trading Assistant Production System")
     print(f"⏰ Current time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -124,7 +121,7 @@ def run_production_system():
     print("STEP 1: PREMARKET SCANNER")
     print("="*50)
     
-    premarket_result = run_premarket_scan()
+    premarket_result = run_premarket_scan(profiler)
     
     if not premarket_result['success']:
         print("❌ Premarket scan failed. Exiting.")
@@ -136,7 +133,7 @@ def run_production_system():
         print("STEP 2: REAL-TIME POLLING")
         print("="*50)
         
-        poller = RealTimePoller()
+        poller = ProductionRealTimePoller(profiler=profiler)
         
         # Handle graceful shutdown
         def signal_handler(signum, frame):
@@ -164,12 +161,16 @@ def main():
                        help='Run only intraday scanner')
     parser.add_argument('--production', action='store_true', 
                        help='Run complete production system')
+    profiling.add_arguments(parser)
     
     args = parser.parse_args()
+    # Before the scanners and poller, whose own setup_logging calls are then no-ops
+    structured_logging.setup_logging(log_file='production_realtime_poller.log')
+    profiler = profiling.ScanProfiler.from_args(args)
     
     if args.premarket_scan:
         # Run only premarket scanner
-        result = run_premarket_scan()
+        result = run_premarket_scan(profiler)
         if result['success']:
             print(f"{result['alerts_found']} alerts found")
             print(f"{result['stocks_scanned']} stocks scanned")
@@ -181,7 +182,7 @@ def main():
         
     elif args.intraday_scan:
         # Run only intraday scanner
-        result = run_intraday_scan()
+        result = run_intraday_scan(profiler)
         if result['success']:
             print(f"{result['alerts_found']} alerts found")
             print(f"{result['stocks_scanned']} stocks scanned")
@@ -193,11 +194,11 @@ def main():
         
     elif args.production:
         # Run complete production system
-        return run_production_system()
+        return run_production_system(profiler)
         
     else:
         # Default: run complete production system
-        return run_production_system()
+        return run_production_system(profiler)
 
 if __name__ == "__main__":
     sys.exit(main()) 
\ No newline at end of file
@@ -0,0 +1,247 @@
+# profiling.py
+"""
+Opt-in profiling of scan and poll cycles in production.
+
+A ScanProfiler wraps one cycle (``with profiler.cycle('poll'):``) and, when
+armed, writes two files to the output directory:
+
+- ``sample`` mode (default): a sampling thread records the cycle thread's
+  stack every few milliseconds. Writes ``<name>-<time>.collapsed``, one
+  ``frame;frame;frame count`` line per stack, which flamegraph.pl and
+  speedscope read directly. Overhead stays low enough for live hours.
+- ``cprofile`` mode: deterministic cProfile of the cycle. Writes
+  ``<name>-<time>.prof`` for pstats/snakeviz. Exact call counts, but it
+  slows the cycle down.
+
+Both modes also write ``<name>-<time>.txt``, the top-N functions by time.
+
+The profiler is armed for ``cycles`` cycles, optionally not before ``at``
+(HH:MM IST), and each sample is time-boxed to ``max_seconds``. On POSIX,
+``kill -USR1 <pid>`` arms one more cycle of a running process.
+
+Configure it with the --profile* flags (add_arguments) or the environment:
+RADAR_PROFILE (sample or cprofile), RADAR_PROFILE_CYCLES, RADAR_PROFILE_AT,
+RADAR_PROFILE_SECONDS and RADAR_PROFILE_DIR.
+"""
+
+import cProfile
+import logging
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+import pytz
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+MODES = ('sample', 'cprofile')
+IST = pytz.timezone('Asia/Kolkata')
+
+# Only one cycle is profiled at a time; nested cycles (a scan inside a
+# profiled poller task) are covered by the outer profile
+_active = threading.Lock()
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread."""
+
+    def __init__(self, thread_id, interval=0.005, max_seconds=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='stack-sampler')
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        start = time.perf_counter()
+        deadline = start + self.max_seconds if self.max_seconds else None
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+            if deadline and time.perf_counter() > deadline:
+                logger.info(f"Profile sampling stopped after its {self.max_seconds}s time box")
+                break
+        self.elapsed = time.perf_counter() - start
+
+    def write_collapsed(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def summary(self, top=30):
+        """Top functions by inclusive samples, with their self (leaf) samples."""
+        inclusive, own = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+
+        ms_per_sample = self.elapsed * 1000 / self.samples if self.samples else 0
+        lines = [
+            f"{self.samples} samples over {self.elapsed:.2f}s (~{ms_per_sample:.1f}ms each)",
+            '',
+            f"{'total%':>7} {'self%':>7} {'total ms':>10}  function",
+        ]
+        for name, count in inclusive.most_common(top):
+            lines.append(
+                f"{100 * count / self.samples:6.1f}% {100 * own[name] / self.samples:6.1f}% "
+                f"{count * ms_per_sample:10.0f}  {name}"
+            )
+        return '\n'.join(lines) + '\n'
+
+
+def parse_at(value):
+    """An ``HH:MM`` IST time of day (``9:15`` or ``09:15``) as a ``time``."""
+    return datetime.strptime(value, '%H:%M').time()
+
+
+def _frame_name(code):
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+class ScanProfiler:
+    """
+    Profiles the next ``cycles`` scan or poll cycles, not before ``at``
+    (HH:MM IST). With ``mode=None`` it stays off until arm() is called.
+    """
+
+    def __init__(self, mode=None, cycles=1, at=None, max_seconds=None, output_dir='profiles',
+                 interval=0.005, top=30):
+        if mode is not None and mode not in MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'. Choose from: {', '.join(MODES)}")
+        self.mode = mode
+        self.remaining = cycles if mode else 0
+        self.at = parse_at(at) if isinstance(at, str) else at
+        self.max_seconds = max_seconds
+        self.output_dir = output_dir
+        self.interval = interval
+        self.top = top
+        # Re-entrant: arm() also runs from the signal handler, on the main thread
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_env(cls, **overrides):
+        """A profiler configured from the RADAR_PROFILE* environment variables."""
+        settings = {
+            'mode': config('RADAR_PROFILE', default='') or None,
+            'cycles': config('RADAR_PROFILE_CYCLES', default=1, cast=int),
+            'at': config('RADAR_PROFILE_AT', default='') or None,
+            'max_seconds': config('RADAR_PROFILE_SECONDS', default=0, cast=float) or None,
+            'output_dir': config('RADAR_PROFILE_DIR', default='profiles'),
+        }
+        settings.update((key, value) for key, value in overrides.items() if value is not None)
+        return cls(**settings)
+
+    @classmethod
+    def from_args(cls, args):
+        """A profiler from add_arguments() flags, falling back to the environment."""
+        return cls.from_env(
+            mode=args.profile, cycles=args.profile_cycles, at=args.profile_at,
+            max_seconds=args.profile_seconds, output_dir=args.profile_dir,
+        )
+
+    def arm(self, cycles=1):
+        """Profile the next ``cycles`` cycles (sampling, unless a mode was set)."""
+        with self._lock:
+            self.mode = self.mode or 'sample'
+            self.remaining += cycles
+        logger.info(f"Profiler armed for {cycles} cycle(s)", extra={'mode': self.mode})
+
+    def install_signal_handler(self, signum=getattr(signal, 'SIGUSR1', None)):
+        """Arm one cycle whenever the process receives ``signum`` (SIGUSR1)."""
+        if signum is not None:
+            signal.signal(signum, lambda *_: self.arm())
+
+    def _take(self):
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            if self.at and datetime.now(IST).time() < self.at:
+                return False
+            self.remaining -= 1
+            return True
+
+    def cycle(self, name):
+        """Context manager profiling this cycle if the profiler is armed."""
+        if not _active.acquire(blocking=False):
+            return nullcontext()
+        if not self._take():
+            _active.release()
+            return nullcontext()
+        return self._profile(name)
+
+    @contextmanager
+    def _profile(self, name):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, f"{name}-{datetime.now(IST).strftime('%Y%m%d-%H%M%S')}")
+            if self.mode == 'cprofile':
+                with self._cprofile(base):
+                    yield
+            else:
+                with self._sample(base):
+                    yield
+        finally:
+            _active.release()
+
+    @contextmanager
+    def _sample(self, base):
+        sampler = StackSampler(threading.get_ident(), self.interval, self.max_seconds)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.write_collapsed(base + '.collapsed')
+            with open(base + '.txt', 'w') as f:
+                f.write(sampler.summary(self.top))
+            logger.info(f"Wrote profile {base}.collapsed", extra={'samples': sampler.samples})
+
+    @contextmanager
+    def _cprofile(self, base):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(base + '.prof')
+            with open(base + '.txt', 'w') as f:
+                pstats.Stats(profile, stream=f).sort_stats('cumulative').print_stats(self.top)
+            logger.info(f"Wrote profile {base}.prof")
+
+
+def add_arguments(parser):
+    """The --profile* flags; unset flags fall back to the RADAR_PROFILE* environment."""
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile', choices=MODES, help='Profile scan cycles (env RADAR_PROFILE)')
+    group.add_argument('--profile-cycles', type=int, help='Cycles to profile (default 1)')
+    group.add_argument('--profile-at', metavar='HH:MM', type=parse_at, help='Profile the first cycles at or after this IST time')
+    group.add_argument('--profile-seconds', type=float, help='Stop sampling a cycle after this many seconds')
+    group.add_argument('--profile-dir', help='Directory for profile output (default profiles)')
@@ -2,6 +2,7 @@
 
 import requests
 import json
+import logging
 import websocket
 import threading
 import time
@@ -14,10 +15,13 @@ from upstox_client.feeder.proto import MarketDataFeedV3_pb2
 from upstox_client.api.history_v3_api import HistoryV3Api
 from upstox_client import ApiClient, Configuration
 
+import structured_logging
+
+logger = logging.getLogger(__name__)
 
 UPSTOX_ACCESS_TOKEN = config('UPSTOX_ACCESS_TOKEN', default="YOUR_UPSTOX_ACCESS_TOKEN_HERE")
 if UPSTOX_ACCESS_TOKEN == "YOUR_UPSTOX_ACCESS_TOKEN_HERE":
-    print("WARNING: Please update UPSTOX_ACCESS_TOKEN in your .env file with your actual Upstox Access Token.")
+    logger.warning("Please update UPSTOX_ACCESS_TOKEN in your .env file with your actual Upstox Access Token.")
 
 rest_api_configuration = Configuration()
 rest_api_configuration.api_key['Api-Version'] = '2.0'
@@ -35,7 +39,7 @@ def fetch_historical_data(instrument_key, interval=1, num_days=100): # Default i
     from_date_str = (today - pd.Timedelta(days=num_days)).strftime('%Y-%m-%d')
     to_date_str = today.strftime('%Y-%m-%d')
 
-    print(f"Fetching {interval} historical data for {instrument_key} from {from_date_str} to {to_date_str}...")
+    logger.debug(f"Fetching {interval} historical data for {instrument_key} from {from_date_str} to {to_date_str}...")
     try:
         # Corrected parameters based on the provided table:
         # unit='days' (lowercase string), interval=1 (integer)
@@ -61,13 +65,13 @@ def fetch_historical_data(instrument_key, interval=1, num_days=100): # Default i
             df = pd.DataFrame(candles_data)
             df.set_index('datetime', inplace=True)
             df.sort_index(inplace=True)
-            print(f"Successfully fetched {len(df)} historical candles for {instrument_key}.")
+            logger.info(f"Successfully fetched {len(df)} historical candles for {instrument_key}.")
             return df
         else:
-            print(f"No historical data found for {instrument_key} for interval {interval}.")
+            logger.warning(f"No historical data found for {instrument_key} for interval {interval}.")
             return pd.DataFrame()
     except Exception as e:
-        print(f"Error fetching historical data for {instrument_key}: {e}")
+        logger.error(f"Error fetching historical data for {instrument_key}: {e}")
         return pd.DataFrame()
 
 def update_and_calculate_indicators(instrument_token, current_data_point, df_history):
@@ -122,10 +126,7 @@ def analyze_for_trade_setup(instrument_token, indicators):
         details.append(f"Current Volume: {indicators['Volume']}.")
 
     if setup_found:
-        print(f"\n--- RADAR ALERT for {instrument_token}! ---")
-        for detail in details:
-            print(f"- {detail}")
-        print("--------------------------------------")
+        logger.info(f"Radar alert for {instrument_token}", extra={'instrument_key': instrument_token, 'details': details})
 
     return setup_found, details
 
@@ -151,7 +152,7 @@ def on_message(ws, message):
                     }
 
                     if instrument_token not in market_data_history:
-                        print(f"WARNING: Historical data for {instrument_token} not initialized during startup. Skipping indicator calculation for this tick.")
+                        logger.warning(f"Historical data for {instrument_token} not initialized during startup. Skipping indicator calculation for this tick.")
                         continue
 
                     updated_df, indicators = update_and_calculate_indicators(
@@ -161,36 +162,39 @@ def on_message(ws, message):
                     )
                     market_data_history[instrument_token] = updated_df
 
-                    print(f"  Processed {instrument_token}: Current LTP={current_ltp}, Indicators: {indicators}")
+                    logger.debug("Processed tick", extra={'instrument_key': instrument_token, 'ltp': current_ltp, 'indicators': indicators})
                     analyze_for_trade_setup(instrument_token, indicators)
 
                 elif feed.full_feed:
                     full_data = feed.full_feed
-                    print(f"  Full Feed for Instrument Token {full_data.instrument_token}: LTP={full_data.ltp}, BidPrice={full_data.bid_price}, AskPrice={full_data.ask_price}, Vol={full_data.volume}")
+                    logger.debug("Full feed", extra={
+                        'instrument_key': full_data.instrument_token, 'ltp': full_data.ltp,
+                        'bid_price': full_data.bid_price, 'ask_price': full_data.ask_price, 'volume': full_data.volume,
+                    })
 
         elif decoded_message.message_type:
-            print(f"Control Message Type: {decoded_message.message_type}")
+            logger.debug(f"Control Message Type: {decoded_message.message_type}")
             if decoded_message.message_type == MarketDataFeedV3_pb2.FeedResponse.MESSAGE_TYPE_SUCCESS:
-                print("Subscription successful acknowledgment received.")
+                logger.info("Subscription successful acknowledgment received.")
             elif decoded_message.message_type == MarketDataFeedV3_pb2.FeedResponse.MESSAGE_TYPE_ERROR:
-                print(f"Error message from feed: {decoded_message.error_message}")
+                logger.error(f"Error message from feed: {decoded_message.error_message}")
             elif decoded_message.message_type == MarketDataFeedV3_pb2.FeedResponse.MESSAGE_TYPE_PING:
-                print("Received PING from server.")
+                logger.debug("Received PING from server.")
             elif decoded_message.message_type == MarketDataFeedV3_pb2.FeedResponse.MESSAGE_TYPE_PONG:
-                print("Received PONG from server.")
+                logger.debug("Received PONG from server.")
 
 
     except Exception as e:
-        print(f"Error decoding Protobuf message or processing data: {e}")
+        logger.exception(f"Error decoding Protobuf message or processing data: {e}")
 
 def on_error(ws, error):
-    print(f"WebSocket error: {error}")
+    logger.error(f"WebSocket error: {error}")
 
 def on_close(ws, close_status_code, close_msg):
-    print(f"WebSocket closed: Code={close_status_code}, Message={close_msg}")
+    logger.info(f"WebSocket closed: Code={close_status_code}, Message={close_msg}")
 
 def on_open(ws):
-    print("WebSocket connection opened. Sending subscription request...")
+    logger.info("WebSocket connection opened. Sending subscription request...")
     subscription_message = {
         "guid": str(int(time.time() * 1000)),
         "method": "sub",
@@ -201,7 +205,7 @@ def on_open(ws):
         ]
     }
     ws.send(json.dumps(subscription_message))
-    print(f"Subscription message sent for mode '{subscription_message['mode']}' and keys {subscription_message['instrumentKeys']}.")
+    logger.info(f"Subscription message sent for mode '{subscription_message['mode']}' and keys {subscription_message['instrumentKeys']}.")
 
 def on_ping(ws, message):
     pass
@@ -219,15 +223,15 @@ def run_market_data_feed():
         if not df.empty:
             market_data_history[key] = df
         else:
-            print(f"Initial historical data fetch failed for {key}. Indicators for this instrument might be inaccurate or unavailable.")
+            logger.warning(f"Initial historical data fetch failed for {key}. Indicators for this instrument might be inaccurate or unavailable.")
 
     if not UPSTOX_ACCESS_TOKEN or UPSTOX_ACCESS_TOKEN == "YOUR_UPSTOX_ACCESS_TOKEN_HERE":
-        print("Error: UPSTOX_ACCESS_TOKEN not set or default. Please provide your Upstox API access token in .env.")
+        logger.error("UPSTOX_ACCESS_TOKEN not set or default. Please provide your Upstox API access token in .env.")
         return
 
     websocket_uri = None
     try:
-        print("Attempting to obtain WebSocket authorization URI...")
+        logger.info("Attempting to obtain WebSocket authorization URI...")
         headers = {
             "Authorization": f"Bearer {UPSTOX_ACCESS_TOKEN}",
             "Accept": "application/json"
@@ -238,17 +242,17 @@ def run_market_data_feed():
         websocket_uri = auth_data.get('data', {}).get('authorized_redirect_uri')
         if not websocket_uri:
             raise ValueError(f"authorized_redirect_uri not found in response: {auth_data}")
-        print(f"Obtained WebSocket URI: {websocket_uri}")
+        logger.info(f"Obtained WebSocket URI: {websocket_uri}")
     except requests.exceptions.RequestException as e:
-        print(f"Error obtaining WebSocket URI: {e}. Please check your access token and network connection.")
+        logger.error(f"Error obtaining WebSocket URI: {e}. Please check your access token and network connection.")
         if hasattr(e, 'response') and e.response is not None:
-            print(f"API Response: {e.response.text}")
+            logger.error(f"API Response: {e.response.text}")
         return
     except ValueError as e:
-        print(f"Parsing error: {e}")
+        logger.error(f"Parsing error: {e}")
         return
 
-    print("Connecting to WebSocket...")
+    logger.info("Connecting to WebSocket...")
     ws_app = websocket.WebSocketApp(
         websocket_uri,
         on_open=on_open,
@@ -259,8 +263,9 @@ def run_market_data_feed():
         on_pong=on_pong
     )
 
-    print("Starting WebSocket run_forever (this will block execution until closed)...")
+    logger.info("Starting WebSocket run_forever (this will block execution until closed)...")
     ws_app.run_forever()
 
 if __name__ == "__main__":
+    structured_logging.setup_logging()
     run_market_data_feed()
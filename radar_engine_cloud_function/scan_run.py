@@ -0,0 +1,105 @@
+# scan_run.py
+"""
+Per-stage timing of a scan, saved as a trading_app ScanRun row so scan
+performance can be compared across runs (GET /api/scan-runs/).
+
+    run = ScanRunRecorder('SCREENING', scan_run_id=args.scan_run_id)
+    with run.stage('context'):
+        ...
+    with run.instrument(instrument_key):
+        with run.stage('fetch'):
+            ...
+    run.save('SUCCESS')
+
+Stage times add up across instruments. API calls and errors are read from
+the metrics counters at start and at save, so they cover everything the
+scan did in this process. The caller must have set
+up Django before save().
+"""
+
+import heapq
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import metrics
+
+STAGES = ('context', 'fetch', 'indicators', 'rules', 'persist')
+
+# Instruments kept in slowest_instruments
+SLOWEST_COUNT = 10
+
+
+class ScanRunRecorder:
+    """Collects one scan's timings and counters; save() writes them to a ScanRun."""
+
+    def __init__(self, scan_type, strategy='', scan_run_id=None):
+        self.scan_type = scan_type
+        self.strategy = strategy
+        self.scan_run_id = scan_run_id
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.instrument_seconds = []
+        self.instruments_total = 0
+        self.instruments_with_data = 0
+        self.instruments_qualified = 0
+        self.alerts_saved = 0
+        self.baseline = self._counters()
+
+    @staticmethod
+    def _counters():
+        return {
+            'api_calls': metrics.total(metrics.UPSTOX_REQUEST_SECONDS),
+            'api_errors': metrics.total(metrics.UPSTOX_ERRORS),
+        }
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] += time.perf_counter() - start
+
+    @contextmanager
+    def instrument(self, instrument_key):
+        """Time one instrument of the scan, for instruments_total and slowest_instruments."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.instruments_total += 1
+            self.instrument_seconds.append((time.perf_counter() - start, instrument_key))
+
+    def slowest(self, count=SLOWEST_COUNT):
+        return [
+            {'instrument_key': key, 'seconds': round(seconds, 3)}
+            for seconds, key in heapq.nlargest(count, self.instrument_seconds)
+        ]
+
+    def save(self, status, error=''):
+        """Create or update the ScanRun row with this scan's results. Returns it."""
+        # Imported here: this module is importable before django.setup()
+        from trading_app.models import ScanRun
+
+        counters = self._counters()
+        fields = {
+            'scan_type': self.scan_type,
+            'strategy': self.strategy,
+            'status': status,
+            'finished_at': datetime.now(timezone.utc),
+            'duration_seconds': round(time.perf_counter() - self.start, 3),
+            **{f'{stage}_seconds': round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+            'instruments_total': self.instruments_total,
+            'instruments_with_data': self.instruments_with_data,
+            'instruments_qualified': self.instruments_qualified,
+            'alerts_saved': self.alerts_saved,
+            **{name: int(counters[name] - self.baseline[name]) for name in counters},
+            'slowest_instruments': self.slowest(),
+            'error': error,
+        }
+        if self.scan_run_id:
+            ScanRun.objects.filter(pk=self.scan_run_id).update(**fields)
+            return ScanRun.objects.get(pk=self.scan_run_id)
+        return ScanRun.objects.create(started_at=self.started_at, **fields)
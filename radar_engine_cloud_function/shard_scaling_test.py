@@ -0,0 +1,103 @@
+# shard_scaling_test.py
+"""
+Synthetic scaling test for sharded live-feed analysis: feeds rounds of
+ticks for every instrument of a synthetic universe through ShardedAnalyzer
+at increasing shard counts and reports analyzed ticks per second. The
+analysis is a CPU-bound stand-in for the indicator work (rolling windows
+over each instrument's history), so throughput should grow close to
+linearly with shards up to the number of cores.
+
+Usage:
+    python shard_scaling_test.py [--instruments 2000] [--rounds 5] [--shards 1,2,4,8]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from sharded_analysis import ShardedAnalyzer
+from tick_buffer import TICK_DTYPE
+
+HISTORY_ROWS = 200
+START_MS = 1760000000000
+
+
+def synthetic_histories(instrument_keys):
+    index = pd.date_range('2025-01-01', periods=HISTORY_ROWS, freq='min', tz='Asia/Kolkata', name='datetime')
+    rng = np.random.default_rng(0)
+    histories = {}
+    for key in instrument_keys:
+        close = 100 + rng.standard_normal(HISTORY_ROWS).cumsum()
+        histories[key] = pd.DataFrame({
+            'open': close, 'high': close, 'low': close, 'close': close,
+            'volume': np.full(HISTORY_ROWS, 1000.0),
+        }, index=index)
+    return histories
+
+
+def synthetic_round(num_instruments, step):
+    """One tick per instrument, as the tick buffer would drain it."""
+    batch = np.empty(num_instruments, dtype=TICK_DTYPE)
+    batch['slot'] = np.arange(num_instruments)
+    batch['ltt'] = START_MS + step * 60 * 1000
+    batch['ltp'] = 100 + np.arange(num_instruments) * 0.01 + step
+    batch['ltq'] = 10
+    batch['cp'] = 100
+    return batch
+
+
+def rolling_analysis(instrument_key, df_history):
+    """CPU-bound stand-in for indicators + setup rules; alerts on a 3-sigma close."""
+    close = df_history['close']
+    zscore = None
+    for window in (5, 10, 20, 50, 100):
+        mean = close.rolling(window).mean()
+        std = close.rolling(window).std()
+        zscore = (close - mean) / std
+    if abs(zscore.iloc[-1]) > 3:
+        return {'instrument_key': instrument_key, 'score': 1, 'reasons': ['3-sigma close'], 'indicators': {}}
+    return None
+
+
+def run(num_shards, instrument_keys, histories, rounds):
+    alerts = []
+    analyzer = ShardedAnalyzer(num_shards, sink=alerts.extend, histories=histories, analyze=rolling_analysis)
+    analyzer.start()
+    try:
+        # Warm-up round: process start-up and first-call overheads
+        analyzer.dispatch(synthetic_round(len(instrument_keys), 0), instrument_keys)
+        analyzer.wait_idle()
+
+        start = time.perf_counter()
+        for step in range(1, rounds + 1):
+            analyzer.dispatch(synthetic_round(len(instrument_keys), step), instrument_keys)
+        analyzer.wait_idle()
+        elapsed = time.perf_counter() - start
+    finally:
+        analyzer.stop()
+    return rounds * len(instrument_keys) / elapsed, len(alerts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--instruments', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5, help='Ticks per instrument to analyze')
+    parser.add_argument('--shards', default='1,2,4,8', help='Comma-separated shard counts')
+    args = parser.parse_args()
+
+    instrument_keys = [f'NSE_EQ|SYN{i}' for i in range(args.instruments)]
+    histories = synthetic_histories(instrument_keys)
+    print(f"{args.instruments} instruments, {args.rounds} rounds, {os.cpu_count()} cores")
+
+    baseline = None
+    for num_shards in (int(n) for n in args.shards.split(',')):
+        rate, alerts = run(num_shards, instrument_keys, histories, args.rounds)
+        baseline = baseline or rate
+        print(f"{num_shards:>3} shards: {rate:,.0f} ticks/s ({rate / baseline:.2f}x), {alerts} alerts")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+# sharded_analysis.py
+"""
+Multi-process analysis of the live tick feed.
+
+Instruments are hashed to N shard processes. Each shard owns the history
+DataFrames (and so the indicator state) of its instruments, so the
+indicator and pattern work for different instruments runs on different
+cores. The batch worker dispatches each drained tick batch as one array
+of rows per shard; shards send their alerts back over a single results
+queue, and one sink thread in the parent hands them on (e.g. to the
+database), so there is still exactly one alert writer.
+"""
+
+import logging
+import multiprocessing as mp
+import queue
+import threading
+import time
+import zlib
+
+import numpy as np
+
+import data_manager
+from tick_buffer import ticks_to_frames
+
+logger = logging.getLogger(__name__)
+
+# Tick batches waiting per shard before dispatch() blocks; while it blocks the
+# tick buffer keeps conflating, so a slow shard never builds a backlog
+SHARD_QUEUE_SIZE = 4
+
+# Seconds the sink thread waits for results before checking for shutdown
+RESULTS_POLL = 0.25
+
+
+def shard_for(instrument_key, num_shards):
+    """Stable shard for an instrument (the same in every process and run)."""
+    return zlib.crc32(instrument_key.encode()) % num_shards
+
+
+def analyze_instrument(instrument_key, df_history):
+    """
+    Default per-instrument analysis run inside a shard: indicators, then the
+    trade setup rules. Returns an alert dict for save_alerts_to_db, or None.
+    """
+    # Imported in the shard process only; the parent never runs the analysis
+    import indicator_calculator
+    import trade_analyzer
+
+    indicators = indicator_calculator.calculate_indicators(df_history)
+    setup_found, details, trade_recommendations = trade_analyzer.analyze_for_trade_setup(
+        instrument_key, indicators, df_history
+    )
+    if not setup_found:
+        return None
+    return {
+        'instrument_key': instrument_key,
+        'score': len(details),
+        'reasons': details,
+        'indicators': {**indicators, **trade_recommendations},
+        'alert_type': 'ENTRY',
+    }
+
+
+def run_shard(shard, histories, analyze, ticks_in, results_out):
+    """
+    Shard process: seeds its own history store, then appends and analyzes
+    every tick batch it receives until it gets None.
+    Sends (shard, rows processed, [alert, ...]) per batch.
+    """
+    data_manager.market_data_history.update(histories)
+    while True:
+        item = ticks_in.get()
+        if item is None:
+            break
+
+        instrument_keys, rows = item
+        alerts = []
+        for instrument_key, ticks in ticks_to_frames(rows, instrument_keys).items():
+            updated_df = data_manager.append_ticks(instrument_key, ticks)
+            if updated_df.empty:
+                continue
+            try:
+                alert = analyze(instrument_key, updated_df)
+            except Exception as e:
+                logger.error(f"Shard {shard} failed to analyze {instrument_key}: {e}")
+                continue
+            if alert:
+                alerts.append(alert)
+        results_out.put((shard, len(rows), alerts))
+
+
+class ShardedAnalyzer:
+    """
+    Routes drained tick batches to ``num_shards`` analysis processes and
+    merges their alerts into ``sink(alerts)``, called from one thread.
+
+    ``histories`` is the initial instrument_key -> DataFrame store (normally
+    data_manager.market_data_history); each shard is started with only its
+    own instruments. ``analyze(instrument_key, df_history)`` runs in the
+    shards, so it must be a module-level function.
+    """
+
+    def __init__(self, num_shards, sink, histories=None, analyze=analyze_instrument):
+        self.num_shards = num_shards
+        self.sink = sink
+        self.histories = histories if histories is not None else data_manager.market_data_history
+        self.analyze = analyze
+        # Spawned, not forked: the parent runs the WebSocket and batch worker threads
+        self._context = mp.get_context('spawn')
+        self._queues = []
+        self._processes = []
+        self._results = None
+        self._sink_thread = None
+        self._stop_event = threading.Event()
+        # slot -> shard, grown as the tick buffer registers instruments
+        self._shard_of_slot = np.empty(0, dtype=np.int32)
+        self._lock = threading.Lock()
+        self.dispatched = 0
+        self.processed = 0
+        self.alerts = 0
+
+    def start(self):
+        self._results = self._context.Queue()
+        for shard in range(self.num_shards):
+            histories = {
+                key: df for key, df in self.histories.items()
+                if shard_for(key, self.num_shards) == shard
+            }
+            ticks_in = self._context.Queue(SHARD_QUEUE_SIZE)
+            process = self._context.Process(
+                target=run_shard,
+                args=(shard, histories, self.analyze, ticks_in, self._results),
+                name=f'radar-shard-{shard}',
+                daemon=True,
+            )
+            process.start()
+            self._queues.append(ticks_in)
+            self._processes.append(process)
+        self._sink_thread = threading.Thread(target=self._run_sink, daemon=True)
+        self._sink_thread.start()
+        logger.info(f"Started {self.num_shards} analysis shards for {len(self.histories)} instruments")
+
+    def _shards_of(self, slots, instrument_keys):
+        known = len(self._shard_of_slot)
+        if slots.max() >= known:
+            new = [shard_for(key, self.num_shards) for key in instrument_keys[known:]]
+            self._shard_of_slot = np.append(self._shard_of_slot, np.array(new, dtype=np.int32))
+        return self._shard_of_slot[slots]
+
+    def dispatch(self, batch, instrument_keys):
+        """
+        Split a drained batch by shard and queue each part (batch worker).
+        ``instrument_keys`` is the tick buffer's slot -> instrument_key list.
+        Blocks while a shard's queue is full.
+        """
+        if len(batch) == 0:
+            return
+        shards = self._shards_of(batch['slot'], instrument_keys)
+        with self._lock:
+            self.dispatched += len(batch)
+        for shard, ticks_in in enumerate(self._queues):
+            # Boolean indexing copies, so the rows outlive the buffer's next drain
+            rows = batch[shards == shard]
+            if len(rows):
+                keys = {int(slot): instrument_keys[slot] for slot in np.unique(rows['slot'])}
+                ticks_in.put((keys, rows))
+
+    def pending(self):
+        """Rows dispatched but not yet analyzed."""
+        with self._lock:
+            return self.dispatched - self.processed
+
+    def wait_idle(self, timeout=None):
+        """Wait until every dispatched row has been analyzed; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _run_sink(self):
+        while not self._stop_event.is_set() or self.pending():
+            try:
+                shard, processed, alerts = self._results.get(timeout=RESULTS_POLL)
+            except queue.Empty:
+                continue
+            with self._lock:
+                self.processed += processed
+                self.alerts += len(alerts)
+            if alerts:
+                try:
+                    self.sink(alerts)
+                except Exception as e:
+                    logger.exception(f"Alert sink failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'shards': self.num_shards,
+                'dispatched': self.dispatched,
+                'processed': self.processed,
+                'alerts': self.alerts,
+            }
+
+    def stop(self, timeout=10):
+        """Let the shards finish their queued batches, then shut them down."""
+        for ticks_in in self._queues:
+            ticks_in.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._stop_event.set()
+        if self._sink_thread:
+            self._sink_thread.join(timeout)
+        logger.info("Analysis shards stopped", extra=self.stats())
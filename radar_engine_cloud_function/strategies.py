@@ -1,7 +1,5 @@
 # strategies.py
 
-import pattern_recognizer
-
 # This is the master list of all available screening rules.
 # To add a new screener, you just add a new dictionary to this list.
 ALL_RULES = [
@@ -53,6 +51,10 @@ ALL_RULES = [
             indicators.get('Low') is not None and indicators.get('EMA20') is not None and indicators.get('Close') is not None and
             indicators.get('Low') < indicators.get('EMA20') < indicators.get('Close')
         ),
+        # The same check over whole indicator series, for the backtester
+        "vector_function": lambda ind: (
+            (ind['EMA50'] > ind['EMA200']) & (ind['Low'] < ind['EMA20']) & (ind['EMA20'] < ind['Close'])
+        ),
         "message": "Price pulled back and bounced from the 20-day EMA support.", "score": 2
     },
 
@@ -70,16 +72,32 @@ ALL_RULES = [
         "indicator": "Volume_Spike", "condition": "equals", "value": True,
         "message": "Significant volume spike detected.", "score": 1
     },
+    # Pattern rules name an entry of pattern_recognizer.PATTERNS
     {
         "name": "Bullish Engulfing Pattern", "type": "pattern", "signal": "bullish",
-        "function": pattern_recognizer.detect_bullish_engulfing,
+        "pattern": "bullish_engulfing",
         "message": "A 'Bullish Engulfing' pattern was detected.", "score": 1
     },
     {
         "name": "Hammer Pattern",
         "type": "pattern", "signal": "bullish",
-        "function": pattern_recognizer.detect_hammer,
+        "pattern": "hammer",
         "message": "A 'Hammer' reversal pattern was detected.", "score": 1
+    },
+    {
+        "name": "Morning Star Pattern", "type": "pattern", "signal": "bullish",
+        "pattern": "morning_star",
+        "message": "A 'Morning Star' reversal pattern was detected.", "score": 2
+    },
+    {
+        "name": "Three White Soldiers Pattern", "type": "pattern", "signal": "bullish",
+        "pattern": "three_white_soldiers",
+        "message": "'Three White Soldiers' continuation pattern was detected.", "score": 2
+    },
+    {
+        "name": "Shooting Star Pattern", "type": "pattern", "signal": "bearish",
+        "pattern": "shooting_star",
+        "message": "A 'Shooting Star' reversal pattern was detected.", "score": 1
     }
 ]
 
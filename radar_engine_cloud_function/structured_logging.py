@@ -0,0 +1,96 @@
+# structured_logging.py
+"""
+Logging setup for the radar engine's entry points. Loggers hand records to a
+QueueHandler, so the feed thread never blocks on stdout; a QueueListener
+thread formats them and writes one JSON object per line.
+
+Modules log through ``logging.getLogger(__name__)`` and pass structured
+fields with ``extra``:
+
+    logger.debug("Processed ticks", extra={"instrument_key": key, "ticks": 4})
+
+Per-tick and per-instrument chatter is logged at DEBUG. RADAR_LOG_LEVEL
+(default INFO) and RADAR_LOG_FORMAT (json or text) override the defaults.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from decouple import config
+
+# Attributes every LogRecord has; anything else came from ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and any ``extra`` fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _StructuredQueueHandler(QueueHandler):
+    """
+    QueueHandler that keeps the traceback out of the message: the stock
+    prepare() formats it into ``msg``, which would hide it from JsonFormatter.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level=None, log_file=None, json_format=None):
+    """
+    Route the root logger through a queue to a background writer for stdout
+    (and ``log_file`` if given). Safe to call more than once; returns the
+    QueueListener, which is stopped (and flushed) at exit.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    level = level or config('RADAR_LOG_LEVEL', default='INFO')
+    if json_format is None:
+        json_format = config('RADAR_LOG_FORMAT', default='json') == 'json'
+    formatter = JsonFormatter() if json_format else logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [_StructuredQueueHandler(log_queue)]
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, *handlers)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
@@ -0,0 +1,231 @@
+# synthetic_data.py
+"""
+Vectorized synthetic intraday candles for load tests and replays.
+
+Every instrument's bars are generated at once from a seeded
+numpy Generator. Returns follow a factor model: each instrument loads on
+a market factor and on its sector's factor, plus idiosyncratic noise, so
+paths are correlated the way real universes are. The drift and
+volatility of each day come from a regime (REGIMES): one fixed regime
+per scenario, or a Markov switch between regimes from day to day with
+scenario='mixed'.
+
+The columnar cache is a directory of .npy files: ``datetime`` (epoch ms
+per bar), ``instrument_keys``, and one (instruments x bars) array per
+field (open, high, low, close, volume). Arrays can be memory-mapped, so
+a reader pays only for the instruments it uses.
+
+Usage:
+    python synthetic_data.py --symbols 2000 --days 22 [--interval 1] [--scenario mixed] [--seed 0] [--output synthetic_cache]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Regime -> (daily drift, daily volatility, volume multiplier)
+REGIMES = {
+    'normal': (0.0005, 0.015, 1.0),
+    'trending': (0.004, 0.010, 1.2),
+    'bearish': (-0.004, 0.018, 1.3),
+    'volatile': (0.0001, 0.030, 1.8),
+    'quiet': (0.0, 0.006, 0.6),
+}
+
+# Chance the 'mixed' scenario keeps the previous day's regime
+REGIME_PERSISTENCE = 0.8
+
+SESSION_OPEN = '09:15'
+SESSION_MINUTES = 375  # 09:15 to 15:30
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class IntradayDataGenerator:
+    """
+    Generates realistic intraday data for testing.
+    Pass ``seed`` for reproducible output.
+    """
+
+    def __init__(self, seed=None, n_sectors=10):
+        self.rng = np.random.default_rng(seed)
+        self.n_sectors = n_sectors
+        self.regimes = []
+        self.market_hours = {
+            'open': '09:15',
+            'close': '15:30'
+        }
+
+    def session_times(self, start_date, days, interval_minutes):
+        """Epoch ms of every bar over ``days`` weekdays from ``start_date``."""
+        dates = pd.bdate_range(pd.Timestamp(start_date).normalize(), periods=days)
+        opens = pd.DatetimeIndex([f"{d.date()} {SESSION_OPEN}" for d in dates]).tz_localize('Asia/Kolkata')
+        offsets = np.arange(SESSION_MINUTES // interval_minutes) * interval_minutes * 60 * 1000
+        return (opens.as_unit('ms').asi8[:, None] + offsets).ravel()
+
+    def day_regimes(self, days, scenario):
+        """Regime name per day."""
+        if scenario in REGIMES:
+            return [scenario] * days
+        if scenario != 'mixed':
+            raise ValueError(f"Unknown scenario '{scenario}'. Choose from: mixed, {', '.join(REGIMES)}")
+        names = list(REGIMES)
+        regimes = ['normal']
+        switches = self.rng.random(days - 1) > REGIME_PERSISTENCE
+        picks = self.rng.integers(len(names), size=days - 1)
+        for switch, pick in zip(switches, picks):
+            regimes.append(names[pick] if switch else regimes[-1])
+        return regimes
+
+    def generate_universe(self, count, start_date, days=1, interval_minutes=1, scenario='normal'):
+        """
+        Candles for ``count`` instruments sharing one timeline.
+        Returns (times, fields): epoch ms per bar, and a dict of
+        (count x bars) float32 arrays for open, high, low, close and volume.
+        """
+        rng = self.rng
+        times = self.session_times(start_date, days, interval_minutes)
+        bars_per_day = SESSION_MINUTES // interval_minutes
+        bars = len(times)
+
+        # Per-day regime, spread to bars
+        regimes = self.regimes = self.day_regimes(days, scenario)
+        drift, volatility, volume_scale = (np.repeat(np.array([REGIMES[r][i] for r in regimes]), bars_per_day)
+                                           for i in range(3))
+        bar_fraction = interval_minutes / SESSION_MINUTES
+        bar_drift = (drift * bar_fraction).astype(np.float32)
+        bar_vol = (volatility * np.sqrt(bar_fraction)).astype(np.float32)
+
+        # Factor model: market + sector + idiosyncratic, unit variance per instrument
+        market_beta = rng.uniform(0.3, 0.7, count).astype(np.float32)[:, None]
+        sector_beta = np.float32(0.3)
+        idio_beta = np.sqrt(1 - market_beta ** 2 - sector_beta ** 2)
+        sector = rng.integers(self.n_sectors, size=count)
+        market = rng.standard_normal(bars, dtype=np.float32)
+        sectors = rng.standard_normal((self.n_sectors, bars), dtype=np.float32)
+        shocks = rng.standard_normal((count, bars), dtype=np.float32)
+        shocks *= idio_beta
+        shocks += market_beta * market
+        shocks += sector_beta * sectors[sector]
+        returns = shocks
+        returns *= bar_vol
+        returns += bar_drift
+
+        # Overnight gap on each day's first bar
+        day_starts = np.arange(0, bars, bars_per_day)[1:]
+        returns[:, day_starts] += rng.normal(0, 0.3, (count, len(day_starts))).astype(np.float32) * volatility[day_starts]
+
+        base_price = rng.lognormal(np.log(500), 0.8, count)[:, None]
+        close = (base_price * np.exp(np.cumsum(returns, axis=1, dtype=np.float64))).astype(np.float32)
+        del returns, shocks
+
+        open_ = np.empty_like(close)
+        open_[:, 0] = base_price[:, 0]
+        open_[:, 1:] = close[:, :-1]
+        wick = np.abs(rng.standard_normal((2, count, bars), dtype=np.float32)) * (bar_vol * 0.5)
+        high = np.maximum(open_, close) * (1 + wick[0])
+        low = np.minimum(open_, close) * (1 - wick[1])
+        del wick
+
+        # U-shaped session volume: heavier at the open and close
+        minute = np.tile(np.arange(bars_per_day) * interval_minutes, days)
+        session_shape = 1 + np.exp(-minute / 30) + np.exp(-(SESSION_MINUTES - minute) / 30)
+        base_volume = rng.lognormal(np.log(50000 * interval_minutes), 0.7, count)[:, None]
+        volume = rng.lognormal(0, 0.4, (count, bars)).astype(np.float32)
+        volume *= (base_volume * session_shape * volume_scale).astype(np.float32)
+
+        fields = {
+            'open': np.round(open_, 2),
+            'high': np.round(high, 2),
+            'low': np.round(low, 2),
+            'close': np.round(close, 2),
+            'volume': np.floor(volume),
+        }
+        return times, fields
+
+    def generate_histories(self, instrument_keys, start_date, days=1, interval_minutes=1, scenario='normal'):
+        """generate_universe() as instrument_key -> OHLCV DataFrame."""
+        times, fields = self.generate_universe(len(instrument_keys), start_date, days, interval_minutes, scenario)
+        return to_histories(instrument_keys, times, fields)
+
+    def generate_intraday_data(self, symbol, date, interval_minutes=5, scenario='normal'):
+        """
+        Generates realistic intraday data for testing.
+
+        Args:
+            symbol (str): Stock symbol
+            date (datetime): Trading date
+            interval_minutes (int): Candle interval
+            scenario (str): a REGIMES name or 'mixed'
+
+        Returns:
+            pd.DataFrame: Intraday OHLCV data
+        """
+        return self.generate_histories([symbol], date, 1, interval_minutes, scenario)[symbol]
+
+
+def to_histories(instrument_keys, times, fields, rows=None):
+    """instrument_key -> OHLCV DataFrame for ``rows`` (default all) of a universe."""
+    index = pd.DatetimeIndex(pd.to_datetime(times, unit='ms', utc=True).tz_convert('Asia/Kolkata'), name='datetime')
+    rows = range(len(instrument_keys)) if rows is None else rows
+    return {
+        instrument_keys[i]: pd.DataFrame({name: fields[name][i].astype(float).round(2) for name in FIELDS}, index=index)
+        for i in rows
+    }
+
+
+def write_columnar_cache(path, instrument_keys, times, fields):
+    """Write a universe as one .npy file per column under ``path``."""
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'instrument_keys.npy'), np.array(instrument_keys, dtype=str))
+    np.save(os.path.join(path, 'datetime.npy'), times)
+    for name in FIELDS:
+        np.save(os.path.join(path, f'{name}.npy'), fields[name])
+
+
+def is_columnar_cache(path):
+    return os.path.exists(os.path.join(path, 'close.npy'))
+
+
+def load_columnar_cache(path, instrument_keys=None):
+    """
+    Read a columnar cache as instrument_key -> OHLCV DataFrame, for all
+    instruments or only ``instrument_keys``. Columns are memory-mapped, so
+    only the requested rows are read.
+    """
+    keys = np.load(os.path.join(path, 'instrument_keys.npy')).tolist()
+    times = np.load(os.path.join(path, 'datetime.npy'))
+    fields = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in FIELDS}
+    rows = None if instrument_keys is None else [keys.index(key) for key in instrument_keys]
+    return to_histories(keys, times, fields, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--symbols', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=22, help='Trading days (22 is about a month)')
+    parser.add_argument('--interval', type=int, default=1, help='Candle interval in minutes')
+    parser.add_argument('--scenario', default='mixed', help=f"mixed or one of: {', '.join(REGIMES)}")
+    parser.add_argument('--start', default='2025-01-01')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='synthetic_cache')
+    args = parser.parse_args()
+
+    instrument_keys = [f'NSE_EQ|SYN{i}' for i in range(args.symbols)]
+    generator = IntradayDataGenerator(seed=args.seed)
+    start = time.perf_counter()
+    times, fields = generator.generate_universe(args.symbols, args.start, args.days, args.interval, args.scenario)
+    generated = time.perf_counter() - start
+    write_columnar_cache(args.output, instrument_keys, times, fields)
+    written = time.perf_counter() - start - generated
+
+    print(f"Generated {args.symbols:,} symbols x {len(times):,} bars "
+          f"({args.symbols * len(times):,} candles) in {generated:.1f}s, wrote {args.output} in {written:.1f}s")
+    print(f"Regimes by day: {' '.join(generator.regimes)}")
+
+
+if __name__ == '__main__':
+    main()
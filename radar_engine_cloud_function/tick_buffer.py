@@ -0,0 +1,147 @@
+# tick_buffer.py
+
+import threading
+import numpy as np
+import pandas as pd
+
+# One row per tick: raw LTPC numbers only, with the instrument as an integer slot
+TICK_DTYPE = np.dtype([
+    ('slot', np.int32),    # index into TickBuffer.instrument_keys
+    ('ltt', np.int64),     # last trade time, epoch milliseconds
+    ('ltp', np.float64),   # last traded price
+    ('ltq', np.int64),     # last traded quantity
+    ('cp', np.float64),    # previous close
+])
+
+# Most instruments the buffer will track; also the most ticks pending at once
+DEFAULT_CAPACITY = 8192
+
+
+class TickBuffer:
+    """
+    Bounded, per-instrument conflating tick queue between the WebSocket
+    receive thread (push) and a batch worker (drain).
+
+    At most one tick per instrument is pending: a newer tick for an
+    instrument that has not been drained yet overwrites the pending one, so
+    the queue never holds more than one row per instrument and push() costs
+    the same however far behind the worker is. Rows live in two preallocated
+    structured arrays; drain() swaps them and hands back the filled one.
+
+    Counters:
+        pushed     ticks accepted
+        conflated  pending ticks overwritten by a newer tick for the same instrument
+        dropped    ticks for instruments beyond ``capacity`` (never queued)
+        depth      instruments currently pending; max_depth is its high-water mark
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._arrays = [np.empty(capacity, dtype=TICK_DTYPE), np.empty(capacity, dtype=TICK_DTYPE)]
+        self._active = 0
+        self._count = 0
+        # slot -> row in the active array, -1 if the instrument has nothing pending
+        self._row_of_slot = np.full(capacity, -1, dtype=np.int64)
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self.slots = {}             # instrument_key -> slot
+        self.instrument_keys = []   # slot -> instrument_key
+        self.pushed = 0
+        self.conflated = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        return self._count
+
+    def stats(self):
+        """Snapshot of the counters."""
+        with self._lock:
+            return {
+                'pushed': self.pushed,
+                'conflated': self.conflated,
+                'dropped': self.dropped,
+                'depth': self._count,
+                'max_depth': self.max_depth,
+            }
+
+    def slot_for(self, instrument_key):
+        """Return the slot for an instrument, registering it on first sight; None once full."""
+        slot = self.slots.get(instrument_key)
+        if slot is None:
+            with self._lock:
+                slot = self.slots.get(instrument_key)
+                if slot is None and len(self.instrument_keys) < self.capacity:
+                    slot = len(self.instrument_keys)
+                    self.slots[instrument_key] = slot
+                    self.instrument_keys.append(instrument_key)
+        return slot
+
+    def push(self, slot, ltt, ltp, ltq, cp):
+        """Queue one tick (receive thread), replacing the instrument's pending tick if any."""
+        with self._lock:
+            if slot is None:
+                self.dropped += 1
+                return
+            self.pushed += 1
+            row = self._row_of_slot[slot]
+            if row >= 0:
+                self._arrays[self._active][row] = (slot, ltt, ltp, ltq, cp)
+                self.conflated += 1
+                return
+            row = self._count
+            self._arrays[self._active][row] = (slot, ltt, ltp, ltq, cp)
+            self._row_of_slot[slot] = row
+            self._count += 1
+            if self._count > self.max_depth:
+                self.max_depth = self._count
+            if self._count == 1:
+                self._ready.notify()
+
+    def drain(self, timeout=None):
+        """
+        Wait up to ``timeout`` seconds for ticks, then return the pending rows
+        (one per instrument) as a view of the inactive array, valid until the
+        next drain, and reset. Returns an empty array if nothing arrived.
+        """
+        with self._lock:
+            if self._count == 0:
+                self._ready.wait(timeout)
+            filled = self._arrays[self._active][:self._count]
+            self._row_of_slot[filled['slot']] = -1
+            self._active ^= 1
+            self._count = 0
+        return filled
+
+
+def ticks_to_frames(batch, instrument_keys):
+    """
+    Splits a drained tick batch into one OHLCV DataFrame per instrument.
+    All timestamps are converted in a single vectorized call.
+    ``instrument_keys`` maps slot -> instrument_key (a list or a dict).
+    Returns {instrument_key: DataFrame indexed by datetime}.
+    """
+    if len(batch) == 0:
+        return {}
+
+    # Group rows by instrument, keeping arrival order within each one
+    batch = batch[np.argsort(batch['slot'], kind='stable')]
+    index = pd.DatetimeIndex(
+        pd.to_datetime(batch['ltt'], unit='ms', utc=True).tz_convert('Asia/Kolkata'), name='datetime'
+    )
+    prices = batch['ltp']
+    frame = pd.DataFrame({
+        'open': prices,
+        'high': prices,
+        'low': prices,
+        'close': prices,
+        'volume': batch['ltq'].astype(float),
+    }, index=index)
+
+    slots, starts = np.unique(batch['slot'], return_index=True)
+    ends = np.append(starts[1:], len(batch))
+    return {
+        instrument_keys[slot]: frame.iloc[start:end]
+        for slot, start, end in zip(slots, starts, ends)
+    }
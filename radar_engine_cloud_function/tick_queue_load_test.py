@@ -0,0 +1,101 @@
+# tick_queue_load_test.py
+"""
+Synthetic load test for the feed receive path: replays encoded FeedResponse
+frames into websocket_handler.on_message at a normal rate and at a multiple
+of it, while the batch worker runs a deliberately slow stand-in for the
+indicator/analysis work. Receive latency should stay flat across phases;
+the tick queue conflates instead of growing.
+
+Usage:
+    python tick_queue_load_test.py [--instruments 100] [--rate 1000] [--burst 10] [--seconds 5]
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+import websocket_handler
+from upstox_client.feeder.proto import MarketDataFeedV3_pb2
+
+
+def build_frames(instrument_keys, count):
+    """One frame per step, each carrying a tick for every instrument."""
+    frames = []
+    for step in range(count):
+        response = MarketDataFeedV3_pb2.FeedResponse()
+        for i, key in enumerate(instrument_keys):
+            ltpc = response.feeds[key].ltpc
+            ltpc.ltp = 100 + i + step * 0.05
+            ltpc.ltt = 1760000000000 + step * 100
+            ltpc.ltq = 10
+            ltpc.cp = 100 + i
+        frames.append(response.SerializeToString())
+    return frames
+
+
+def slow_process(seconds_per_instrument):
+    def process(batch):
+        time.sleep(seconds_per_instrument * len(batch))
+    return process
+
+
+def run_phase(frames, frames_per_second, seconds):
+    """Send frames at a fixed rate; returns per-call on_message latencies in microseconds."""
+    latencies = []
+    interval = 1.0 / frames_per_second
+    start = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - start < seconds:
+        due = start + sent * interval
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        t = time.perf_counter()
+        websocket_handler.on_message(None, frames[sent % len(frames)])
+        latencies.append((time.perf_counter() - t) * 1e6)
+        sent += 1
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--instruments', type=int, default=100)
+    parser.add_argument('--rate', type=int, default=1000, help='Normal tick rate (ticks/second)')
+    parser.add_argument('--burst', type=int, default=10, help='Multiplier for the burst phase')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--work-ms', type=float, default=2.0, help='Simulated analysis time per instrument')
+    args = parser.parse_args()
+
+    instrument_keys = [f'NSE_EQ|LOAD{i}' for i in range(args.instruments)]
+    frames = build_frames(instrument_keys, 50)
+
+    stop_event = threading.Event()
+    worker = threading.Thread(
+        target=websocket_handler.run_batch_worker,
+        args=(stop_event, slow_process(args.work_ms / 1000)),
+        daemon=True,
+    )
+    worker.start()
+
+    buffer = websocket_handler.tick_buffer
+    try:
+        for label, multiplier in (('normal', 1), (f'{args.burst}x burst', args.burst)):
+            before = buffer.stats()
+            frames_per_second = args.rate * multiplier / args.instruments
+            latencies = run_phase(frames, frames_per_second, args.seconds)
+            after = buffer.stats()
+            print(
+                f"{label:>10}: {len(latencies) * args.instruments / args.seconds:,.0f} ticks/s, "
+                f"receive p50={np.percentile(latencies, 50):.0f}us p99={np.percentile(latencies, 99):.0f}us "
+                f"max={latencies.max():.0f}us | conflated={after['conflated'] - before['conflated']} "
+                f"dropped={after['dropped'] - before['dropped']} max_depth={after['max_depth']}"
+            )
+    finally:
+        stop_event.set()
+        worker.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,14 @@
 import psycopg2
 from decouple import config
 import json
+import logging
 import pandas as pd
-import traceback
+import time
+
+import metrics
+import pattern_recognizer
+
+logger = logging.getLogger(__name__)
 
 # --- Database Configuration ---
 DB_HOST = config('DB_HOST')
@@ -46,8 +52,8 @@ def analyze_setup(indicators, df_history, rules, stock_sector=None, strong_secto
                     rule_triggered = True
         
         elif rule['type'] == 'pattern':
-            # The pattern_recognizer module must be imported where this function is called
-            if rule['function'](df_history):
+            # Reads the last bar of the pattern's cached mask for this DataFrame
+            if pattern_recognizer.pattern_on_last_bar(rule['pattern'], df_history):
                 rule_triggered = True
         
         elif rule['type'] == 'custom':
@@ -129,22 +135,11 @@ def analyze_for_trade_setup(instrument_token, indicators, df_history=None):
             trade_recommendations.update(calculate_trade_levels(current_price, trade_recommendations.get('direction', 'BUY'), df_history))
 
     if setup_found:
-        print(f"\n🎯 ENHANCED RADAR ALERT for {instrument_token}!")
-        for detail in details:
-            print(f"- {detail}")
-        
-        if trade_recommendations:
-            print(f"\n📊 Trade Recommendations:")
-            print(f"   Direction: {trade_recommendations.get('direction', 'N/A')}")
-            if 'entry_price' in trade_recommendations:
-                print(f"   Entry: ₹{trade_recommendations['entry_price']:.2f}")
-            if 'stop_loss' in trade_recommendations:
-                print(f"   Stop Loss: ₹{trade_recommendations['stop_loss']:.2f}")
-            if 'target_1' in trade_recommendations:
-                print(f"   Target 1: ₹{trade_recommendations['target_1']:.2f}")
-            if 'risk_reward' in trade_recommendations:
-                print(f"   Risk-Reward: 1:{trade_recommendations['risk_reward']:.2f}")
-        print("--------------------------------------")
+        logger.info(f"Radar alert for {instrument_token}", extra={
+            'instrument_key': instrument_token,
+            'details': details,
+            'recommendations': trade_recommendations,
+        })
 
     return setup_found, details, trade_recommendations
 
@@ -193,13 +188,85 @@ def calculate_trade_levels(current_price, direction, df_history):
     
     return trade_levels
 
+def detect_orb_breakout(instrument_key, df, opening_range_candles=6, volume_multiple=1.2):
+    """
+    Opening Range Breakout check on one day's intraday candles (oldest first).
+    The opening range is the first ``opening_range_candles`` candles (30
+    minutes of 5-minute candles); the last candle's close breaking above or
+    below it is a breakout, confirmed when its volume exceeds
+    ``volume_multiple`` times the last six candles' average.
+    Returns an alert dict for save_alerts_to_db, or None.
+    """
+    if df is None or len(df) < 2 * opening_range_candles: # Need at least 1 hour of 5-min candles
+        return None
+
+    # 1. Define the opening range
+    opening_range_df = df.head(opening_range_candles)
+    opening_range_high = opening_range_df['high'].max()
+    opening_range_low = opening_range_df['low'].min()
+
+    # 2. Get the most recent candle
+    last_candle = df.iloc[-1]
+    current_price = last_candle['close']
+    current_volume = last_candle['volume']
+    avg_volume = df['volume'].tail(6).mean()
+
+    # 3. Breakout detection with volume confirmation
+    breakout_up = current_price > opening_range_high
+    breakout_down = current_price < opening_range_low
+    volume_confirmation = current_volume > avg_volume * volume_multiple
+
+    if not (breakout_up or breakout_down):
+        return None
+
+    direction = "UP" if breakout_up else "DOWN"
+
+    # Calculate targets and stop loss
+    if breakout_up:
+        stop_loss = opening_range_low
+        target = current_price + (current_price - opening_range_low)
+    else:
+        stop_loss = opening_range_high
+        target = current_price - (opening_range_high - current_price)
+
+    # Calculate risk-reward ratio
+    risk = abs(current_price - stop_loss)
+    reward = abs(target - current_price)
+    rr_ratio = reward / risk if risk > 0 else 0
+
+    range_minutes = opening_range_candles * 5
+    return {
+        "instrument_key": instrument_key,
+        "score": 2 if volume_confirmation else 1,
+        "reasons": [
+            f"Enhanced ORB: Price broke {direction} the {range_minutes}-min opening range",
+            f"Entry: ₹{current_price:.2f}, Stop: ₹{stop_loss:.2f}, Target: ₹{target:.2f}",
+            f"Risk-Reward: 1:{rr_ratio:.2f}",
+            f"Volume: {'High' if volume_confirmation else 'Normal'}"
+        ],
+        "indicators": {
+            "ORB_High": opening_range_high,
+            "ORB_Low": opening_range_low,
+            "Entry_Price": current_price,
+            "Stop_Loss": stop_loss,
+            "Target": target,
+            "Risk_Reward": rr_ratio,
+            "Volume_Confirmation": volume_confirmation,
+            "Direction": direction
+        }
+    }
+
 def save_alerts_to_db(alerts_to_save, strategy_name):
-    """Saves a batch of alerts to the PostgreSQL database, tagging them with a strategy name."""
+    """
+    Saves a batch of alerts to the PostgreSQL database, tagging them with a strategy name.
+    Returns the number of alerts saved (0 if the write failed).
+    """
     if not alerts_to_save:
-        print("No alerts to save.")
-        return
+        logger.debug("No alerts to save.")
+        return 0
 
     conn = None
+    start = time.perf_counter()
     try:
         conn = psycopg2.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, port=DB_PORT)
         cur = conn.cursor()
@@ -209,13 +276,14 @@ def save_alerts_to_db(alerts_to_save, strategy_name):
         sql = """
             INSERT INTO trading_app_radaralert (
                 instrument_key, source_strategy, alert_details, indicators, timestamp,
-                status, priority, alert_type, notified, expires_at
+                status, priority, alert_type, notified, expires_at, updated_at
             )
-            VALUES (%s, %s, %s, %s, NOW(), %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, NOW(), %s, %s, %s, %s, %s, NOW())
             ON CONFLICT (instrument_key, source_strategy) DO UPDATE SET
                 alert_details = EXCLUDED.alert_details,
                 indicators = EXCLUDED.indicators,
                 timestamp = NOW(),
+                updated_at = NOW(),
                 status = EXCLUDED.status,
                 priority = EXCLUDED.priority,
                 alert_type = EXCLUDED.alert_type,
@@ -243,13 +311,15 @@ def save_alerts_to_db(alerts_to_save, strategy_name):
             cur.execute(sql, values)
 
         conn.commit()
-        print(f"SUCCESS: Saved/Updated {len(alerts_to_save)} alerts for strategy '{strategy_name}' in the database.")
-        print("[DEBUG] Database commit successful.")
+        metrics.DB_WRITE_SECONDS.labels(operation='save_alerts').observe(time.perf_counter() - start)
+        metrics.ALERTS_WRITTEN.labels(strategy=strategy_name).inc(len(alerts_to_save))
+        logger.info(f"Saved/Updated {len(alerts_to_save)} alerts for strategy '{strategy_name}' in the database.",
+                    extra={'strategy': strategy_name, 'alerts': len(alerts_to_save)})
         cur.close()
+        return len(alerts_to_save)
     except (Exception, psycopg2.DatabaseError) as error:
-        print(f"ERROR saving alerts to database: {error}")
-        traceback.print_exc()
+        logger.exception(f"Failed to save alerts to database: {error}")
+        return 0
     finally:
         if conn is not None:
             conn.close()
-            print("[DEBUG] Database connection closed.")
@@ -1,62 +1,189 @@
 # websocket_handler.py
 
 import json
+import logging
 import time
+import threading
+from datetime import datetime, timedelta, timezone
 import websocket
-import pandas as pd
 
 # Import our custom modules
 import data_manager
 import indicator_calculator
+import metrics
 import trade_analyzer
+from sharded_analysis import ShardedAnalyzer
+from tick_buffer import TickBuffer, ticks_to_frames
 
 # Import the pre-compiled Protobuf message class
 from upstox_client.feeder.proto import MarketDataFeedV3_pb2
 
+logger = logging.getLogger(__name__)
+
+# Seconds the batch worker waits for ticks before checking for shutdown
+BATCH_INTERVAL = 0.25
+
+# Seconds between tick queue counter reports
+STATS_INTERVAL = 60
+
+# Source strategy for alerts raised from the live feed
+LIVE_FEED_STRATEGY = "Live_Feed"
+
+# Minutes a saved live-feed alert stays active, as for the poller's ORB alerts
+LIVE_ALERT_EXPIRY_MINUTES = 45
+
+# instrument_key -> (score, reasons, expires_at) of the last saved alert
+_saved_live_alerts = {}
+
+# Filled by the WebSocket thread, drained by the batch worker; conflates per instrument
+tick_buffer = TickBuffer()
+
+metrics.TICK_QUEUE_DEPTH.set_function(lambda: tick_buffer.depth)
+metrics.TICKS_CONFLATED.set_function(lambda: tick_buffer.conflated)
+metrics.TICKS_DROPPED.set_function(lambda: tick_buffer.dropped)
+
+# Bound once: these are recorded for every frame or instrument
+_DECODE_SECONDS = metrics.TICK_STAGE_SECONDS.labels(stage='decode')
+_APPEND_SECONDS = metrics.TICK_STAGE_SECONDS.labels(stage='append')
+_INDICATORS_SECONDS = metrics.TICK_STAGE_SECONDS.labels(stage='indicators')
+_ANALYZE_SECONDS = metrics.TICK_STAGE_SECONDS.labels(stage='analyze')
+
 # --- WebSocket Callback Functions ---
 
+def _ltpc(feed):
+    """The LTPC of an ltpc-mode feed, or of the market/index part of a full feed."""
+    kind = feed.WhichOneof('FeedUnion')
+    if kind == 'ltpc':
+        return feed.ltpc
+    if kind == 'fullFeed':
+        full_kind = feed.fullFeed.WhichOneof('FullFeedUnion')
+        return getattr(feed.fullFeed, full_kind).ltpc if full_kind else None
+    return None
+
 def on_message(ws, message):
-    """Callback executed when a message is received from the WebSocket."""
+    """
+    Callback executed when a message is received from the WebSocket.
+    Only decodes the frame and enqueues raw tick numbers; everything else
+    happens in the batch worker so the socket is never held up. While the
+    worker is busy, newer ticks replace an instrument's pending tick.
+    """
+    start = time.perf_counter()
     try:
         decoded_message = MarketDataFeedV3_pb2.FeedResponse()
         decoded_message.ParseFromString(message)
 
-        if decoded_message.feeds:
-            for instrument_key, feed in decoded_message.feeds.items():
-                if feed.ltpc:
-                    ltpc_data = feed.ltpc
-                    tick_data = {
-                        'datetime': pd.to_datetime(int(ltpc_data.ltp_timestamp) / 1000, unit='s', utc=True).tz_convert('Asia/Kolkata'),
-                        'open': ltpc_data.open_price,
-                        'high': ltpc_data.high,
-                        'low': ltpc_data.low,
-                        'close': ltpc_data.ltp,
-                        'volume': ltpc_data.volume
-                    }
-
-                    # Update history and get the latest complete DataFrame
-                    updated_df = data_manager.update_history_with_tick(instrument_key, tick_data)
-
-                    if not updated_df.empty:
-                        # Calculate indicators on the updated data
-                        indicators = indicator_calculator.calculate_indicators(updated_df)
-                        print(f"  Processed {instrument_key}: Close={indicators.get('Close'):.2f}, Indicators: RSI={indicators.get('RSI', 'N/A'):.2f}")
-                        
-                        # **FIX:** Pass the updated_df to the analyzer for pattern recognition
-                        trade_analyzer.analyze_for_trade_setup(instrument_key, indicators, updated_df)
+        ticks = 0
+        for instrument_key, feed in decoded_message.feeds.items():
+            ltpc = _ltpc(feed)
+            if ltpc is not None and ltpc.ltp > 0:
+                tick_buffer.push(tick_buffer.slot_for(instrument_key), ltpc.ltt, ltpc.ltp, ltpc.ltq, ltpc.cp)
+                ticks += 1
+        metrics.TICKS_DECODED.inc(ticks)
 
     except Exception as e:
-        print(f"ERROR in on_message: {e}")
+        metrics.FEED_DECODE_ERRORS.inc()
+        logger.error(f"Failed to decode feed frame: {e}")
+    _DECODE_SECONDS.observe(time.perf_counter() - start)
+
+# --- Batch Worker ---
+
+def process_batch(batch):
+    """
+    Appends each instrument's ticks once and analyzes it once per batch.
+    Returns the setups found as alert dicts for save_alerts_to_db, in the
+    same form as the sharded analyzer's.
+    """
+    alerts = []
+    for instrument_key, ticks in ticks_to_frames(batch, tick_buffer.instrument_keys).items():
+        # Update history and get the latest complete DataFrame
+        start = time.perf_counter()
+        updated_df = data_manager.append_ticks(instrument_key, ticks)
+        appended = time.perf_counter()
+        _APPEND_SECONDS.observe(appended - start)
+
+        if not updated_df.empty:
+            # Calculate indicators on the updated data (empty until there are two bars)
+            indicators = indicator_calculator.calculate_indicators(updated_df)
+            _INDICATORS_SECONDS.observe(time.perf_counter() - appended)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Processed ticks", extra={
+                    'instrument_key': instrument_key, 'ticks': len(ticks),
+                    'close': indicators.get('Close'), 'rsi': indicators.get('RSI'),
+                })
+
+            # Pass the updated_df to the analyzer for pattern recognition
+            start = time.perf_counter()
+            setup_found, details, trade_recommendations = trade_analyzer.analyze_for_trade_setup(
+                instrument_key, indicators, updated_df
+            )
+            _ANALYZE_SECONDS.observe(time.perf_counter() - start)
+            if setup_found:
+                alerts.append({
+                    'instrument_key': instrument_key,
+                    'score': len(details),
+                    'reasons': details,
+                    'indicators': {**indicators, **trade_recommendations},
+                    'alert_type': 'ENTRY',
+                })
+    return alerts
+
+def log_live_alerts(alerts):
+    """Default alert sink for live-feed setups: log them, write nothing."""
+    for alert in alerts:
+        logger.info("Live feed setup", extra={
+            'instrument_key': alert['instrument_key'], 'score': alert['score'], 'reasons': alert['reasons'],
+        })
+
+def save_live_alerts(alerts):
+    """
+    Alert sink that also saves setups as expiring Live_Feed alerts (main.py
+    --save-alerts). An instrument is only re-saved when its score or reasons
+    change or its saved alert has expired, so unchanged setups do not touch
+    the database (or the alerts' updated_at) on every batch.
+    """
+    log_live_alerts(alerts)
+    now = datetime.now(timezone.utc)
+    changed = []
+    for alert in alerts:
+        saved = _saved_live_alerts.get(alert['instrument_key'])
+        if saved and saved[:2] == (alert['score'], alert['reasons']) and saved[2] > now:
+            continue
+        alert['expires_at'] = now + timedelta(minutes=LIVE_ALERT_EXPIRY_MINUTES)
+        changed.append(alert)
+    if changed and trade_analyzer.save_alerts_to_db(changed, LIVE_FEED_STRATEGY):
+        for alert in changed:
+            _saved_live_alerts[alert['instrument_key']] = (alert['score'], alert['reasons'], alert['expires_at'])
+
+def analyze_batch(batch, sink=log_live_alerts):
+    """Unsharded batch worker step: analyze in this thread and pass the setups to ``sink``."""
+    alerts = process_batch(batch)
+    if alerts:
+        sink(alerts)
+
+def run_batch_worker(stop_event, process=analyze_batch):
+    """Drains the tick buffer and processes each batch until stop_event is set."""
+    last_report = time.monotonic()
+    while not stop_event.is_set():
+        batch = tick_buffer.drain(timeout=BATCH_INTERVAL)
+        if len(batch):
+            try:
+                process(batch)
+            except Exception as e:
+                logger.exception(f"Batch worker failed: {e}")
+
+        if time.monotonic() - last_report >= STATS_INTERVAL:
+            last_report = time.monotonic()
+            logger.info("Tick queue", extra=tick_buffer.stats())
 
 def on_error(ws, error):
-    print(f"WebSocket error: {error}")
+    logger.error(f"WebSocket error: {error}")
 
 def on_close(ws, close_status_code, close_msg):
-    print(f"WebSocket closed: Code={close_status_code}, Message={close_msg}")
+    logger.warning("WebSocket closed", extra={'code': close_status_code, 'reason': close_msg})
 
 def on_open(ws, instrument_keys_to_subscribe):
     """Callback executed when the WebSocket connection is opened."""
-    print("WebSocket connection opened. Sending subscription request...")
+    logger.info("WebSocket connection opened. Sending subscription request...")
     subscription_message = {
         "guid": str(int(time.time() * 1000)),
         "method": "sub",
@@ -64,11 +191,17 @@ def on_open(ws, instrument_keys_to_subscribe):
         "instrumentKeys": instrument_keys_to_subscribe
     }
     ws.send(json.dumps(subscription_message))
-    print(f"Subscription message sent for: {instrument_keys_to_subscribe}")
+    logger.info("Subscription message sent", extra={'instruments': len(instrument_keys_to_subscribe)})
 
-def start_websocket_feed(uri, instrument_keys):
-    """Initializes and runs the WebSocket application."""
-    print("Connecting to WebSocket...")
+def start_websocket_feed(uri, instrument_keys, shards=0, sink=log_live_alerts):
+    """
+    Initializes and runs the WebSocket application. With ``shards`` > 0 the
+    analysis runs in that many processes (see sharded_analysis) instead of
+    in the batch worker thread. Either way setups go to ``sink`` (logged by
+    default, saved with save_live_alerts), so the shard count only changes
+    parallelism.
+    """
+    logger.info("Connecting to WebSocket...")
     ws_app = websocket.WebSocketApp(
         uri,
         on_open=lambda ws: on_open(ws, instrument_keys), # Use lambda to pass extra args
@@ -76,5 +209,21 @@ def start_websocket_feed(uri, instrument_keys):
         on_error=on_error,
         on_close=on_close,
     )
-    print("Starting WebSocket listener...")
-    ws_app.run_forever()
+    process = lambda batch: analyze_batch(batch, sink)
+    analyzer = None
+    if shards:
+        analyzer = ShardedAnalyzer(shards, sink=sink)
+        analyzer.start()
+        process = lambda batch: analyzer.dispatch(batch, tick_buffer.instrument_keys)
+
+    stop_event = threading.Event()
+    worker = threading.Thread(target=run_batch_worker, args=(stop_event, process), daemon=True)
+    worker.start()
+    logger.info("Starting WebSocket listener...")
+    try:
+        ws_app.run_forever()
+    finally:
+        stop_event.set()
+        worker.join()
+        if analyzer:
+            analyzer.stop()
@@ -87,6 +87,15 @@ const LiveTradingDashboard = ({ userId }) => {
         };
     }, [userId]);
 
+    // Only receive live prices for instruments with open trades
+    useEffect(() => {
+        const keys = [...new Set(openTrades.map(trade => trade.instrument_key))];
+        websocketService.subscribePrices(keys);
+        return () => {
+            websocketService.unsubscribePrices(keys);
+        };
+    }, [openTrades]);
+
     const showNotification = (message, type = 'info') => {
         // Create notification element
         const notification = document.createElement('div');
@@ -66,7 +66,6 @@ const AlertsPage = ({ setCurrentPage }) => {
 
   useEffect(() => {
     const handlePriceUpdate = (data) => {
-      console.log("Received price update:", data); // DEBUG LOG
       setLivePrices(prev => ({
         ...prev,
         [data.instrument_key]: data.current_price
@@ -82,6 +81,15 @@ const AlertsPage = ({ setCurrentPage }) => {
     };
   }, []);
 
+  // Only receive live prices for the stocks currently listed
+  useEffect(() => {
+    const keys = [...new Set([...alerts, ...screenerStocks].map(item => item.instrument_key))];
+    websocketService.subscribePrices(keys);
+    return () => {
+      websocketService.unsubscribePrices(keys);
+    };
+  }, [alerts, screenerStocks]);
+
   const fetchPageData = useCallback(async () => {
     try {
       let screeningData = [];
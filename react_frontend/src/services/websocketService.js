@@ -8,6 +8,9 @@ class WebSocketService {
         this.reconnectAttempts = 0;
         this.maxReconnectAttempts = 5;
         this.reconnectDelay = 1000;
+        this.latestPrices = {};
+        // instrument_key -> number of components displaying it
+        this.priceSubscriptions = new Map();
         this.listeners = {
             wallet_data: [],
             open_trades: [],
@@ -88,6 +91,13 @@ class WebSocketService {
         
         this.priceSocket.onopen = () => {
             console.log('Price WebSocket connected');
+            // Restore subscriptions after a (re)connect
+            if (this.priceSubscriptions.size > 0) {
+                this.sendPriceMessage({
+                    type: 'subscribe',
+                    instrument_keys: [...this.priceSubscriptions.keys()]
+                });
+            }
         };
         
         this.priceSocket.onmessage = (event) => {
@@ -151,6 +161,40 @@ class WebSocketService {
         }
     }
 
+    // Receive price updates only for these instruments. Calls are reference
+    // counted, so each subscribePrices needs a matching unsubscribePrices.
+    subscribePrices(instrumentKeys) {
+        const added = [];
+        instrumentKeys.forEach(key => {
+            const count = this.priceSubscriptions.get(key) || 0;
+            if (count === 0) {
+                added.push(key);
+            }
+            this.priceSubscriptions.set(key, count + 1);
+        });
+        if (added.length > 0 && this.priceSocket && this.priceSocket.readyState === WebSocket.OPEN) {
+            this.sendPriceMessage({ type: 'subscribe', instrument_keys: added });
+        }
+    }
+
+    unsubscribePrices(instrumentKeys) {
+        const removed = [];
+        instrumentKeys.forEach(key => {
+            const count = this.priceSubscriptions.get(key) || 0;
+            if (count <= 1) {
+                this.priceSubscriptions.delete(key);
+                if (count === 1) {
+                    removed.push(key);
+                }
+            } else {
+                this.priceSubscriptions.set(key, count - 1);
+            }
+        });
+        if (removed.length > 0 && this.priceSocket && this.priceSocket.readyState === WebSocket.OPEN) {
+            this.sendPriceMessage({ type: 'unsubscribe', instrument_keys: removed });
+        }
+    }
+
     // Handle trading WebSocket messages
     handleTradingMessage(data) {
         const { type, data: messageData } = data;
@@ -178,14 +222,15 @@ class WebSocketService {
 
     // Handle price WebSocket messages
     handlePriceMessage(data) {
-        console.log('WebSocket received message:', data); // DEBUG
         const { type, data: messageData } = data;
         
         switch (type) {
             case 'price_update':
-                console.log('Processing price_update:', messageData); // DEBUG
                 this.emit('price_update', messageData);
                 break;
+            case 'price_batch':
+                this.handlePriceBatch(messageData);
+                break;
             case 'trade_executed':
                 this.emit('trade_executed', messageData);
                 break;
@@ -200,6 +245,16 @@ class WebSocketService {
         }
     }
 
+    // Batches carry only the fields that changed; merge them into the last
+    // known state so price_update listeners always receive full quotes
+    handlePriceBatch({ updates = [] }) {
+        updates.forEach(update => {
+            const merged = { ...this.latestPrices[update.instrument_key], ...update };
+            this.latestPrices[update.instrument_key] = merged;
+            this.emit('price_update', merged);
+        });
+    }
+
     // Event listener management
     on(event, callback) {
         if (this.listeners[event]) {